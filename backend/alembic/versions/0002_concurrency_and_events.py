@@ -0,0 +1,168 @@
+"""concurrency and events
+
+订单/支付/订阅的 version 列（乐观并发控制）、每用户一个默认地址 / 一个活跃订阅的部分唯一索引、
+续费与配送选取索引，以及事件发件箱、支付通知收件箱、邮件死信表。
+
+建唯一索引前先清理重复数据：每个用户只保留 id 最大的活跃订阅（其余取消并关闭自动续费）
+和 id 最大的默认地址。基线之后、迁移之前由 create_all 建出的库可能已有部分表和索引，已存在的跳过。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 21:12:04.318226
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('orders', 'payments', 'subscriptions')
+
+
+def _dedupe() -> None:
+    # 状态以 SQL 字面量比较（PostgreSQL 中为枚举类型，不能与 VARCHAR 参数比较）
+    active, cancelled = sa.literal_column("'ACTIVE'"), sa.literal_column("'CANCELLED'")
+    subscriptions = sa.table(
+        'subscriptions',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('status'),
+        sa.column('auto_renew', sa.Boolean),
+        sa.column('cancelled_at', sa.DateTime),
+    )
+    latest_active = (
+        sa.select(sa.func.max(subscriptions.c.id))
+        .where(subscriptions.c.status == active)
+        .group_by(subscriptions.c.user_id)
+    )
+    op.execute(
+        subscriptions.update()
+        .where(subscriptions.c.status == active, subscriptions.c.id.not_in(latest_active))
+        .values(status=cancelled, auto_renew=False, cancelled_at=sa.func.now())
+    )
+
+    addresses = sa.table(
+        'addresses',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('is_default', sa.Boolean),
+    )
+    latest_default = (
+        sa.select(sa.func.max(addresses.c.id))
+        .where(addresses.c.is_default == sa.true())
+        .group_by(addresses.c.user_id)
+    )
+    op.execute(
+        addresses.update()
+        .where(addresses.c.is_default == sa.true(), addresses.c.id.not_in(latest_default))
+        .values(is_default=False)
+    )
+
+
+def upgrade() -> None:
+    # 输出 SQL 脚本（--sql）时无法检查现有结构，按基线结构生成
+    inspector = None if context.is_offline_mode() else sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names()) if inspector else set()
+
+    def has_column(table: str, name: str) -> bool:
+        return inspector is not None and name in {column['name'] for column in inspector.get_columns(table)}
+
+    def has_index(table: str, name: str) -> bool:
+        return table in tables and name in {index['name'] for index in inspector.get_indexes(table)}
+
+    _dedupe()
+
+    for table in VERSIONED_TABLES:
+        if not has_column(table, 'version'):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    if not has_index('addresses', 'ix_addresses_default_user'):
+        op.create_index('ix_addresses_default_user', 'addresses', ['user_id'], unique=True, postgresql_where=sa.text('is_default'), sqlite_where=sa.text('is_default'))
+    if not has_index('subscriptions', 'ix_subscriptions_active_user'):
+        op.create_index('ix_subscriptions_active_user', 'subscriptions', ['user_id'], unique=True, postgresql_where=sa.text("status = 'ACTIVE'"), sqlite_where=sa.text("status = 'ACTIVE'"))
+    if not has_index('subscriptions', 'ix_subscriptions_delivery_due'):
+        op.create_index('ix_subscriptions_delivery_due', 'subscriptions', ['status', 'next_delivery_at'], unique=False)
+    if not has_index('subscriptions', 'ix_subscriptions_renewal_due'):
+        op.create_index('ix_subscriptions_renewal_due', 'subscriptions', ['auto_renew', 'status', 'expires_at'], unique=False)
+
+    if 'notification_dead_letters' not in tables:
+        op.create_table('notification_dead_letters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipient', sa.String(length=255), nullable=False),
+        sa.Column('template', sa.String(length=50), nullable=True),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_notification_dead_letters'))
+        )
+        op.create_index(op.f('ix_notification_dead_letters_recipient'), 'notification_dead_letters', ['recipient'], unique=False)
+
+    if 'outbox_events' not in tables:
+        op.create_table('outbox_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('aggregate_type', sa.String(length=30), nullable=False),
+        sa.Column('aggregate_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('dispatched_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_outbox_events'))
+        )
+    if not has_index('outbox_events', 'ix_outbox_events_aggregate'):
+        op.create_index('ix_outbox_events_aggregate', 'outbox_events', ['aggregate_type', 'aggregate_id', 'id'], unique=False)
+    if not has_index('outbox_events', 'ix_outbox_events_pending'):
+        op.create_index('ix_outbox_events_pending', 'outbox_events', ['id'], unique=False, postgresql_where=sa.text('dispatched_at IS NULL'), sqlite_where=sa.text('dispatched_at IS NULL'))
+
+    if 'payment_notifications' not in tables:
+        op.create_table('payment_notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('provider', sa.String(length=20), nullable=False),
+        sa.Column('out_trade_no', sa.String(length=64), nullable=False),
+        sa.Column('notify_id', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.Enum('PENDING', 'PROCESSED', 'FAILED', name='notificationstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.Column('received_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_payment_notifications')),
+        sa.UniqueConstraint('out_trade_no', 'notify_id', name=op.f('uq_payment_notifications_out_trade_no'))
+        )
+    if not has_index('payment_notifications', 'ix_payment_notifications_status_id'):
+        op.create_index('ix_payment_notifications_status_id', 'payment_notifications', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_notifications_status_id', table_name='payment_notifications')
+    op.drop_table('payment_notifications')
+
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events', postgresql_where=sa.text('dispatched_at IS NULL'), sqlite_where=sa.text('dispatched_at IS NULL'))
+    op.drop_index('ix_outbox_events_aggregate', table_name='outbox_events')
+    op.drop_table('outbox_events')
+
+    op.drop_index(op.f('ix_notification_dead_letters_recipient'), table_name='notification_dead_letters')
+    op.drop_table('notification_dead_letters')
+
+    op.drop_index('ix_subscriptions_renewal_due', table_name='subscriptions')
+    op.drop_index('ix_subscriptions_delivery_due', table_name='subscriptions')
+    op.drop_index('ix_subscriptions_active_user', table_name='subscriptions', postgresql_where=sa.text("status = 'ACTIVE'"), sqlite_where=sa.text("status = 'ACTIVE'"))
+    op.drop_index('ix_addresses_default_user', table_name='addresses', postgresql_where=sa.text('is_default'), sqlite_where=sa.text('is_default'))
+
+    for table in reversed(VERSIONED_TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
+
+    # PostgreSQL 的枚举类型不随表删除
+    sa.Enum(name='notificationstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,40 @@
+"""outbox failed_at
+
+发件箱事件的 failed_at 列：超过最大投递次数的事件标记放弃，不再重试，也不再阻塞同一聚合的后续事件。
+待分发部分索引同时排除已放弃的事件。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 23:40:11.502317
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 迁移前由 create_all 建出的库可能已有该列
+    inspector = None if context.is_offline_mode() else sa.inspect(op.get_bind())
+    if inspector is None or 'failed_at' not in {column['name'] for column in inspector.get_columns('outbox_events')}:
+        with op.batch_alter_table('outbox_events') as batch_op:
+            batch_op.add_column(sa.Column('failed_at', sa.DateTime(timezone=True), nullable=True))
+
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    op.create_index('ix_outbox_events_pending', 'outbox_events', ['id'], unique=False, postgresql_where=sa.text('dispatched_at IS NULL AND failed_at IS NULL'), sqlite_where=sa.text('dispatched_at IS NULL AND failed_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    op.create_index('ix_outbox_events_pending', 'outbox_events', ['id'], unique=False, postgresql_where=sa.text('dispatched_at IS NULL'), sqlite_where=sa.text('dispatched_at IS NULL'))
+
+    with op.batch_alter_table('outbox_events') as batch_op:
+        batch_op.drop_column('failed_at')
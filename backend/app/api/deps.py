@@ -2,13 +2,15 @@
 API 依赖模块
 包含认证、数据库等依赖注入函数
 """
-from typing import Optional
+from typing import Callable, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import decode_access_token, get_db, settings
+from app.core.fields import parse_fields
 from app.models.user import User
 from app.services.user_service import UserService
 
@@ -90,3 +92,30 @@ async def get_current_active_user(
         User: 活跃用户对象
     """
     return current_user
+
+
+def sparse_fields(schema: type[BaseModel]) -> Callable[..., Optional[frozenset[str]]]:
+    """
+    生成 fields 查询参数依赖
+
+    Args:
+        schema: 响应 Schema，用于校验字段名
+
+    Returns:
+        依赖函数，返回字段集合或 None
+    """
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description="只返回指定字段（逗号分隔），如 id,status,total_amount",
+        ),
+    ) -> Optional[frozenset[str]]:
+        try:
+            return parse_fields(fields, schema)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+    
+    return dependency
@@ -2,13 +2,19 @@
 订单路由
 处理订单创建、查询、取消等操作
 """
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import get_current_user, get_db, sparse_fields
+from app.core.concurrency import ConcurrentUpdateError
+from app.core.fields import dump_fields
+from app.core.idempotency import IdempotentRoute, idempotent
+from app.core.responses import FastJSONResponse
+from app.core.serializers import batch_orm_response, orm_content, orm_response
 from app.models.user import User
+from app.schemas.batch import BatchGetResponse, OrderBatchGetRequest
 from app.schemas.order import (
     OrderCreate,
     OrderCancel,
@@ -18,10 +24,11 @@ from app.schemas.order import (
 )
 from app.services.order_service import OrderService
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
 
 
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+@idempotent
 async def create_order(
     data: OrderCreate,
     current_user: User = Depends(get_current_user),
@@ -59,6 +66,7 @@ async def create_order(
 async def list_orders(
     skip: int = 0,
     limit: int = 20,
+    fields: Optional[frozenset[str]] = Depends(sparse_fields(OrderResponse)),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
@@ -66,25 +74,65 @@ async def list_orders(
     获取当前用户的订单列表
     
     支持分页，默认每页20条
+    支持 fields 参数只返回指定字段（如 ?fields=id,status,total_amount）
     """
     order_service = OrderService(db)
     orders, total = await order_service.get_by_user_id(
         user_id=current_user.id,
         skip=skip,
-        limit=limit
+        limit=limit,
+        fields=fields
     )
     
-    return OrderListResponse(
-        total=total,
-        items=orders,
-        page=skip // limit + 1 if limit > 0 else 1,
-        page_size=limit
+    if fields:
+        items = [dump_fields(o, OrderResponse, fields) for o in orders]
+    else:
+        items = orm_content(OrderResponse, orders, many=True)
+    
+    return FastJSONResponse(content={
+        "total": total,
+        "items": items,
+        "page": skip // limit + 1 if limit > 0 else 1,
+        "page_size": limit,
+    })
+
+
+@router.post("/batch-get", response_model=BatchGetResponse[OrderDetailResponse])
+async def batch_get_orders(
+    data: OrderBatchGetRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    批量获取订单详情
+    
+    - 按订单ID和/或订单号查询，单次最多100条，一次数据库查询完成
+    - 结果顺序与请求一致（先ID后订单号）
+    - 每项带状态标记：found / not_found / forbidden
+    """
+    order_service = OrderService(db)
+    orders = await order_service.get_many(
+        ids=data.ids,
+        order_numbers=data.order_numbers
+    )
+    
+    rows = {}
+    for order in orders:
+        rows[order.id] = order
+        rows[order.order_number] = order
+    
+    return batch_orm_response(
+        OrderDetailResponse,
+        keys=[*data.ids, *data.order_numbers],
+        rows=rows,
+        user_id=current_user.id,
     )
 
 
 @router.get("/{order_id}", response_model=OrderDetailResponse)
 async def get_order(
     order_id: int,
+    fields: Optional[frozenset[str]] = Depends(sparse_fields(OrderDetailResponse)),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
@@ -92,9 +140,10 @@ async def get_order(
     获取订单详情
     
     包含订单信息和相关支付记录
+    支持 fields 参数只返回指定字段
     """
     order_service = OrderService(db)
-    order = await order_service.get_by_id(order_id)
+    order = await order_service.get_by_id(order_id, fields=fields)
     
     if not order:
         raise HTTPException(
@@ -109,20 +158,26 @@ async def get_order(
             detail="无权访问此订单"
         )
     
-    return order
+    if fields:
+        return FastJSONResponse(content=dump_fields(order, OrderDetailResponse, fields))
+    
+    return orm_response(OrderDetailResponse, order)
 
 
 @router.get("/number/{order_number}", response_model=OrderDetailResponse)
 async def get_order_by_number(
     order_number: str,
+    fields: Optional[frozenset[str]] = Depends(sparse_fields(OrderDetailResponse)),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     通过订单号获取订单详情
+    
+    支持 fields 参数只返回指定字段
     """
     order_service = OrderService(db)
-    order = await order_service.get_by_order_number(order_number)
+    order = await order_service.get_by_order_number(order_number, fields=fields)
     
     if not order:
         raise HTTPException(
@@ -137,7 +192,10 @@ async def get_order_by_number(
             detail="无权访问此订单"
         )
     
-    return order
+    if fields:
+        return FastJSONResponse(content=dump_fields(order, OrderDetailResponse, fields))
+    
+    return orm_response(OrderDetailResponse, order)
 
 
 @router.post("/{order_id}/cancel", response_model=OrderResponse)
@@ -179,6 +237,12 @@ async def cancel_order(
         updated = await order_service.cancel(order)
         await db.commit()
         return updated
+    except ConcurrentUpdateError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         await db.rollback()
         raise HTTPException(
@@ -1,47 +1,47 @@
 """
 支付路由
-处理支付宝支付、回调、查询等操作
+处理支付宝/微信支付、回调、查询等操作
 """
+import json
 from typing import Dict, Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
+from fastapi.responses import PlainTextResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user, get_db
+from app.core.concurrency import ConcurrentUpdateError
+from app.core.idempotency import IdempotentRoute, idempotent
+from app.core.serializers import batch_orm_response
+from app.models.payment import PaymentProvider
 from app.models.user import User
+from app.schemas.batch import BatchGetRequest, BatchGetResponse
 from app.schemas.payment import (
     AlipayPaymentRequest,
     AlipayPayUrlResponse,
+    ProviderPaymentRequest,
+    ProviderPayUrlResponse,
     PaymentResponse,
     PaymentStatusResponse,
     PaymentResult,
     PaymentCallback,
 )
+from app.services.inbox_service import PaymentInboxService
 from app.services.payment_service import PaymentService
 from app.services.order_service import OrderService
+from app.services.providers import ProviderError, TradeState, get_provider
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
 
 
-@router.post("/{order_id}/alipay", response_model=AlipayPayUrlResponse)
-async def create_alipay_payment(
+async def _create_payment(
     order_id: int,
-    data: Optional[AlipayPaymentRequest] = None,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    provider: PaymentProvider,
+    return_url: Optional[str],
+    current_user: User,
+    db: AsyncSession,
 ):
-    """
-    创建支付宝支付
-    
-    为指定订单创建支付宝支付，返回支付页面URL
-    
-    Args:
-        order_id: 订单ID
-        data: 支付请求参数（可选，包含return_url）
-    
-    Returns:
-        支付ID、支付号和支付宝支付URL
-    """
+    """创建第三方支付（检查订单归属和状态）"""
     # 检查订单
     order_service = OrderService(db)
     order = await order_service.get_by_id(order_id)
@@ -69,23 +69,25 @@ async def create_alipay_payment(
     
     try:
         payment_service = PaymentService(db)
-        payment, pay_url = await payment_service.create_alipay_payment(
+        payment, pay_url = await payment_service.create_provider_payment(
             user_id=current_user.id,
             order=order,
-            return_url=data.return_url if data else None
+            provider=provider,
+            return_url=return_url
         )
         await db.commit()
-        
-        return AlipayPayUrlResponse(
-            payment_id=payment.id,
-            payment_no=payment.payment_no,
-            pay_url=pay_url
-        )
+        return payment, pay_url
     except ImportError as e:
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"支付宝SDK未安装: {str(e)}"
+            detail=f"支付SDK未安装: {str(e)}"
+        )
+    except ConcurrentUpdateError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
         )
     except ValueError as e:
         await db.rollback()
@@ -101,65 +103,139 @@ async def create_alipay_payment(
         )
 
 
-@router.post("/callback")
-async def payment_callback(
-    request: Request,
+@router.post("/{order_id}/alipay", response_model=AlipayPayUrlResponse)
+@idempotent
+async def create_alipay_payment(
+    order_id: int,
+    data: Optional[AlipayPaymentRequest] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    创建支付宝支付
+    
+    为指定订单创建支付宝支付，返回支付页面URL
+    
+    Args:
+        order_id: 订单ID
+        data: 支付请求参数（可选，包含return_url）
+    
+    Returns:
+        支付ID、支付号和支付宝支付URL
+    """
+    payment, pay_url = await _create_payment(
+        order_id, PaymentProvider.ALIPAY, data.return_url if data else None, current_user, db
+    )
+    return AlipayPayUrlResponse(
+        payment_id=payment.id,
+        payment_no=payment.payment_no,
+        pay_url=pay_url
+    )
+
+
+@router.post("/{order_id}/pay/{provider}", response_model=ProviderPayUrlResponse)
+@idempotent
+async def create_provider_payment(
+    order_id: int,
+    provider: PaymentProvider,
+    data: Optional[ProviderPaymentRequest] = None,
+    current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    支付回调接口
+    创建第三方支付（alipay / wechat）
     
-    接收支付宝/微信的支付结果通知
-    支持POST form-data和JSON格式
+    Returns:
+        支付ID、支付号和支付链接（微信为 Native 支付二维码链接）
     """
-    try:
-        # 尝试从form-data获取
-        form_data = await request.form()
-        if form_data:
-            callback_data = dict(form_data)
-        else:
-            # 尝试从JSON获取
-            callback_data = await request.json()
-    except Exception:
-        # 如果都失败了，尝试从查询参数获取
-        callback_data = dict(request.query_params)
+    payment, pay_url = await _create_payment(
+        order_id, provider, data.return_url if data else None, current_user, db
+    )
+    return ProviderPayUrlResponse(
+        payment_id=payment.id,
+        payment_no=payment.payment_no,
+        provider=provider,
+        pay_url=pay_url
+    )
+
+
+async def _read_callback(request: Request) -> tuple[bytes, dict]:
+    """读取回调原始请求体和参数（form-data / JSON / 查询参数）"""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
     
-    if not callback_data:
+    if content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+        data = dict(await request.form())
+    else:
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+    
+    # 如果都没有，尝试从查询参数获取
+    return body, data or dict(request.query_params)
+
+
+async def _handle_callback(
+    provider: PaymentProvider,
+    request: Request,
+    db: AsyncSession,
+) -> Response:
+    """验签并写入收件箱，按提供商要求的格式应答"""
+    client = get_provider(provider)
+    body, data = await _read_callback(request)
+    
+    if not body and not data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="回调数据为空"
         )
     
-    # 处理回调
-    payment_service = PaymentService(db)
-    
+    # 验证签名（未配置该提供商的开发环境跳过）
     try:
-        # 判断是支付宝还是微信回调
-        if "out_trade_no" in callback_data:
-            # 支付宝回调
-            payment = await payment_service.process_alipay_callback(callback_data)
-        else:
-            # 微信支付回调或其他
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="不支持的回调类型"
-            )
-        
-        if payment:
-            await db.commit()
-            return {"code": "SUCCESS", "message": "处理成功"}
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="处理回调失败"
-            )
-            
-    except Exception as e:
-        await db.rollback()
+        trade = await client.parse_callback(body, request.headers, data)
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"处理回调异常: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"回调数据格式错误: {e}"
         )
+    if trade is None:
+        return client.callback_response(False)
+    
+    await PaymentInboxService(db).record(provider, trade)
+    await db.commit()
+    
+    return client.callback_response(True)
+
+
+@router.post("/callback", response_class=PlainTextResponse)
+async def payment_callback(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    支付宝支付回调接口（支付宝下单时的 notify_url）
+    
+    只做验签和落库（收件箱按 out_trade_no + notify_id 去重），立即返回 success；
+    通知由后台任务 payments.drain_inbox 按批处理
+    """
+    return await _handle_callback(PaymentProvider.ALIPAY, request, db)
+
+
+@router.post("/callback/{provider}")
+async def provider_callback(
+    provider: PaymentProvider,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    支付回调接口（按路径区分提供商：alipay / wechat）
+    
+    验签后写入收件箱，应答格式由提供商决定（支付宝纯文本 success，微信 204）
+    """
+    return await _handle_callback(provider, request, db)
 
 
 @router.get("/callback")
@@ -180,10 +256,17 @@ async def payment_callback_get(
             detail="回调数据为空"
         )
     
-    payment_service = PaymentService(db)
-    
     try:
-        payment = await payment_service.process_alipay_callback(callback_data)
+        trade = await get_provider(PaymentProvider.ALIPAY).parse_callback(
+            b"", request.headers, callback_data
+        )
+        if trade is None:
+            return PaymentResult(
+                success=False,
+                message="签名验证失败"
+            )
+        
+        payment = await PaymentService(db).apply_trade_result(trade)
         
         if payment:
             await db.commit()
@@ -206,6 +289,29 @@ async def payment_callback_get(
         )
 
 
+@router.post("/batch-get", response_model=BatchGetResponse[PaymentResponse])
+async def batch_get_payments(
+    data: BatchGetRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    批量获取支付记录
+    
+    - 单次最多100条，一次数据库查询完成
+    - 结果顺序与请求一致，每项带状态标记：found / not_found / forbidden
+    """
+    payment_service = PaymentService(db)
+    payments = await payment_service.get_many(data.ids)
+    
+    return batch_orm_response(
+        PaymentResponse,
+        keys=data.ids,
+        rows={payment.id: payment for payment in payments},
+        user_id=current_user.id,
+    )
+
+
 @router.get("/{payment_id}/status", response_model=PaymentStatusResponse)
 async def get_payment_status(
     payment_id: int,
@@ -270,33 +376,37 @@ async def query_payment(
             detail="无权查询此支付记录"
         )
     
-    # 只有支付宝支付支持查询
-    from app.models.payment import PaymentProvider
-    if payment.provider != PaymentProvider.ALIPAY:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="仅支持查询支付宝支付状态"
-        )
-    
     try:
-        result = await payment_service.query_alipay_status(payment)
+        trade = await payment_service.query_status(payment)
         
-        # 如果查询成功且已支付，更新本地状态
-        if result.get("success") and result.get("data", {}).get("trade_status") == "TRADE_SUCCESS":
-            if payment.status.value != "success":
-                await payment_service.mark_as_success(
-                    payment, 
-                    result["data"].get("trade_no")
-                )
-                # 更新订单状态
-                await payment_service._update_order_status(payment.order_id)
-                await db.commit()
+        # 如果查询结果为已支付，更新本地状态
+        if trade.state == TradeState.PAID and payment.status.value != "success":
+            await payment_service.apply_trade_result(trade)
+            await db.commit()
         
         return {
             "local_status": payment.status.value,
-            "query_result": result
+            "query_result": {
+                "success": True,
+                "state": trade.state.value,
+                "data": trade.raw
+            }
         }
         
+    except ConcurrentUpdateError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ProviderError as e:
+        return {
+            "local_status": payment.status.value,
+            "query_result": {
+                "success": False,
+                "error": str(e)
+            }
+        }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -2,13 +2,23 @@
 订阅路由
 处理订阅创建、查询、更新、暂停/恢复/取消等操作
 """
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import get_current_user, get_db, sparse_fields
+from app.core.compression import PrecompressedPayload
+from app.core.concurrency import ConcurrentUpdateError
+from app.core.config import settings
+from app.core.fields import dump_fields
+from app.core.idempotency import IdempotentRoute, idempotent
+from app.core.responses import FastJSONResponse, json_dumps
+from app.core.serializers import batch_orm_response, orm_response
+from app.models.payment import PaymentProvider
 from app.models.user import User
+from app.schemas.batch import BatchGetRequest, BatchGetResponse
 from app.schemas.subscription import (
     SubscriptionCreate,
     SubscriptionUpdate,
@@ -20,21 +30,16 @@ from app.schemas.subscription import (
     MessageResponse,
     PLAN_CONFIG,
 )
-from app.services.subscription_service import SubscriptionService
+from app.services.subscription_service import ActiveSubscriptionExistsError, SubscriptionService
 from app.services.order_service import OrderService
 from app.services.payment_service import PaymentService
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
 
 
-@router.get("/plans", response_model=PlanListResponse)
-async def list_plans():
-    """
-    获取所有订阅计划
-    
-    Returns:
-        计划列表，包含基础版、标准版、高级版的价格和特性
-    """
+@lru_cache(maxsize=1)
+def get_plan_catalog() -> PrecompressedPayload:
+    """构建计划目录响应（进程内只构建并压缩一次）"""
     plans = [
         PlanInfo(
             code=code,
@@ -46,10 +51,27 @@ async def list_plans():
         for code, config in PLAN_CONFIG.items()
     ]
     
-    return PlanListResponse(plans=plans)
+    return PrecompressedPayload(
+        json_dumps(PlanListResponse(plans=plans).model_dump()),
+        enable_brotli=settings.compression_brotli,
+    )
+
+
+@router.get("/plans", response_model=PlanListResponse)
+async def list_plans(request: Request):
+    """
+    获取所有订阅计划
+    
+    计划目录为静态数据，响应体预先压缩，按 Accept-Encoding 直接返回
+    
+    Returns:
+        计划列表，包含基础版、标准版、高级版的价格和特性
+    """
+    return get_plan_catalog().response(request)
 
 
 @router.post("", response_model=SubscriptionWithPaymentResponse, status_code=status.HTTP_201_CREATED)
+@idempotent
 async def create_subscription(
     data: SubscriptionCreate,
     current_user: User = Depends(get_current_user),
@@ -83,28 +105,19 @@ async def create_subscription(
             months=1
         )
         
-        # 创建支付宝支付（如果SDK已安装且配置正确）
-        try:
-            payment_service = PaymentService(db)
-            payment, pay_url = await payment_service.create_alipay_payment(
-                user_id=current_user.id,
-                order=order,
-                return_url=None
-            )
-            payment_params = {
-                "pay_url": pay_url,
-                "payment_id": payment.id,
-                "payment_no": payment.payment_no
-            }
-        except (ImportError, ValueError):
-            # 支付宝SDK未安装或未配置，使用模拟支付（开发测试模式）
-            # 订单会自动标记为已支付
-            payment_params = {
-                "pay_url": f"/payment/success?order_id={order.id}&mock=1",
-                "payment_id": None,
-                "payment_no": None,
-                "mock": True
-            }
+        # 按订阅的支付方式创建支付（提供商未配置时仅开发模式模拟支付，否则返回 400）
+        payment_service = PaymentService(db)
+        payment, pay_url = await payment_service.create_provider_payment(
+            user_id=current_user.id,
+            order=order,
+            provider=PaymentProvider(subscription.payment_method or PaymentProvider.ALIPAY.value),
+            return_url=None
+        )
+        payment_params = {
+            "pay_url": pay_url,
+            "payment_id": payment.id,
+            "payment_no": payment.payment_no
+        }
         
         await db.commit()
         
@@ -114,6 +127,18 @@ async def create_subscription(
             payment_params=payment_params
         )
         
+    except ImportError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"支付SDK未安装: {str(e)}"
+        )
+    except ConcurrentUpdateError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         await db.rollback()
         raise HTTPException(
@@ -141,19 +166,29 @@ async def delete_subscription(
 async def list_subscriptions(
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[frozenset[str]] = Depends(sparse_fields(SubscriptionResponse)),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     获取当前用户的订阅列表
+    
+    支持 fields 参数只返回指定字段（如 ?fields=id,status,plan_code）
     """
     subscription_service = SubscriptionService(db)
     subscriptions = await subscription_service.get_by_user_id(
         user_id=current_user.id,
         skip=skip,
-        limit=limit
+        limit=limit,
+        fields=fields
     )
-    return subscriptions
+    
+    if fields:
+        return FastJSONResponse(content=[
+            dump_fields(sub, SubscriptionResponse, fields) for sub in subscriptions
+        ])
+    
+    return orm_response(SubscriptionResponse, subscriptions, many=True)
 
 
 @router.get("/active", response_model=SubscriptionResponse)
@@ -176,17 +211,43 @@ async def get_active_subscription(
     return subscription
 
 
+@router.post("/batch-get", response_model=BatchGetResponse[SubscriptionDetailResponse])
+async def batch_get_subscriptions(
+    data: BatchGetRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    批量获取订阅详情
+    
+    - 单次最多100条，一次数据库查询完成
+    - 结果顺序与请求一致，每项带状态标记：found / not_found / forbidden
+    """
+    subscription_service = SubscriptionService(db)
+    subscriptions = await subscription_service.get_many(data.ids)
+    
+    return batch_orm_response(
+        SubscriptionDetailResponse,
+        keys=data.ids,
+        rows={sub.id: sub for sub in subscriptions},
+        user_id=current_user.id,
+    )
+
+
 @router.get("/{subscription_id}", response_model=SubscriptionDetailResponse)
 async def get_subscription(
     subscription_id: int,
+    fields: Optional[frozenset[str]] = Depends(sparse_fields(SubscriptionDetailResponse)),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     获取订阅详情
+    
+    支持 fields 参数只返回指定字段
     """
     subscription_service = SubscriptionService(db)
-    subscription = await subscription_service.get_by_id(subscription_id)
+    subscription = await subscription_service.get_by_id(subscription_id, fields=fields)
     
     if not subscription:
         raise HTTPException(
@@ -201,7 +262,12 @@ async def get_subscription(
             detail="无权访问此订阅"
         )
     
-    return subscription
+    if fields:
+        return FastJSONResponse(
+            content=dump_fields(subscription, SubscriptionDetailResponse, fields)
+        )
+    
+    return orm_response(SubscriptionDetailResponse, subscription)
 
 
 @router.put("/{subscription_id}", response_model=SubscriptionResponse)
@@ -278,6 +344,12 @@ async def pause_subscription(
         updated = await subscription_service.pause(subscription)
         await db.commit()
         return updated
+    except ConcurrentUpdateError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         await db.rollback()
         raise HTTPException(
@@ -317,6 +389,18 @@ async def resume_subscription(
         updated = await subscription_service.resume(subscription)
         await db.commit()
         return updated
+    except ActiveSubscriptionExistsError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{e}，无法恢复此订阅"
+        )
+    except ConcurrentUpdateError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         await db.rollback()
         raise HTTPException(
@@ -356,6 +440,12 @@ async def cancel_subscription(
         updated = await subscription_service.cancel(subscription)
         await db.commit()
         return updated
+    except ConcurrentUpdateError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         await db.rollback()
         raise HTTPException(
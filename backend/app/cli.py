@@ -0,0 +1,241 @@
+"""
+命令行入口
+用法:
+    python -m app.cli billing-run [--as-of 2024-03-01T00:00:00] [--chunk-size 1000]
+    python -m app.cli delivery-run [--as-of 2024-03-01T00:00:00] [--batch-size 500] [--dry-run]
+    python -m app.cli sweep-pending [--ttl-minutes 120]
+    python -m app.cli sweep-expired [--grace-hours 48]
+    python -m app.cli reconcile-payments [--concurrency 8] [--rate 20]
+    python -m app.cli dispatch-outbox [--batch-size 200] [--max-batches 10]
+    python -m app.cli db-upgrade
+    python -m app.cli cold-start-report [--module app.main] [--top 25] [--check]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from typing import Optional, Sequence
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, close_db, engine
+from app.services.billing_service import BillingService
+from app.services.delivery_service import DeliveryService
+from app.services.outbox_service import OutboxService
+from app.services.reconciliation_service import ReconciliationService
+from app.services.sweeper_service import ExpirySweepService, PendingSweepService
+
+
+async def billing_run(as_of: Optional[datetime], chunk_size: Optional[int]) -> None:
+    """执行续费批处理"""
+    async with AsyncSessionLocal() as db:
+        result = await BillingService(db, chunk_size=chunk_size).run(as_of)
+    await close_db()
+
+    print(f"续费批处理完成（截止 {result.as_of.isoformat()}）")
+    print(f"  到期订阅: {result.selected}（{result.chunks} 批）")
+    print(f"  新建订单: {result.orders_created}")
+    print(f"  新建支付: {result.payments_created}")
+    print(f"  已跳过:   {len(result.skipped)}")
+    print(f"  耗时:     {result.elapsed:.2f}s")
+
+
+async def delivery_run(
+    as_of: Optional[datetime],
+    batch_size: Optional[int],
+    dry_run: bool,
+) -> None:
+    """执行配送生成"""
+    async with AsyncSessionLocal() as db:
+        result = await DeliveryService(db, batch_size=batch_size).run(as_of, dry_run=dry_run)
+    await close_db()
+
+    title = "配送生成预演（未写入）" if dry_run else "配送生成完成"
+    print(f"{title}（截止 {result.as_of.isoformat()}）")
+    print(f"  到期订阅: {result.selected}（{result.batches} 批）")
+    print(f"  发货订单: {result.orders_created}")
+    print(f"  推进配送: {result.advanced}")
+    print(f"  已跳过:   {len(result.skipped)}")
+    print(f"  耗时:     {result.elapsed:.2f}s")
+    for phase, seconds in result.phases.items():
+        print(f"    {phase:<8}{seconds:.3f}s")
+
+    if dry_run:
+        for planned in result.planned[:20]:
+            print(
+                f"  {planned['order_number']}  订阅 {planned['subscription_id']}  "
+                f"{planned['quantity']} 双  下次 {planned['next_delivery_at']:%Y-%m-%d}"
+            )
+        if len(result.planned) > 20:
+            print(f"  ... 共 {len(result.planned)} 条")
+
+
+async def sweep_pending(ttl_minutes: Optional[int]) -> None:
+    """清理超时的待支付订单和支付记录"""
+    async with AsyncSessionLocal() as db:
+        result = await PendingSweepService(db, ttl_minutes=ttl_minutes).sweep()
+    await close_db()
+
+    print(f"待支付清理完成（创建于 {result.cutoff.isoformat()} 之前）")
+    print(f"  最终查询:   {result.payments_checked}")
+    print(f"  补记成功:   {result.payments_rescued}")
+    print(f"  本轮保留:   {len(result.payments_kept)}")
+    print(f"  支付失败:   {result.payments_failed}")
+    print(f"  订单取消:   {result.orders_cancelled}")
+    print(f"  耗时:       {result.elapsed:.2f}s")
+
+
+async def sweep_expired(grace_hours: Optional[int]) -> None:
+    """将到期的活跃订阅标记为过期"""
+    async with AsyncSessionLocal() as db:
+        result = await ExpirySweepService(db, grace_hours=grace_hours).sweep()
+    await close_db()
+
+    print(f"到期清理完成（{result.now.isoformat()}）")
+    print(f"  已过期:   {result.expired}（其中自动续费 {result.expired_auto_renew}）")
+    print(f"  耗时:     {result.elapsed:.2f}s（{result.chunks} 批）")
+    for phase, seconds in result.phases.items():
+        print(f"    {phase:<8}{seconds:.3f}s")
+
+
+async def reconcile_payments(concurrency: Optional[int], rate: Optional[float]) -> None:
+    """向各已配置提供商查询待支付记录的交易状态并回写"""
+    async with AsyncSessionLocal() as db:
+        summary = await ReconciliationService(
+            db, concurrency=concurrency, rate_per_second=rate
+        ).run()
+    await close_db()
+
+    print(f"支付对账完成（{summary.started_at.isoformat()}）")
+    print(f"  扫描:     {summary.scanned}（{summary.batches} 批，最大并发 {summary.max_in_flight}）")
+    print(f"  已支付:   {summary.paid}")
+    print(f"  已关闭:   {summary.closed}")
+    print(f"  未支付:   {summary.waiting}")
+    print(f"  查询失败: {summary.errors}")
+    for sample in summary.error_samples:
+        print(f"    {sample}")
+    print(f"  耗时:     {summary.elapsed:.2f}s")
+
+
+async def dispatch_outbox(batch_size: Optional[int], max_batches: Optional[int]) -> None:
+    """投递发件箱中的未分发事件"""
+    async with AsyncSessionLocal() as db:
+        result = await OutboxService(db, batch_size=batch_size).dispatch(max_batches)
+    await close_db()
+
+    print("发件箱分发完成")
+    print(f"  已投递:   {result.dispatched}（{result.batches} 批）")
+    print(f"  投递失败: {result.failed}")
+    print(f"  放弃投递: {result.dead}")
+    print(f"  顺序跳过: {result.blocked}")
+    print(f"  剩余积压: {result.backlog}（最早 {result.lag_seconds:.1f}s 前）")
+    print(f"  耗时:     {result.elapsed:.2f}s")
+
+
+async def db_upgrade() -> None:
+    """升级数据库到最新迁移版本"""
+    from app.core.migrations import upgrade_database
+
+    before, after = await upgrade_database(engine)
+    await close_db()
+
+    print("数据库迁移完成")
+    print(f"  升级前:   {before or '无'}")
+    print(f"  当前版本: {after}")
+
+
+def cold_start_report(module: str, top: int, check: bool) -> None:
+    """输出导入 module 的逐模块耗时；check 时超出预算或提前加载重依赖则以非零状态退出"""
+    from app.core.coldstart import measure_imports
+
+    report = measure_imports(module)
+    budget = settings.cold_start_budget_ms
+    eager = report.eager_lazy_packages()
+
+    print(f"冷启动报告（import {module}）")
+    print(f"  总耗时:   {report.total_ms:.0f}ms（预算 {budget}ms）")
+    print(f"  模块数:   {len(report.imports)}")
+    print("  最慢模块（含子模块 / 自身）:")
+    for record in report.slowest(top):
+        print(
+            f"    {record.cumulative_us / 1000:>8.1f}ms {record.self_us / 1000:>8.1f}ms  "
+            f"{'  ' * record.depth}{record.name}"
+        )
+    print("  按顶层包（自身耗时）:")
+    for package, self_us in report.by_package(top):
+        print(f"    {self_us / 1000:>8.1f}ms  {package}")
+    print(f"  提前加载的重依赖: {', '.join(eager) or '无'}")
+
+    if check and (report.total_ms > budget or eager):
+        sys.exit(1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="SocksFlow 管理命令")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    billing = commands.add_parser("billing-run", help="自动续费批处理")
+    billing.add_argument(
+        "--as-of",
+        type=datetime.fromisoformat,
+        default=None,
+        help="计费时间点（UTC，ISO 格式），默认当前时间",
+    )
+    billing.add_argument("--chunk-size", type=int, default=None, help="每批处理的订阅数")
+
+    delivery = commands.add_parser("delivery-run", help="按下次配送时间生成发货订单")
+    delivery.add_argument(
+        "--as-of",
+        type=datetime.fromisoformat,
+        default=None,
+        help="时间点（UTC，ISO 格式），默认当前时间",
+    )
+    delivery.add_argument("--batch-size", type=int, default=None, help="每批处理的订阅数")
+    delivery.add_argument("--dry-run", action="store_true", help="只报告将要生成的订单和各阶段耗时")
+
+    sweep = commands.add_parser("sweep-pending", help="取消超时未支付的订单和支付记录")
+    sweep.add_argument("--ttl-minutes", type=int, default=None, help="待支付有效期（分钟）")
+
+    expiry = commands.add_parser("sweep-expired", help="将到期的活跃订阅标记为过期")
+    expiry.add_argument("--grace-hours", type=int, default=None, help="自动续费订阅的宽限期（小时）")
+
+    reconcile = commands.add_parser("reconcile-payments", help="待支付记录对账（所有已配置的提供商）")
+    reconcile.add_argument("--concurrency", type=int, default=None, help="并发查询数")
+    reconcile.add_argument("--rate", type=float, default=None, help="每秒查询上限")
+
+    outbox = commands.add_parser("dispatch-outbox", help="投递发件箱中的未分发事件")
+    outbox.add_argument("--batch-size", type=int, default=None, help="每批投递的事件数")
+    outbox.add_argument("--max-batches", type=int, default=None, help="最多处理的批数")
+
+    commands.add_parser("db-upgrade", help="升级数据库到最新迁移版本（create_all 建出的库以初始迁移为基线）")
+
+    cold_start = commands.add_parser("cold-start-report", help="在新进程中测量应用入口的逐模块导入耗时")
+    cold_start.add_argument("--module", default="app.main", help="导入的模块")
+    cold_start.add_argument("--top", type=int, default=25, help="列出的模块 / 包数量")
+    cold_start.add_argument("--check", action="store_true", help="超出 COLD_START_BUDGET_MS 或提前加载重依赖时退出码为 1")
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "billing-run":
+        asyncio.run(billing_run(args.as_of, args.chunk_size))
+    elif args.command == "delivery-run":
+        asyncio.run(delivery_run(args.as_of, args.batch_size, args.dry_run))
+    elif args.command == "sweep-pending":
+        asyncio.run(sweep_pending(args.ttl_minutes))
+    elif args.command == "sweep-expired":
+        asyncio.run(sweep_expired(args.grace_hours))
+    elif args.command == "reconcile-payments":
+        asyncio.run(reconcile_payments(args.concurrency, args.rate))
+    elif args.command == "dispatch-outbox":
+        asyncio.run(dispatch_outbox(args.batch_size, args.max_batches))
+    elif args.command == "db-upgrade":
+        asyncio.run(db_upgrade())
+    elif args.command == "cold-start-report":
+        cold_start_report(args.module, args.top, args.check)
+
+
+if __name__ == "__main__":
+    main()
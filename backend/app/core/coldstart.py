@@ -0,0 +1,123 @@
+"""
+冷启动分析
+在全新子进程中以 python -X importtime 导入应用入口，解析逐模块导入耗时（自身 / 含子模块），
+供 python -m app.cli cold-start-report 与导入耗时回归测试使用
+"""
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+APP_MODULE = "app.main"
+
+# 不常用的重依赖：只在实际使用时导入（支付宝 SDK、Celery 及其消息库、微信支付加解密）
+LAZY_PACKAGES = ("alipay", "celery", "kombu", "Cryptodome")
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# 子进程在导入目标模块前向 stderr 写入的分隔行，之前的是解释器自身启动的导入
+_MARKER = "#cold-start"
+
+_SCRIPT = f"""
+import sys, time
+sys.stderr.write("{_MARKER}\\n")
+sys.stderr.flush()
+started = time.perf_counter()
+import {{module}}
+print(time.perf_counter() - started)
+"""
+
+
+@dataclass
+class ModuleImport:
+    """单个模块的导入耗时（微秒）"""
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int  # 嵌套层级（0 为目标模块直接导入）
+
+    @property
+    def package(self) -> str:
+        return self.name.partition(".")[0]
+
+
+@dataclass
+class ColdStartReport:
+    """冷启动报告"""
+    module: str
+    elapsed: float = 0.0  # 导入目标模块的总耗时（秒，含 importtime 记录开销）
+    imports: list[ModuleImport] = field(default_factory=list)
+
+    @property
+    def total_ms(self) -> float:
+        return self.elapsed * 1000
+
+    @property
+    def packages(self) -> set[str]:
+        """导入目标模块时加载的顶层包"""
+        return {record.package for record in self.imports}
+
+    def slowest(self, limit: int = 20) -> list[ModuleImport]:
+        """按含子模块耗时排序的最慢模块"""
+        return sorted(self.imports, key=lambda record: record.cumulative_us, reverse=True)[:limit]
+
+    def by_package(self, limit: int = 20) -> list[tuple[str, int]]:
+        """按顶层包汇总的自身耗时（微秒）"""
+        totals: dict[str, int] = defaultdict(int)
+        for record in self.imports:
+            totals[record.package] += record.self_us
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def eager_lazy_packages(self) -> list[str]:
+        """应延迟导入却在启动时加载的包"""
+        return [package for package in LAZY_PACKAGES if package in self.packages]
+
+
+def parse_importtime(lines: Iterable[str]) -> list[ModuleImport]:
+    """
+    解析 -X importtime 输出
+
+    格式: "import time:  <自身 us> | <累计 us> | <缩进><模块名>"，每层嵌套缩进两个空格
+    """
+    records = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            records.append(ModuleImport(
+                name=name.strip(),
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                depth=(len(name) - len(name.lstrip()) - 1) // 2,
+            ))
+        except ValueError:
+            # 表头 "self [us] | cumulative | imported package"
+            continue
+    return records
+
+
+def measure_imports(module: str = APP_MODULE, python: Optional[str] = None) -> ColdStartReport:
+    """
+    在全新解释器中导入 module 并记录逐模块耗时
+
+    Raises:
+        RuntimeError: 子进程导入失败
+    """
+    process = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", _SCRIPT.format(module=module)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{process.stderr[-2000:]}")
+
+    _, _, measured = process.stderr.partition(_MARKER + "\n")
+    return ColdStartReport(
+        module=module,
+        elapsed=float(process.stdout.strip().splitlines()[-1]),
+        imports=parse_importtime(measured.splitlines()),
+    )
@@ -0,0 +1,177 @@
+"""
+响应压缩模块
+gzip / brotli 压缩中间件（最小体积阈值 + Content-Type 白名单）以及预压缩静态响应
+"""
+import gzip
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli  # 可选依赖：安装 brotli 后自动启用
+except ImportError:  # pragma: no cover - 取决于部署环境
+    brotli = None
+
+# 默认可压缩的 Content-Type
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def choose_encoding(accept_encoding: str, enable_brotli: bool = True) -> Optional[str]:
+    """
+    根据 Accept-Encoding 选择压缩算法
+
+    Returns:
+        "br" / "gzip"，客户端不支持时返回 None
+    """
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(token.strip())
+
+    if enable_brotli and brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int = 6) -> bytes:
+    """按指定算法压缩"""
+    if encoding == "br":
+        # brotli 质量 0-11，映射 gzip 级别保持相近的 CPU 开销
+        return brotli.compress(body, quality=min(11, max(0, level - 2)))
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件
+
+    - 仅压缩非流式响应（单个 body 消息）
+    - 小于 minimum_size 的响应不压缩
+    - 只压缩白名单内的 Content-Type
+    - 已设置 Content-Encoding 的响应（如预压缩响应）原样返回
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        compresslevel: int = 6,
+        compressible_types: Iterable[str] = DEFAULT_COMPRESSIBLE_TYPES,
+        enable_brotli: bool = True,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.compressible_types = tuple(compressible_types)
+        self.enable_brotli = enable_brotli
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), self.enable_brotli
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def is_compressible(self, content_type: str) -> bool:
+        content_type = content_type.lower()
+        return any(content_type.startswith(t) for t in self.compressible_types)
+
+
+class _CompressionResponder:
+    """单次响应的压缩处理"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        self.passthrough = True
+        start = self.start_message
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+
+        if (
+            message.get("more_body", False)
+            or "content-encoding" in headers
+            or len(body) < self.middleware.minimum_size
+            or not self.middleware.is_compressible(headers.get("content-type", ""))
+        ):
+            await self._send(start)
+            await self._send(message)
+            return
+
+        compressed = compress(body, self.encoding, self.middleware.compresslevel)
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": compressed})
+
+
+class PrecompressedPayload:
+    """
+    预压缩静态响应
+
+    内容不变的响应（如计划目录）在构建时压缩一次，之后按请求的 Accept-Encoding 直接返回对应字节
+    """
+
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str = "application/json",
+        compresslevel: int = 9,
+        enable_brotli: bool = True,
+    ) -> None:
+        self.media_type = media_type
+        self.enable_brotli = enable_brotli
+        self.variants: dict[Optional[str], bytes] = {
+            None: body,
+            "gzip": compress(body, "gzip", compresslevel),
+        }
+        if enable_brotli and brotli is not None:
+            # 只压缩一次，使用最高质量
+            self.variants["br"] = brotli.compress(body, quality=11)
+
+    def response(self, request: Request) -> Response:
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""), self.enable_brotli)
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=self.variants[encoding],
+            media_type=self.media_type,
+            headers=headers,
+        )
@@ -0,0 +1,80 @@
+"""
+乐观并发控制
+订单、支付、订阅带 version 列：状态变更以 UPDATE ... WHERE id = :id AND version = :v
+比较并交换，冲突时重新加载行并有限次重试，不持有行锁
+"""
+from datetime import datetime
+from typing import Any, Callable, Optional, TypeVar
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+
+class ConcurrentUpdateError(Exception):
+    """重试后仍与并发更新冲突"""
+
+
+async def compare_and_swap(db: AsyncSession, obj: Any, values: dict[str, Any]) -> bool:
+    """
+    仅当行的版本号仍等于对象上的版本号时写入 values（版本号加一）
+
+    成功时同步更新对象上的属性（不再额外查询）
+
+    Returns:
+        bool: 是否写入成功（False 表示行已被并发修改）
+    """
+    model = type(obj)
+    values = {**values, "updated_at": datetime.utcnow(), "version": obj.version + 1}
+    result = await db.execute(
+        update(model)
+        .where(model.id == obj.id, model.version == obj.version)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    for key, value in values.items():
+        set_committed_value(obj, key, value)
+    return True
+
+
+async def transition(
+    db: AsyncSession,
+    obj: T,
+    apply: Callable[[T], Optional[dict[str, Any]]],
+    attempts: Optional[int] = None,
+) -> bool:
+    """
+    以比较并交换方式执行状态变更
+
+    apply 根据对象当前状态返回要写入的字段；返回 None 表示无需变更，
+    状态不允许变更时抛出 ValueError。版本冲突时重新加载对象后再次执行 apply，
+    冲突次数计入 optimistic_conflicts_total{entity}。
+
+    Returns:
+        bool: 是否写入了变更
+
+    Raises:
+        ValueError: 当前状态不允许变更
+        ConcurrentUpdateError: 超过重试次数仍冲突
+    """
+    entity = type(obj).__tablename__
+    attempts = attempts or settings.optimistic_retry_attempts
+    for attempt in range(attempts):
+        if attempt:
+            await db.refresh(obj)
+        values = apply(obj)
+        if values is None:
+            return False
+        if await compare_and_swap(db, obj, values):
+            return True
+        metrics.inc("optimistic_conflicts_total", entity=entity)
+
+    metrics.inc("optimistic_conflicts_exhausted_total", entity=entity)
+    raise ConcurrentUpdateError(f"{entity} {obj.id} 并发更新冲突，重试 {attempts} 次后放弃")
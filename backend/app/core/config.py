@@ -28,6 +28,23 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     
+    # 服务进程（python -m app.serve）
+    web_concurrency: Optional[int] = None  # worker 数，默认按 CPU 配额与内存限制自动计算
+    worker_memory_mb: int = 256  # 每个 worker 预估内存（按内存限制计算 worker 数上限）
+    worker_max_requests: int = 10000  # 处理该数量请求后回收 worker（0 表示不回收）
+    worker_max_requests_jitter: int = 1000  # 回收阈值随机抖动，避免 worker 同时重启
+    worker_timeout_seconds: int = 60  # worker 无响应超过该时长被主进程重启
+    graceful_timeout_seconds: int = 30  # 关闭 / 重载时等待进行中请求完成的时长
+    keepalive_seconds: int = 5
+    preload_app: bool = True  # 主进程预加载应用后 fork（节省内存、加快 worker 启动）
+    
+    # 启动预热（worker 就绪前建立连接、编译热点查询与序列化器、构建静态目录）
+    warmup_enabled: bool = True
+    warmup_pool_connections: int = 2  # 预先建立的数据库连接数（不超过连接池大小）
+    
+    # 冷启动（python -m app.cli cold-start-report）
+    cold_start_budget_ms: int = 2500  # 导入 app.main 的耗时预算（测试超出即失败）
+    
     # 安全配置
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
@@ -36,6 +53,8 @@ class Settings(BaseSettings):
     # 数据库配置 (SQLite)
     database_url: str = "sqlite+aiosqlite:///./socksflow.db"
     database_echo: bool = False
+    database_create_all: bool = False  # 本地开发：数据库尚未迁移时 create_all 建表（生产执行 alembic upgrade head）
+    optimistic_retry_attempts: int = 3  # 订单/支付/订阅状态变更版本冲突时的最多尝试次数
     
     # Redis 配置
     redis_url: str = "redis://localhost:6379/0"
@@ -43,6 +62,37 @@ class Settings(BaseSettings):
     # Celery 配置
     celery_broker_url: str = "redis://localhost:6379/1"
     celery_result_backend: str = "redis://localhost:6379/2"
+    # eager 模式：任务在当前进程内同步执行（测试、单机部署）
+    # 单机部署也可使用内存 broker：CELERY_BROKER_URL=memory:// CELERY_RESULT_BACKEND=cache+memory://
+    celery_task_always_eager: bool = False
+    
+    # 续费批处理
+    billing_chunk_size: int = 1000  # 每批处理的订阅数（每批一个事务）
+    billing_period_days: int = 30  # 每次续费延长天数
+    
+    # 配送生成
+    delivery_batch_size: int = 500  # 每批处理的订阅数（每批一个事务）
+    
+    # 待支付清理
+    pending_ttl_minutes: int = 120  # 超过该时长仍未支付的订单/支付记录自动取消
+    sweep_chunk_size: int = 1000  # 每条 UPDATE 处理的行数
+    expiry_grace_hours: int = 48  # 自动续费订阅到期后等待续费的宽限期
+    
+    # 支付对账
+    reconcile_concurrency: int = 8  # 同时进行的交易查询数（各提供商共用）
+    reconcile_rate_per_second: float = 20.0  # 查询速率上限（0 表示不限）
+    reconcile_batch_size: int = 200  # 每批查询并回写的支付记录数
+    reconcile_min_age_seconds: int = 60  # 只对账创建超过该时长的支付记录
+    
+    # 事件发件箱
+    outbox_batch_size: int = 200  # 每批分发的事件数（每批一个事务）
+    outbox_max_attempts: int = 10  # 单个事件最多投递次数，超过后放弃（标记 failed_at）
+    
+    # 幂等键（Idempotency-Key：下单、创建订阅、发起支付）
+    idempotency_backend: str = "memory"  # memory（单进程）, redis（多进程/多实例共享，使用 redis_url）
+    idempotency_ttl_seconds: int = 24 * 60 * 60  # 已完成响应的保留时长
+    idempotency_lock_seconds: int = 60  # 处理中占位的最长保留时长（进程崩溃后自动过期）
+    idempotency_wait_seconds: float = 10.0  # 并发重复请求等待首个请求完成的最长时间
     
     # 前端 URL（用于 CORS）
     frontend_url: str = "http://localhost:3000"
@@ -53,18 +103,53 @@ class Settings(BaseSettings):
         "https://*.vercel.app",  # 允许所有 Vercel 预览域名
     ]
     
+    # 可信 ORM 对象直出序列化（关闭后退回 Pydantic 校验）
+    trusted_serialization: bool = True
+    
+    # 响应压缩配置
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # 小于该字节数不压缩
+    compression_level: int = 6
+    compression_brotli: bool = True  # 需安装 brotli
+    
     # 支付配置
     alipay_app_id: Optional[str] = None
     alipay_private_key: Optional[str] = None
     alipay_public_key: Optional[str] = None
+    alipay_gateway_url: Optional[str] = None  # 覆盖网关地址（如本地模拟网关 benchmarks.mock_alipay）
+    alipay_timeout_seconds: float = 10.0  # 单次支付宝调用超时
+    alipay_executor_workers: int = 8  # 支付宝 SDK 签名/验签专用线程数
+    inbox_batch_size: int = 100  # 支付通知收件箱每批处理数
+    inbox_max_attempts: int = 5  # 单条通知最多处理次数
+    # 开发测试：未配置的提供商下单即模拟支付成功、回调跳过验签（生产必须关闭）
+    payment_mock_enabled: bool = False
+    wechat_pay_appid: Optional[str] = None
     wechat_pay_mchid: Optional[str] = None
-    wechat_pay_api_key: Optional[str] = None
+    wechat_pay_api_key: Optional[str] = None  # APIv3 密钥（解密回调通知）
+    wechat_pay_private_key: Optional[str] = None  # 商户 API 私钥（请求签名）
+    wechat_pay_cert_serial: Optional[str] = None  # 商户 API 证书序列号
+    wechat_pay_platform_public_key: Optional[str] = None  # 微信支付平台公钥（验证响应和回调签名）
+    wechat_pay_api_base: str = "https://api.mch.weixin.qq.com"
+    wechat_pay_timeout_seconds: float = 10.0
+    
+    # 出站 HTTP 客户端（支付提供商共享，长连接）
+    http_pool_size: int = 20  # 最大连接数
+    http_keepalive_expiry_seconds: float = 30.0  # 空闲连接保持时长
+    http2_enabled: bool = True  # 需安装 httpx[http2]
     
     # 邮件配置
     smtp_host: Optional[str] = None
     smtp_port: int = 587
     smtp_user: Optional[str] = None
     smtp_password: Optional[str] = None
+    smtp_from: Optional[str] = None  # 发件人地址，默认使用 smtp_user
+    smtp_use_tls: bool = True  # 连接后执行 STARTTLS
+    smtp_timeout_seconds: float = 10.0
+    smtp_pool_size: int = 4  # 保持的已登录 SMTP 连接数（也是并发发送数）
+    smtp_connection_max_age_seconds: int = 300  # 连接复用上限时长，超过后重建
+    smtp_batch_size: int = 50  # 每个连接一次连续发送的邮件数
+    smtp_max_attempts: int = 3  # 单封邮件最多发送次数，之后进入死信
+    smtp_retry_backoff_seconds: float = 1.0  # 重试退避基数（指数增长）
     
     # 文件存储
     storage_type: str = "local"  # local, oss, s3
@@ -4,7 +4,7 @@
 """
 from typing import AsyncGenerator
 
-from sqlalchemy import MetaData
+from sqlalchemy import Insert, MetaData
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -91,10 +91,40 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+def insert_ignore(db: AsyncSession, model: type) -> Insert:
+    """
+    构造"冲突时忽略"的批量插入语句（INSERT ... ON CONFLICT DO NOTHING）
+    
+    用于可重复执行的批处理：唯一键已存在的行被跳过
+    
+    Args:
+        db: 数据库会话（用于判断方言）
+        model: 模型类
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"不支持的数据库: {dialect}")
+    return insert(model).on_conflict_do_nothing()
+
+
 async def init_db() -> None:
-    """初始化数据库（创建所有表）"""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """
+    启动时检查数据库结构是否已迁移到最新版本
+    
+    表结构由 Alembic 迁移管理（部署时执行 alembic upgrade head）；
+    DATABASE_CREATE_ALL=true 时（本地开发）对尚未迁移的数据库执行 create_all 并标记为最新版本
+    
+    Raises:
+        SchemaOutOfDateError: 数据库未迁移到最新版本
+    """
+    # 迁移模块依赖 Alembic，只在应用启动时加载（CLI / Celery 不需要）
+    from app.core.migrations import ensure_schema
+    
+    await ensure_schema(engine, create_all=settings.database_create_all)
 
 
 async def close_db() -> None:
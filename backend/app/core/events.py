@@ -0,0 +1,34 @@
+"""
+领域事件模块
+领域事件日志（socksflow.events），发件箱分发器的默认投递目标
+"""
+import logging
+from datetime import datetime
+from typing import Any, Optional
+
+from app.core.responses import json_dumps
+
+logger = logging.getLogger("socksflow.events")
+
+
+def emit_event(
+    event_type: str,
+    aggregate_id: int,
+    payload: Optional[dict[str, Any]] = None,
+) -> None:
+    """
+    发出领域事件
+
+    Args:
+        event_type: 事件类型，如 "subscription.expired"
+        aggregate_id: 聚合ID（如订阅ID）
+        payload: 事件数据
+    """
+    logger.info(
+        json_dumps({
+            "type": event_type,
+            "aggregate_id": aggregate_id,
+            "payload": payload or {},
+            "occurred_at": datetime.utcnow(),
+        }).decode()
+    )
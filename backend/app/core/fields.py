@@ -0,0 +1,94 @@
+"""
+稀疏字段集（?fields=）支持
+按请求字段裁剪查询列与响应输出
+"""
+from typing import Any, Iterable, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, noload, selectinload
+
+from app.core.serializers import get_serializer
+
+# 无论请求哪些字段，查询时始终加载（用于权限校验和乐观锁）
+ALWAYS_LOADED = ("id", "user_id", "version")
+
+
+def parse_fields(
+    raw: Optional[str],
+    schema: type[BaseModel],
+) -> Optional[frozenset[str]]:
+    """
+    解析 fields 查询参数
+
+    Args:
+        raw: 逗号分隔的字段列表，如 "id,status,total_amount"
+        schema: 响应 Schema，用于校验字段名
+
+    Returns:
+        字段集合；未传或为空时返回 None（表示返回全部字段）
+
+    Raises:
+        ValueError: 包含未知字段
+    """
+    if not raw:
+        return None
+
+    fields = frozenset(f.strip() for f in raw.split(",") if f.strip())
+    if not fields:
+        return None
+
+    unknown = fields - set(schema.model_fields)
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+
+    return fields
+
+
+def load_options(model: type, fields: Optional[Iterable[str]]) -> list:
+    """
+    根据字段集生成查询加载选项
+
+    - 列只加载请求的字段（加上 id/user_id）
+    - 请求的关系字段使用 selectin 加载，其余关系不加载
+
+    Args:
+        model: SQLAlchemy 模型类
+        fields: 字段集合，None 表示使用模型默认加载策略
+
+    Returns:
+        list: 传给 select().options() 的加载选项
+    """
+    if fields is None:
+        return []
+
+    mapper = inspect(model)
+    wanted = set(fields) | {name for name in ALWAYS_LOADED if name in mapper.column_attrs}
+
+    columns = [getattr(model, name) for name in wanted if name in mapper.column_attrs]
+    options: list = [load_only(*columns)]
+
+    for relationship in mapper.relationships:
+        attr = getattr(model, relationship.key)
+        if relationship.key in wanted:
+            options.append(selectinload(attr))
+        else:
+            options.append(noload(attr))
+
+    return options
+
+
+def dump_fields(
+    obj: Any,
+    schema: type[BaseModel],
+    fields: frozenset[str],
+) -> dict:
+    """
+    按字段集序列化 ORM 对象
+
+    只访问请求的属性，不会触发未加载列的懒加载
+
+    Returns:
+        dict: 字典（Decimal/datetime 等由 FastJSONResponse 编码）
+    """
+    return get_serializer(schema, fields).dump(obj)
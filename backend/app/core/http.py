@@ -0,0 +1,60 @@
+"""
+共享出站 HTTP 客户端
+支付提供商共用一个长连接 httpx.AsyncClient（keep-alive 连接池，安装 h2 后启用 HTTP/2）
+"""
+import asyncio
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+try:
+    import h2  # 可选依赖：安装 httpx[http2] 后自动启用 HTTP/2
+except ImportError:
+    h2 = None
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_http_client(**kwargs) -> httpx.AsyncClient:
+    """按配置创建客户端（测试可传入 transport）"""
+    return httpx.AsyncClient(
+        http2=settings.http2_enabled and h2 is not None,
+        limits=httpx.Limits(
+            max_connections=settings.http_pool_size,
+            max_keepalive_connections=settings.http_pool_size,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        ),
+        **kwargs,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环共享的客户端（首次调用时创建）
+
+    连接绑定事件循环：API 进程只有一个循环，整个进程复用同一个客户端；
+    Celery 任务每次在新循环中执行（run_async），循环变化时重建客户端
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client, _client_loop = create_http_client(), loop
+    return _client
+
+
+def set_http_client(client: Optional[httpx.AsyncClient]) -> None:
+    """替换共享客户端（测试中注入 MockTransport）"""
+    global _client, _client_loop
+    _client = client
+    _client_loop = asyncio.get_running_loop() if client is not None else None
+
+
+async def close_http_client() -> None:
+    """关闭共享客户端（应用关闭时调用）"""
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client, _client_loop = None, None
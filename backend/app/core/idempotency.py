@@ -0,0 +1,375 @@
+"""
+幂等键模块
+带 Idempotency-Key 请求头的创建类 POST：首次执行后把响应（状态码、响应头、正文字节）按 TTL
+存入存储，客户端重试直接回放；并发的重复请求等待进行中的那一次完成，不会重复执行。
+
+存储后端：
+- memory：进程内字典（单进程部署、测试）
+- redis：多进程 / 多实例共享（使用 redis_url）
+
+端点用 @idempotent 标记，所在路由使用 route_class=IdempotentRoute
+"""
+import asyncio
+import hashlib
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import orjson
+from fastapi import HTTPException, Request, status
+from fastapi.routing import APIRoute
+from starlette.responses import Response, StreamingResponse
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# 回放时保留的响应头（content-length 等由回放响应重新生成）
+STORED_HEADERS = ("content-type", "location")
+
+# 记录格式：类型(1) + 请求指纹(32) + ...
+#   处理中：b"\x00" + 指纹 + 随机令牌(8)
+#   已完成：b"\x01" + 指纹 + 状态码(2) + 响应头长度(2) + 响应头 JSON + 正文
+_PENDING = b"\x00"
+_DONE = b"\x01"
+_FINGERPRINT_SIZE = 32
+_DONE_HEADER = struct.Struct(">HH")
+
+
+@dataclass
+class StoredResponse:
+    """已完成请求的响应"""
+
+    fingerprint: bytes
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+
+    def encode(self) -> bytes:
+        headers = orjson.dumps(self.headers)
+        return (
+            _DONE + self.fingerprint
+            + _DONE_HEADER.pack(self.status_code, len(headers)) + headers + self.body
+        )
+
+    @classmethod
+    def decode(cls, record: bytes) -> "StoredResponse":
+        offset = 1 + _FINGERPRINT_SIZE
+        status_code, headers_size = _DONE_HEADER.unpack_from(record, offset)
+        offset += _DONE_HEADER.size
+        return cls(
+            fingerprint=record_fingerprint(record),
+            status_code=status_code,
+            headers=orjson.loads(record[offset:offset + headers_size]),
+            body=record[offset + headers_size:],
+        )
+
+    def to_response(self) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            headers={**self.headers, REPLAYED_HEADER: "true"},
+        )
+
+
+def is_pending(record: bytes) -> bool:
+    return record[:1] == _PENDING
+
+
+def record_fingerprint(record: bytes) -> bytes:
+    return record[1:1 + _FINGERPRINT_SIZE]
+
+
+class IdempotencyStore:
+    """
+    幂等记录存储接口
+
+    - claim: 原子地写入处理中占位；键已存在时返回已有记录
+    - save: 写入已完成响应（TTL 为 idempotency_ttl_seconds）
+    - release: 删除自己的处理中占位（请求失败，允许重试重新执行）
+    - wait: 等待处理中的记录完成，超时或被释放时返回 None
+    """
+
+    async def claim(self, key: str, pending: bytes) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def save(self, key: str, record: bytes) -> None:
+        raise NotImplementedError
+
+    async def release(self, key: str, pending: bytes) -> None:
+        raise NotImplementedError
+
+    async def wait(self, key: str, timeout: float) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """进程内存储（过期记录在写入时顺带清理）"""
+
+    def __init__(self, ttl: float, lock_ttl: float, purge_interval: float = 60.0):
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.purge_interval = purge_interval
+        self._records: dict[str, tuple[float, bytes]] = {}
+        self._events: dict[str, asyncio.Event] = {}
+        self._next_purge = time.monotonic() + purge_interval
+
+    def _get(self, key: str) -> Optional[bytes]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._records[key]
+            self._notify(key)
+            return None
+        return entry[1]
+
+    def _notify(self, key: str) -> None:
+        event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        for key in [k for k, (expires, _) in self._records.items() if expires <= now]:
+            del self._records[key]
+            self._notify(key)
+
+    async def claim(self, key: str, pending: bytes) -> Optional[bytes]:
+        self._purge()
+        existing = self._get(key)
+        if existing is not None:
+            return existing
+        self._records[key] = (time.monotonic() + self.lock_ttl, pending)
+        return None
+
+    async def save(self, key: str, record: bytes) -> None:
+        self._records[key] = (time.monotonic() + self.ttl, record)
+        self._notify(key)
+
+    async def release(self, key: str, pending: bytes) -> None:
+        if self._get(key) == pending:
+            del self._records[key]
+            self._notify(key)
+
+    async def wait(self, key: str, timeout: float) -> Optional[bytes]:
+        deadline = time.monotonic() + timeout
+        while True:
+            record = self._get(key)
+            if record is None or not is_pending(record):
+                return record
+            remaining = min(deadline, self._records[key][0]) - time.monotonic()
+            if remaining <= 0:
+                return None
+            event = self._events.setdefault(key, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Redis 存储（SET NX PX 占位，轮询等待进行中的请求）"""
+
+    # 只删除自己的占位：占位过期后键可能已被其他请求重新占用
+    _RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl: float,
+        lock_ttl: float,
+        poll_interval: float = 0.05,
+        max_poll_interval: float = 0.5,
+    ):
+        from redis.asyncio import Redis
+
+        self.redis = Redis.from_url(url)
+        self.ttl_ms = int(ttl * 1000)
+        self.lock_ttl_ms = int(lock_ttl * 1000)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._release = self.redis.register_script(self._RELEASE_SCRIPT)
+
+    async def claim(self, key: str, pending: bytes) -> Optional[bytes]:
+        while True:
+            if await self.redis.set(key, pending, nx=True, px=self.lock_ttl_ms):
+                return None
+            existing = await self.redis.get(key)
+            # 两次调用之间记录恰好过期则重新占位
+            if existing is not None:
+                return existing
+
+    async def save(self, key: str, record: bytes) -> None:
+        await self.redis.set(key, record, px=self.ttl_ms)
+
+    async def release(self, key: str, pending: bytes) -> None:
+        await self._release(keys=[key], args=[pending])
+
+    async def wait(self, key: str, timeout: float) -> Optional[bytes]:
+        deadline = time.monotonic() + timeout
+        interval = self.poll_interval
+        while True:
+            record = await self.redis.get(key)
+            if record is None or not is_pending(record):
+                return record
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_poll_interval)
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    """按配置创建存储"""
+    backend = settings.idempotency_backend.lower()
+    if backend == "memory":
+        return MemoryIdempotencyStore(
+            settings.idempotency_ttl_seconds, settings.idempotency_lock_seconds
+        )
+    if backend == "redis":
+        return RedisIdempotencyStore(
+            settings.redis_url, settings.idempotency_ttl_seconds, settings.idempotency_lock_seconds
+        )
+    raise ValueError(f"不支持的幂等存储: {settings.idempotency_backend}")
+
+
+_store: Optional[IdempotencyStore] = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """获取幂等存储单例（首次调用时创建）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_idempotency_store()
+    return _store
+
+
+async def close_idempotency_store() -> None:
+    """关闭幂等存储"""
+    global _store
+    store, _store = _store, None
+    if store is not None:
+        await store.close()
+
+
+def idempotent(endpoint: Callable) -> Callable:
+    """标记端点支持 Idempotency-Key（需放在路由装饰器下方）"""
+    endpoint.__idempotent__ = True
+    return endpoint
+
+
+def _store_key(request: Request, key: str) -> str:
+    """幂等键按调用方（Authorization）隔离"""
+    scope = f"{request.headers.get('authorization', '')}\n{key}".encode()
+    return "idem:" + hashlib.sha256(scope).hexdigest()
+
+
+def _fingerprint(request: Request, body: bytes) -> bytes:
+    """同一幂等键只能用于同一请求（方法 + 路径 + 请求体）"""
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    digest.update(body)
+    return digest.digest()
+
+
+async def handle_idempotent(
+    request: Request,
+    key: str,
+    handler: Callable[[Request], Awaitable[Response]],
+) -> Response:
+    """
+    按幂等键执行或回放请求
+
+    只保存端点正常返回且状态码小于 500 的响应；端点抛出异常（包括 HTTPException）
+    时释放占位，重试会重新执行（失败的请求已回滚，不会留下写入）。
+
+    Raises:
+        HTTPException: 幂等键无效（400）、正在处理（409）、用于不同请求（422）
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_HEADER} 长度应为 1-{MAX_KEY_LENGTH} 个字符",
+        )
+
+    store = get_idempotency_store()
+    store_key = _store_key(request, key)
+    fingerprint = _fingerprint(request, await request.body())
+    pending = _PENDING + fingerprint + os.urandom(8)
+
+    existing = await store.claim(store_key, pending)
+    if existing is not None:
+        if record_fingerprint(existing) != fingerprint:
+            metrics.inc("idempotency_requests_total", outcome="mismatch")
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{IDEMPOTENCY_HEADER} 已用于不同的请求",
+            )
+        if is_pending(existing):
+            existing = await store.wait(store_key, settings.idempotency_wait_seconds)
+            if existing is None or is_pending(existing):
+                metrics.inc("idempotency_requests_total", outcome="in_flight")
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="相同幂等键的请求正在处理，请稍后重试",
+                )
+        metrics.inc("idempotency_requests_total", outcome="replayed")
+        return StoredResponse.decode(existing).to_response()
+
+    try:
+        response = await handler(request)
+    except BaseException:
+        await store.release(store_key, pending)
+        raise
+
+    if response.status_code >= 500 or isinstance(response, StreamingResponse):
+        await store.release(store_key, pending)
+        return response
+
+    headers = {k: response.headers[k] for k in STORED_HEADERS if k in response.headers}
+    await store.save(
+        store_key,
+        StoredResponse(fingerprint, response.status_code, headers, bytes(response.body)).encode(),
+    )
+    metrics.inc("idempotency_requests_total", outcome="executed")
+    return response
+
+
+class IdempotentRoute(APIRoute):
+    """支持 Idempotency-Key 的路由类（只对 @idempotent 标记的端点生效，未带请求头时照常执行）"""
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+        if not getattr(self.endpoint, "__idempotent__", False):
+            return handler
+
+        async def route_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return await handler(request)
+            return await handle_idempotent(request, key, handler)
+
+        return route_handler
@@ -0,0 +1,108 @@
+"""
+数据库迁移模块
+Alembic 迁移是表结构的唯一来源：部署时执行 alembic upgrade head，
+应用启动只检查数据库是否已在最新版本（一次查询），不再逐表反射执行 create_all
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.database import Base
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# 初始迁移：与此前 create_all 建出的表结构一致
+BASELINE_REVISION = "0001"
+
+
+class SchemaOutOfDateError(RuntimeError):
+    """数据库结构版本与代码中的最新迁移不一致"""
+
+
+def alembic_config() -> Config:
+    """Alembic 配置（由应用内调用时不重新配置日志）"""
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+@lru_cache(maxsize=1)
+def head_revision() -> Optional[str]:
+    """代码中的最新迁移版本（每个进程只解析一次迁移脚本，预加载时由主进程解析后继承）"""
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(connection: Connection) -> Optional[str]:
+    """数据库当前的迁移版本（尚未迁移时为 None）"""
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def stamp_head(connection: Connection) -> None:
+    """将数据库标记为最新版本（不执行迁移）"""
+    MigrationContext.configure(connection).stamp(
+        ScriptDirectory.from_config(alembic_config()), "head"
+    )
+
+
+def _upgrade(connection: Connection) -> tuple[Optional[str], Optional[str]]:
+    before = current_revision(connection)
+    if before is None and inspect(connection).has_table("users"):
+        # 由 create_all 建表、尚无迁移版本的数据库：以初始迁移为基线
+        MigrationContext.configure(connection).stamp(
+            ScriptDirectory.from_config(alembic_config()), BASELINE_REVISION
+        )
+    config = alembic_config()
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+    return before, current_revision(connection)
+
+
+async def upgrade_database(engine: AsyncEngine) -> tuple[Optional[str], Optional[str]]:
+    """
+    升级数据库到最新版本（部署时执行，python -m app.cli db-upgrade）
+
+    Returns:
+        tuple: (升级前版本, 升级后版本)
+    """
+    async with engine.connect() as conn:
+        revisions = await conn.run_sync(_upgrade)
+        await conn.commit()
+    return revisions
+
+
+async def ensure_schema(engine: AsyncEngine, create_all: bool = False) -> str:
+    """
+    启动时检查数据库结构
+
+    Args:
+        engine: 数据库引擎
+        create_all: 开发模式，数据库尚无迁移版本时用 create_all 建表并标记为最新版本
+
+    Returns:
+        str: 当前（即最新）迁移版本
+
+    Raises:
+        SchemaOutOfDateError: 数据库未迁移到最新版本
+    """
+    head = head_revision()
+    async with engine.connect() as conn:
+        current = await conn.run_sync(current_revision)
+        if current is None and create_all:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(stamp_head)
+            await conn.commit()
+            current = head
+
+    if current != head:
+        raise SchemaOutOfDateError(
+            f"数据库结构版本为 {current or '无'}，代码需要 {head}，请先执行 alembic upgrade head"
+        )
+    return current
@@ -0,0 +1,47 @@
+"""
+JSON 响应模块
+基于 orjson 的高性能 JSON 编码，原生支持 datetime / Enum，Decimal 精确输出为字符串
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+# UTC 时间输出为 "Z" 后缀，与 Pydantic 的 JSON 输出保持一致
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+def _default(obj: Any) -> Any:
+    """orjson 不支持的类型处理"""
+    if isinstance(obj, Decimal):
+        # 金额按字符串输出，避免浮点精度丢失（与 Pydantic 行为一致）
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(content: Any) -> bytes:
+    """
+    编码为 JSON 字节串
+
+    Args:
+        content: 待编码对象（支持 dict/list/datetime/Enum/Decimal 等）
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    高性能 JSON 响应（应用默认响应类）
+
+    - 使用 orjson 编码，比标准库 json 快数倍
+    - Decimal 输出为字符串，金额不丢精度
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
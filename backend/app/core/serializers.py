@@ -0,0 +1,181 @@
+"""
+ORM 直出序列化模块
+为响应 Schema 编译一次专用序列化函数，将可信的 ORM 对象直接转为 JSON，跳过 Pydantic 重新校验
+"""
+import types
+import typing
+from functools import lru_cache
+from typing import Any, Hashable, Iterable, Mapping, Optional, Sequence
+
+from fastapi import status
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.config import settings
+from app.core.responses import json_dumps
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    """Optional[X] -> X"""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _is_model(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+class ORMSerializer:
+    """
+    编译后的 Schema 序列化器
+
+    按 Schema 字段生成一个直接读取属性、构造字典的函数：
+    - 普通字段原样取值（Decimal/datetime/Enum 交给 orjson 编码）
+    - 嵌套 Schema 字段（含 list[Schema]）递归使用对应的序列化器
+
+    仅用于可信数据（数据库中读出的 ORM 对象），不做类型校验与转换
+    """
+
+    def __init__(self, schema: type[BaseModel], fields: Optional[frozenset[str]] = None):
+        self.schema = schema
+        self.fields = fields
+        self._dump = self._compile()
+
+    def _compile(self):
+        names = [
+            name for name in self.schema.model_fields
+            if self.fields is None or name in self.fields
+        ]
+        namespace: dict[str, Any] = {}
+        entries = []
+
+        for index, name in enumerate(names):
+            annotation = _unwrap_optional(self.schema.model_fields[name].annotation)
+            origin = typing.get_origin(annotation)
+            item = typing.get_args(annotation)[0] if origin is list and typing.get_args(annotation) else None
+
+            if _is_model(annotation):
+                namespace[f"_s{index}"] = get_serializer(annotation)._dump
+                value = f"(None if (v := obj.{name}) is None else _s{index}(v))"
+            elif item is not None and _is_model(item):
+                namespace[f"_s{index}"] = get_serializer(item)._dump
+                value = f"[_s{index}(x) for x in obj.{name}]"
+            else:
+                value = f"obj.{name}"
+            entries.append(f"{name!r}: {value}")
+
+        source = "def dump(obj):\n    return {" + ", ".join(entries) + "}\n"
+        exec(compile(source, f"<serializer {self.schema.__name__}>", "exec"), namespace)
+        return namespace["dump"]
+
+    def dump(self, obj: Any) -> dict:
+        """ORM 对象 -> 字典"""
+        return self._dump(obj)
+
+    def dump_many(self, objs: Iterable[Any]) -> list[dict]:
+        """ORM 对象列表 -> 字典列表"""
+        dump = self._dump
+        return [dump(obj) for obj in objs]
+
+    def dumps(self, obj: Any) -> bytes:
+        """ORM 对象 -> JSON 字节串"""
+        return json_dumps(self._dump(obj))
+
+
+@lru_cache(maxsize=256)
+def get_serializer(
+    schema: type[BaseModel],
+    fields: Optional[frozenset[str]] = None,
+) -> ORMSerializer:
+    """获取 Schema 的序列化器（每个 Schema / 字段组合只编译一次）"""
+    return ORMSerializer(schema, fields)
+
+
+@lru_cache(maxsize=64)
+def _type_adapter(schema: type[BaseModel], many: bool) -> TypeAdapter:
+    return TypeAdapter(list[schema] if many else schema)
+
+
+def prepare_serializer(schema: type[BaseModel]) -> None:
+    """预先编译 Schema 的序列化路径（启动预热使用）"""
+    if settings.trusted_serialization:
+        get_serializer(schema)
+    else:
+        _type_adapter(schema, False)
+        _type_adapter(schema, True)
+
+
+def orm_content(schema: type[BaseModel], data: Any, many: bool = False) -> Any:
+    """
+    将 ORM 数据转换为可 JSON 编码的内容
+
+    settings.trusted_serialization 关闭时退回 Pydantic 校验路径（用于排查问题）
+    """
+    if not settings.trusted_serialization:
+        adapter = _type_adapter(schema, many)
+        return adapter.dump_python(adapter.validate_python(data, from_attributes=True))
+
+    serializer = get_serializer(schema)
+    return serializer.dump_many(data) if many else serializer.dump(data)
+
+
+def orm_response(
+    schema: type[BaseModel],
+    data: Any,
+    many: bool = False,
+    status_code: int = status.HTTP_200_OK,
+) -> Response:
+    """
+    ORM 直出 JSON 响应
+
+    路由返回该响应即启用快速序列化（response_model 仍用于生成 API 文档）
+
+    Args:
+        schema: 响应 Schema
+        data: ORM 对象（many=True 时为对象列表）
+        many: 是否为列表
+        status_code: HTTP 状态码
+    """
+    return Response(
+        content=json_dumps(orm_content(schema, data, many)),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+def batch_orm_response(
+    schema: type[BaseModel],
+    keys: Sequence[Hashable],
+    rows: Mapping[Hashable, Any],
+    user_id: int,
+) -> Response:
+    """
+    批量查询 JSON 响应
+
+    按请求顺序逐项输出 found / not_found / forbidden 标记，
+    只有属于当前用户的记录才输出数据
+
+    Args:
+        schema: 单项数据的响应 Schema
+        keys: 请求的键（ID或编号），保持请求顺序
+        rows: 键 -> ORM 对象
+        user_id: 当前用户ID（用于逐项权限检查）
+    """
+    items = []
+    for key in keys:
+        row = rows.get(key)
+        if row is None:
+            items.append({"key": key, "status": "not_found", "data": None})
+        elif row.user_id != user_id:
+            items.append({"key": key, "status": "forbidden", "data": None})
+        else:
+            items.append({"key": key, "status": "found", "data": orm_content(schema, row)})
+
+    return Response(
+        content=json_dumps({"items": items}),
+        media_type="application/json",
+    )
@@ -5,9 +5,18 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.api import api_router
 from app.core import close_db, init_db, settings
+from app.core.compression import CompressionMiddleware
+from app.core.http import close_http_client
+from app.core.idempotency import close_idempotency_store
+from app.core.metrics import metrics
+from app.core.responses import FastJSONResponse
+from app.services.alipay_gateway import close_alipay_gateway, init_alipay_gateway
+from app.services.mailer import close_mailer
+from app.warmup import warm_up
 
 # 导入所有模型以确保 SQLAlchemy 正确注册
 from app.models import User, SizeProfile, Subscription, Order, Payment, Address
@@ -18,16 +27,27 @@ async def lifespan(app: FastAPI):
     """
     应用生命周期管理
     
-    - 启动时初始化数据库
+    - 启动时初始化数据库、支付宝网关，执行预热后再接收请求
     - 关闭时清理资源
     """
     # 启动
     await init_db()
+    init_alipay_gateway()
+    if settings.warmup_enabled:
+        result = await warm_up(app)
+        print(
+            f"🔥 预热完成 {result.elapsed * 1000:.0f}ms"
+            f"（连接 {result.connections}，查询 {result.statements}，序列化器 {result.serializers}）"
+        )
     print(f"🚀 {settings.app_name} 启动成功！")
     
     yield
     
     # 关闭
+    close_alipay_gateway()
+    close_mailer()
+    await close_idempotency_store()
+    await close_http_client()
     await close_db()
     print("👋 应用已关闭")
 
@@ -41,6 +61,7 @@ def create_application() -> FastAPI:
         docs_url="/api/docs",
         redoc_url="/api/redoc",
         openapi_url="/api/openapi.json",
+        default_response_class=FastJSONResponse,
         lifespan=lifespan,
     )
     
@@ -53,6 +74,15 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # 配置响应压缩
+    if settings.compression_enabled:
+        application.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_size,
+            compresslevel=settings.compression_level,
+            enable_brotli=settings.compression_brotli,
+        )
+    
     # 注册路由
     application.include_router(api_router, prefix="/api/v1")
     
@@ -66,6 +96,12 @@ def create_application() -> FastAPI:
             "service": settings.app_name,
         }
     
+    # 指标端点（Prometheus 文本格式）
+    @application.get("/metrics", tags=["Health"], include_in_schema=False)
+    async def metrics_endpoint():
+        """进程内指标"""
+        return PlainTextResponse(metrics.render())
+    
     return application
 
 
@@ -5,5 +5,18 @@ from app.models.subscription import Subscription
 from app.models.order import Order
 from app.models.payment import Payment
 from app.models.address import Address
+from app.models.payment_notification import PaymentNotification
+from app.models.outbox_event import OutboxEvent
+from app.models.notification_dead_letter import NotificationDeadLetter
 
-__all__ = ["User", "SizeProfile", "Subscription", "Order", "Payment", "Address"]
+__all__ = [
+    "User",
+    "SizeProfile",
+    "Subscription",
+    "Order",
+    "Payment",
+    "Address",
+    "PaymentNotification",
+    "OutboxEvent",
+    "NotificationDeadLetter",
+]
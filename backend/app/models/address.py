@@ -5,7 +5,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import ForeignKey, Integer, String, DateTime, Boolean
+from sqlalchemy import ForeignKey, Index, Integer, String, DateTime, Boolean, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -18,6 +18,16 @@ class Address(Base):
     """用户配送地址"""
     
     __tablename__ = "addresses"
+    __table_args__ = (
+        # 每个用户最多一个默认地址（部分唯一索引只包含默认地址行）
+        Index(
+            "ix_addresses_default_user",
+            "user_id",
+            unique=True,
+            postgresql_where=text("is_default"),
+            sqlite_where=text("is_default"),
+        ),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     
@@ -0,0 +1,39 @@
+"""
+通知死信模型
+永久失败或超过重试次数的邮件保存在这里，便于排查和人工重发
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, Text, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class NotificationDeadLetter(Base):
+    """邮件通知死信"""
+
+    __tablename__ = "notification_dead_letters"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # 收件人和模板
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    template: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+
+    # 渲染后的邮件内容
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+
+    # 失败信息
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+
+    # 时间戳
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+
+    def __repr__(self) -> str:
+        return f"<NotificationDeadLetter(id={self.id}, recipient={self.recipient}, template={self.template})>"
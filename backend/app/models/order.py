@@ -85,6 +85,10 @@ class Order(Base):
         DateTime(timezone=True), nullable=True
     )
     
+    # 乐观锁版本号（每次更新加一，状态变更按版本比较并交换）
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+    
     # 关系
     user: Mapped["User"] = relationship("User", back_populates="orders")
     subscription: Mapped[Optional["Subscription"]] = relationship(
@@ -0,0 +1,59 @@
+"""
+事务性发件箱模型
+状态变更与事件在同一事务中写入，由分发器按批投递给下游
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, DateTime, JSON, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class OutboxEvent(Base):
+    """发件箱事件"""
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # 分发器按 id 顺序扫描未分发事件（部分索引，已分发或已放弃的事件不进索引）
+        Index(
+            "ix_outbox_events_pending",
+            "id",
+            postgresql_where=text("dispatched_at IS NULL AND failed_at IS NULL"),
+            sqlite_where=text("dispatched_at IS NULL AND failed_at IS NULL"),
+        ),
+        # 同一聚合的事件按 id 有序
+        Index("ix_outbox_events_aggregate", "aggregate_type", "aggregate_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # 聚合类型和ID (order/subscription)
+    aggregate_type: Mapped[str] = mapped_column(String(30), nullable=False)
+    aggregate_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # 事件类型，如 "order.paid"
+    event_type: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    # 事件数据
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+
+    # 投递状态
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+
+    # 时间戳
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+    dispatched_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # 超过最大投递次数后放弃的时间（不再重试，也不再阻塞同一聚合的后续事件）
+    failed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<OutboxEvent(id={self.id}, event_type={self.event_type}, aggregate_id={self.aggregate_id})>"
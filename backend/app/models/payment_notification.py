@@ -0,0 +1,63 @@
+"""
+支付通知收件箱模型
+回调先落库再异步处理，(out_trade_no, notify_id) 去重
+"""
+from datetime import datetime
+from typing import Optional
+import enum
+
+from sqlalchemy import Integer, String, DateTime, Enum, JSON, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class NotificationStatus(str, enum.Enum):
+    """通知处理状态"""
+    PENDING = "pending"        # 待处理
+    PROCESSED = "processed"    # 已处理
+    FAILED = "failed"          # 处理失败（超过重试次数或支付记录不存在）
+
+
+class PaymentNotification(Base):
+    """支付通知收件箱"""
+    
+    __tablename__ = "payment_notifications"
+    __table_args__ = (
+        # 支付宝重复通知（相同 notify_id）只保存一次
+        UniqueConstraint("out_trade_no", "notify_id"),
+        # 收件箱按 (status, id) 顺序处理
+        Index("ix_payment_notifications_status_id", "status", "id"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    
+    # 支付提供商 (alipay/wechat)
+    provider: Mapped[str] = mapped_column(String(20), nullable=False)
+    
+    # 商户订单号（即支付号）
+    out_trade_no: Mapped[str] = mapped_column(String(64), nullable=False)
+    
+    # 通知ID（支付宝 notify_id；缺失时为通知内容摘要）
+    notify_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    
+    # 原始通知数据
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    
+    # 处理状态
+    status: Mapped[NotificationStatus] = mapped_column(
+        Enum(NotificationStatus), default=NotificationStatus.PENDING, nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    
+    # 时间戳
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+    processed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    
+    def __repr__(self) -> str:
+        return f"<PaymentNotification(id={self.id}, out_trade_no={self.out_trade_no}, status={self.status})>"
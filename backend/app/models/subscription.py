@@ -4,7 +4,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import ForeignKey, Integer, String, DateTime, Numeric, Enum, Boolean
+from sqlalchemy import ForeignKey, Index, Integer, String, DateTime, Numeric, Enum, Boolean, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 
@@ -33,6 +33,21 @@ class Subscription(Base):
     """用户订阅"""
     
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # 续费批处理按 (auto_renew, status, expires_at) 选取到期订阅
+        Index("ix_subscriptions_renewal_due", "auto_renew", "status", "expires_at"),
+        # 配送生成按 (status, next_delivery_at) 选取到期订阅
+        Index("ix_subscriptions_delivery_due", "status", "next_delivery_at"),
+        # 活跃订阅查询只依赖 status（到期清理保证过期订阅不再是 ACTIVE），部分索引只包含活跃行；
+        # 唯一约束保证每个用户最多一个活跃订阅（并发创建由数据库裁决）
+        Index(
+            "ix_subscriptions_active_user",
+            "user_id",
+            unique=True,
+            postgresql_where=text("status = 'ACTIVE'"),
+            sqlite_where=text("status = 'ACTIVE'"),
+        ),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(
@@ -99,6 +114,10 @@ class Subscription(Base):
         onupdate=datetime.utcnow,
     )
     
+    # 乐观锁版本号（每次更新加一，状态变更按版本比较并交换）
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+    
     # 关系
     user: Mapped["User"] = relationship("User", back_populates="subscriptions")
     orders: Mapped[list["Order"]] = relationship(
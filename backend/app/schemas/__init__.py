@@ -49,6 +49,14 @@ from app.schemas.payment import (
     PaymentStatus,
     PaymentProvider,
 )
+from app.schemas.batch import (
+    BatchGetRequest,
+    OrderBatchGetRequest,
+    BatchGetItem,
+    BatchGetResponse,
+    BatchGetStatus,
+    BATCH_GET_MAX_ITEMS,
+)
 
 __all__ = [
     # User
@@ -97,4 +105,11 @@ __all__ = [
     "PaymentResult",
     "PaymentStatus",
     "PaymentProvider",
+    # Batch
+    "BatchGetRequest",
+    "OrderBatchGetRequest",
+    "BatchGetItem",
+    "BatchGetResponse",
+    "BatchGetStatus",
+    "BATCH_GET_MAX_ITEMS",
 ]
@@ -0,0 +1,53 @@
+"""
+批量查询相关 Pydantic Schema
+"""
+import enum
+from typing import Generic, Optional, TypeVar, Union
+
+from pydantic import BaseModel, Field, model_validator
+
+# 单次批量查询最多条数
+BATCH_GET_MAX_ITEMS = 100
+
+T = TypeVar("T")
+
+
+class BatchGetStatus(str, enum.Enum):
+    """批量查询单项状态"""
+    FOUND = "found"            # 找到
+    NOT_FOUND = "not_found"    # 不存在
+    FORBIDDEN = "forbidden"    # 无权访问
+
+
+class BatchGetRequest(BaseModel):
+    """批量查询请求（按ID）"""
+    ids: list[int] = Field(
+        ..., min_length=1, max_length=BATCH_GET_MAX_ITEMS, description="ID列表"
+    )
+
+
+class OrderBatchGetRequest(BaseModel):
+    """订单批量查询请求（按ID或订单号）"""
+    ids: list[int] = Field(default_factory=list, description="订单ID列表")
+    order_numbers: list[str] = Field(default_factory=list, description="订单号列表")
+
+    @model_validator(mode="after")
+    def validate_size(self):
+        total = len(self.ids) + len(self.order_numbers)
+        if total == 0:
+            raise ValueError("ids 和 order_numbers 不能同时为空")
+        if total > BATCH_GET_MAX_ITEMS:
+            raise ValueError(f"单次最多查询 {BATCH_GET_MAX_ITEMS} 条")
+        return self
+
+
+class BatchGetItem(BaseModel, Generic[T]):
+    """批量查询单项结果"""
+    key: Union[int, str]
+    status: BatchGetStatus
+    data: Optional[T] = None
+
+
+class BatchGetResponse(BaseModel, Generic[T]):
+    """批量查询响应（顺序与请求一致）"""
+    items: list[BatchGetItem[T]]
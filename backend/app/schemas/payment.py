@@ -41,6 +41,11 @@ class AlipayPaymentRequest(BaseModel):
     return_url: Optional[str] = None  # 支付成功后跳转URL
 
 
+class ProviderPaymentRequest(BaseModel):
+    """第三方支付请求"""
+    return_url: Optional[str] = None  # 支付成功后跳转URL（支付宝）
+
+
 class PaymentCallback(BaseModel):
     """支付回调数据"""
     # 支付宝回调参数
@@ -88,6 +93,14 @@ class AlipayPayUrlResponse(BaseModel):
     pay_url: str  # 支付宝支付页面URL
 
 
+class ProviderPayUrlResponse(BaseModel):
+    """第三方支付URL响应"""
+    payment_id: int
+    payment_no: str
+    provider: PaymentProvider
+    pay_url: str  # 支付宝为收银台URL，微信为二维码链接
+
+
 class PaymentResult(BaseModel):
     """支付结果"""
     success: bool
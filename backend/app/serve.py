@@ -0,0 +1,216 @@
+"""
+生产服务启动入口
+gunicorn 主进程 + UvicornWorker：按 CPU 配额与内存限制计算 worker 数，预加载应用后 fork，
+worker 处理一定数量请求后回收，关闭 / 重载时等待进行中的请求完成（lifespan 关闭数据库连接池）
+
+用法:
+    python -m app.serve [--bind 0.0.0.0:8000] [--workers 4] [--no-preload] [--print-config]
+
+信号（发给主进程）:
+    HUP   平滑重载配置：启动新 worker 后优雅关闭旧 worker（预加载模式下不重新加载代码）
+    USR2  平滑升级代码：以 python -m app.serve 启动新主进程（新代码），确认新主进程就绪后再向旧主进程发送 TERM
+    TERM  优雅关闭：停止接收新连接，等待进行中请求至多 graceful_timeout_seconds
+
+未安装 gunicorn 时（如 Windows 开发环境）退回 uvicorn 多进程模式（不支持预加载）
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+
+WORKER_CLASS = "uvicorn.workers.UvicornWorker"
+APP = "app.main:app"
+MODULE = "app.serve"
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit(cgroup_root: Path = Path("/sys/fs/cgroup")) -> float:
+    """可用 CPU 数（CPU 亲和性与 cgroup 配额中较小者）"""
+    cpus = float(len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+
+    # cgroup v2: "<quota> <period>" 或 "max <period>"
+    quota = _read(cgroup_root / "cpu.max")
+    if quota:
+        limit, _, period = quota.partition(" ")
+        if limit != "max" and period:
+            return min(cpus, int(limit) / int(period))
+        return cpus
+
+    # cgroup v1: quota 为 -1 表示不限
+    limit = _read(cgroup_root / "cpu" / "cpu.cfs_quota_us")
+    period = _read(cgroup_root / "cpu" / "cpu.cfs_period_us")
+    if limit and period and int(limit) > 0:
+        return min(cpus, int(limit) / int(period))
+    return cpus
+
+
+def memory_limit(cgroup_root: Path = Path("/sys/fs/cgroup")) -> Optional[int]:
+    """cgroup 内存上限（字节），未限制时返回 None"""
+    for path in (cgroup_root / "memory.max", cgroup_root / "memory" / "memory.limit_in_bytes"):
+        value = _read(path)
+        if value is None:
+            continue
+        # cgroup v1 未限制时为接近 2^63 的页对齐值
+        if value == "max" or int(value) >= 1 << 60:
+            return None
+        return int(value)
+    return None
+
+
+def worker_count(
+    cpus: Optional[float] = None,
+    memory: Optional[int] = None,
+    memory_per_worker_mb: Optional[int] = None,
+) -> int:
+    """
+    计算 worker 数
+
+    异步 worker 靠事件循环处理并发，按 CPU 数（向上取整）即可用满 CPU；
+    同时不超过 内存上限 / 每个 worker 预估内存，避免被 OOM 杀掉。
+    配置了 web_concurrency（WEB_CONCURRENCY）时直接使用。
+    """
+    if settings.web_concurrency:
+        return settings.web_concurrency
+    cpus = cpu_limit() if cpus is None else cpus
+    memory = memory_limit() if memory is None else memory
+    per_worker = (memory_per_worker_mb or settings.worker_memory_mb) * 1024 * 1024
+
+    workers = max(1, int(-(-cpus // 1)))
+    if memory:
+        workers = min(workers, max(1, memory // per_worker))
+    return workers
+
+
+def gunicorn_options(
+    bind: Optional[str] = None,
+    workers: Optional[int] = None,
+    preload: Optional[bool] = None,
+) -> dict[str, Any]:
+    """gunicorn 配置"""
+    return {
+        "bind": bind or f"{settings.host}:{settings.port}",
+        "workers": workers or worker_count(),
+        "worker_class": WORKER_CLASS,
+        "preload_app": settings.preload_app if preload is None else preload,
+        "max_requests": settings.worker_max_requests,
+        "max_requests_jitter": settings.worker_max_requests_jitter,
+        "timeout": settings.worker_timeout_seconds,
+        "graceful_timeout": settings.graceful_timeout_seconds,
+        "keepalive": settings.keepalive_seconds,
+        "forwarded_allow_ips": "*",
+        "accesslog": "-",
+        "errorlog": "-",
+        "on_starting": on_starting,
+    }
+
+
+def on_starting(server: Any) -> None:
+    """
+    主进程启动时（fork worker 之前）检查数据库结构
+
+    未迁移到最新版本时主进程直接退出，不再逐个 worker 失败；连接池随后释放，worker 不继承主进程的连接
+    """
+    from app.core.database import close_db, init_db
+
+    async def prepare() -> None:
+        try:
+            await init_db()
+        finally:
+            await close_db()
+
+    asyncio.run(prepare())
+
+
+def reexec_args(argv: list[str]) -> list[str]:
+    """
+    USR2 平滑升级时新主进程的命令行
+
+    gunicorn 默认按 sys.argv 重新执行，python -m app.serve 启动时 sys.argv[0] 是 app/serve.py 的路径，
+    按脚本执行时 app 包不在 sys.path 上（ModuleNotFoundError），因此同样以模块方式执行
+    """
+    return [sys.executable, "-m", MODULE, *argv]
+
+
+def run_gunicorn(options: dict[str, Any], argv: list[str]) -> None:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.arbiter import Arbiter
+
+    class Server(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+        def run(self) -> None:
+            arbiter = Arbiter(self)
+            arbiter.START_CTX["args"] = reexec_args(argv)
+            try:
+                arbiter.run()
+            except RuntimeError as e:
+                print(f"\nError: {e}\n", file=sys.stderr)
+                sys.exit(1)
+
+    Server().run()
+
+
+def run_uvicorn(options: dict[str, Any]) -> None:
+    import uvicorn
+
+    host, _, port = options["bind"].rpartition(":")
+    uvicorn.run(
+        APP,
+        host=host,
+        port=int(port),
+        workers=options["workers"],
+        limit_max_requests=options["max_requests"] or None,
+        timeout_graceful_shutdown=options["graceful_timeout"],
+        timeout_keep_alive=options["keepalive"],
+        proxy_headers=True,
+        forwarded_allow_ips=options["forwarded_allow_ips"],
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=f"{settings.app_name} 服务进程")
+    parser.add_argument("--bind", help="监听地址（默认 HOST:PORT）")
+    parser.add_argument("--workers", type=int, help="worker 数（默认按 CPU 与内存自动计算）")
+    parser.add_argument("--no-preload", action="store_true", help="每个 worker 各自加载应用")
+    parser.add_argument("--print-config", action="store_true", help="只输出计算后的配置")
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv)
+
+    options = gunicorn_options(args.bind, args.workers, False if args.no_preload else None)
+    if args.print_config:
+        for key, value in options.items():
+            if not callable(value):
+                print(f"{key:<22}{value}")
+        return
+
+    if options["workers"] > 1 and settings.idempotency_backend == "memory":
+        print("⚠️  多 worker 时内存幂等存储不在进程间共享，建议 IDEMPOTENCY_BACKEND=redis")
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("⚠️  未安装 gunicorn，使用 uvicorn 多进程模式（不支持预加载）")
+        run_uvicorn(options)
+        return
+    run_gunicorn(options, argv)
+
+
+if __name__ == "__main__":
+    main()
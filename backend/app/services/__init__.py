@@ -3,10 +3,25 @@ from app.services.user_service import UserService
 from app.services.subscription_service import SubscriptionService
 from app.services.order_service import OrderService
 from app.services.payment_service import PaymentService
+from app.services.billing_service import BillingService
+from app.services.delivery_service import DeliveryService
+from app.services.sweeper_service import ExpirySweepService, PendingSweepService
+from app.services.reconciliation_service import ReconciliationService
+from app.services.inbox_service import PaymentInboxService
+from app.services.outbox_service import OutboxService
+from app.services.notification_service import NotificationService
 
 __all__ = [
     "UserService",
     "SubscriptionService",
     "OrderService",
     "PaymentService",
+    "BillingService",
+    "DeliveryService",
+    "PendingSweepService",
+    "ExpirySweepService",
+    "ReconciliationService",
+    "PaymentInboxService",
+    "OutboxService",
+    "NotificationService",
 ]
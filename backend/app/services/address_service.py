@@ -2,9 +2,11 @@
 地址服务层
 处理地址相关的业务逻辑
 """
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import exists, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.address import Address
@@ -60,16 +62,9 @@ class AddressService:
         """
         创建新地址
         
-        如果是第一个地址，自动设为默认
+        如果是第一个地址，自动设为默认（在 INSERT 中以 NOT EXISTS 判断，不单独计数）；
+        并发创建首个地址时只有一个能成为默认，其余插入违反唯一索引后作为普通地址重试
         """
-        # 检查是否是第一个地址
-        count = await self.get_count_by_user(user_id)
-        is_default = data.is_default or count == 0
-        
-        # 如果设为默认，先取消其他默认地址
-        if is_default:
-            await self._clear_default_address(user_id)
-        
         address = Address(
             user_id=user_id,
             name=data.name,
@@ -79,28 +74,45 @@ class AddressService:
             district=data.district,
             address=data.address,
             zip_code=data.zip_code,
-            is_default=is_default,
+            is_default=False if data.is_default else ~exists().where(Address.user_id == user_id),
             tag=data.tag,
         )
         
-        self.db.add(address)
-        await self.db.flush()
-        await self.db.refresh(address)
+        try:
+            async with self.db.begin_nested():
+                self.db.add(address)
+                await self.db.flush()
+        except IntegrityError:
+            # 显式设为默认时以非默认插入，不会与 ix_addresses_default_user 冲突
+            if data.is_default:
+                raise
+            address.is_default = False
+            self.db.add(address)
+            await self.db.flush()
         
+        # 设为默认时切换默认地址
+        if data.is_default:
+            await self._switch_default(user_id, address.id)
+        
+        await self.db.refresh(address)
         return address
     
     async def update(self, address: Address, data: AddressUpdate) -> Address:
         """更新地址"""
         update_data = data.model_dump(exclude_unset=True)
-        
-        # 如果设为默认，先取消其他默认地址
-        if update_data.get("is_default"):
-            await self._clear_default_address(address.user_id)
+        make_default = update_data.pop("is_default", None)
         
         for field, value in update_data.items():
             setattr(address, field, value)
+        if make_default is False:
+            address.is_default = False
         
         await self.db.flush()
+        
+        # 设为默认时切换默认地址
+        if make_default:
+            await self._switch_default(address.user_id, address.id)
+        
         await self.db.refresh(address)
         return address
     
@@ -115,19 +127,35 @@ class AddressService:
         if not address or address.user_id != user_id:
             return None
         
-        # 取消其他默认地址
-        await self._clear_default_address(user_id)
-        
-        # 设置当前地址为默认
-        address.is_default = True
-        await self.db.flush()
-        await self.db.refresh(address)
-        
+        await self._switch_default(user_id, address_id)
         return address
     
-    async def _clear_default_address(self, user_id: int) -> None:
-        """清除用户的默认地址标记"""
-        default_address = await self.get_default_address(user_id)
-        if default_address:
-            default_address.is_default = False
-            await self.db.flush()
+    async def _switch_default(self, user_id: int, address_id: int) -> None:
+        """
+        将地址设为用户唯一的默认地址（两条 UPDATE，不先查询）
+        
+        唯一索引逐行检查，必须先清除原默认地址再设置目标；
+        并发切换导致唯一索引冲突时在保存点内重试一次
+        """
+        for attempt in range(2):
+            now = datetime.utcnow()
+            try:
+                async with self.db.begin_nested():
+                    await self.db.execute(
+                        update(Address)
+                        .where(
+                            Address.user_id == user_id,
+                            Address.is_default == True,
+                            Address.id != address_id,
+                        )
+                        .values(is_default=False, updated_at=now)
+                    )
+                    await self.db.execute(
+                        update(Address)
+                        .where(Address.id == address_id, Address.user_id == user_id)
+                        .values(is_default=True, updated_at=now)
+                    )
+                return
+            except IntegrityError:
+                if attempt:
+                    raise
@@ -0,0 +1,188 @@
+"""
+支付宝网关客户端
+进程内单例：RSA 密钥只解析一次，SDK 的签名/验签放到专用线程池执行，
+远程调用走共享的长连接 HTTP 客户端，带超时和延迟指标
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.http import get_http_client
+from app.core.metrics import metrics
+
+
+class AlipayTimeoutError(TimeoutError):
+    """支付宝调用超时"""
+
+
+def _build_client():
+    """创建 SDK 客户端（解析 RSA 密钥）"""
+    try:
+        from alipay import AliPay
+    except ImportError:
+        raise ImportError("请先安装 python-alipay-sdk: pip install python-alipay-sdk")
+
+    client = AliPay(
+        appid=settings.alipay_app_id,
+        app_notify_url=settings.frontend_url + "/api/v1/payments/callback",
+        app_private_key_string=settings.alipay_private_key or "",
+        alipay_public_key_string=settings.alipay_public_key or "",
+        sign_type="RSA2",
+        debug=True  # 沙箱模式
+    )
+    if settings.alipay_gateway_url:
+        client._gateway = settings.alipay_gateway_url
+    return client
+
+
+class AlipayGateway:
+    """
+    支付宝网关
+    
+    - SDK 客户端进程内共享；签名、验签在专用线程池中执行，不阻塞事件循环
+    - 查询/退款等远程调用使用共享的 httpx.AsyncClient（与其他支付提供商共用连接池）
+    - 每次调用有超时
+    - 记录 alipay_call_seconds{method, outcome} 延迟直方图
+    """
+    
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_workers: Optional[int] = None,
+        http: Optional[httpx.AsyncClient] = None,
+    ):
+        self.timeout = timeout or settings.alipay_timeout_seconds
+        self._http = http
+        self._client = _build_client()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.alipay_executor_workers,
+            thread_name_prefix="alipay",
+        )
+    
+    @property
+    def client(self):
+        """底层 SDK 客户端"""
+        return self._client
+    
+    @property
+    def gateway_url(self) -> str:
+        """网关地址（收银台跳转和远程调用共用）"""
+        return self._client._gateway
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """远程调用使用的 HTTP 客户端（默认为共享客户端）"""
+        return self._http or get_http_client()
+    
+    async def _timed(self, method: str, call: Awaitable[Any]) -> Any:
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await asyncio.wait_for(call, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise AlipayTimeoutError(f"支付宝调用超时: {method}")
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            metrics.observe(
+                "alipay_call_seconds",
+                time.perf_counter() - started,
+                method=method,
+                outcome=outcome,
+            )
+    
+    async def _call(self, method: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在线程池中执行 SDK 的同步调用"""
+        loop = asyncio.get_running_loop()
+        return await self._timed(
+            method, loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        )
+    
+    async def _request(self, api: str, biz_content: dict[str, Any]) -> dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        data = self._client.build_body(api, biz_content)
+        query = await loop.run_in_executor(self._executor, self._client.sign_data, data)
+        
+        response = await self.http.get(f"{self.gateway_url}?{query}", timeout=self.timeout)
+        response.raise_for_status()
+        
+        response_type = api.replace(".", "_") + "_response"
+        return await loop.run_in_executor(
+            self._executor,
+            self._client._verify_and_return_sync_response,
+            response.text,
+            response_type,
+        )
+    
+    async def _remote(self, method: str, api: str, biz_content: dict[str, Any]) -> dict[str, Any]:
+        """远程调用：线程池签名 -> 共享 HTTP 客户端请求 -> 线程池验签"""
+        return await self._timed(method, self._request(api, biz_content))
+    
+    async def page_pay(self, **kwargs: Any) -> str:
+        """电脑网站支付，返回签名后的订单参数串"""
+        return await self._call("page_pay", self._client.api_alipay_trade_page_pay, **kwargs)
+    
+    async def verify(self, data: dict, signature: str) -> bool:
+        """验证异步通知签名"""
+        return await self._call("verify", self._client.verify, data, signature)
+    
+    async def query_trade(self, out_trade_no: str) -> dict[str, Any]:
+        """查询交易（alipay.trade.query）"""
+        return await self._remote(
+            "query", "alipay.trade.query", {"out_trade_no": out_trade_no}
+        )
+    
+    async def refund(self, **kwargs: Any) -> dict[str, Any]:
+        """退款（alipay.trade.refund）"""
+        return await self._remote(
+            "refund", "alipay.trade.refund", {k: v for k, v in kwargs.items() if v is not None}
+        )
+    
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_gateway: Optional[AlipayGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_alipay_gateway() -> AlipayGateway:
+    """
+    获取支付宝网关单例（首次调用时创建）
+    
+    Raises:
+        ValueError: 支付宝未配置
+        ImportError: SDK 未安装
+    """
+    global _gateway
+    if _gateway is None:
+        if not settings.alipay_app_id:
+            raise ValueError("支付宝APP_ID未配置")
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = AlipayGateway()
+    return _gateway
+
+
+def init_alipay_gateway() -> Optional[AlipayGateway]:
+    """启动时创建网关（未配置支付宝时跳过）"""
+    if not settings.alipay_app_id:
+        return None
+    return get_alipay_gateway()
+
+
+def close_alipay_gateway() -> None:
+    """关闭网关线程池（HTTP 连接由共享客户端管理）"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is not None:
+            _gateway.close()
+            _gateway = None
@@ -0,0 +1,225 @@
+"""
+续费批处理服务
+按批选取到期的自动续费订阅，批量生成续费订单和支付记录；续费订单支付成功后才延长有效期
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Sequence
+
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import insert_ignore
+from app.models.order import Order, OrderStatus
+from app.models.payment import Payment, PaymentProvider, PaymentStatus
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.services.order_service import OrderService
+from app.services.subscription_service import SubscriptionService
+
+
+@dataclass
+class BillingRunResult:
+    """续费批处理结果"""
+    as_of: datetime
+    selected: int = 0           # 选中的到期订阅数
+    orders_created: int = 0     # 新建续费订单数
+    payments_created: int = 0   # 新建支付记录数
+    skipped: list[int] = field(default_factory=list)  # 跳过的订阅ID（无配送地址/无效计划）
+    chunks: int = 0
+    elapsed: float = 0.0
+
+
+class BillingService:
+    """
+    续费批处理服务类
+    
+    - 每批一个事务：插入订单、插入支付记录一起提交
+    - 续费订单号由订阅ID和当期到期日确定，重复执行时冲突行被跳过（按计费周期幂等），中途崩溃后重新执行即可继续
+    - 有效期在续费订单支付成功时延长（settle_renewal），未支付的订阅在宽限期后由到期清理标记为过期
+    """
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        chunk_size: Optional[int] = None,
+        period_days: Optional[int] = None,
+    ):
+        self.db = db
+        self.chunk_size = chunk_size or settings.billing_chunk_size
+        self.period = timedelta(days=period_days or settings.billing_period_days)
+    
+    @staticmethod
+    def renewal_order_number(subscription_id: int, period_start: datetime) -> str:
+        """续费订单号 (格式: RN + 当期到期日 + 10位订阅ID，如 RN202403010000000042)"""
+        return f"RN{period_start:%Y%m%d}{subscription_id:010d}"
+    
+    @staticmethod
+    def is_renewal_order(order: Order) -> bool:
+        """是否为续费批处理生成的订单"""
+        return order.subscription_id is not None and order.order_number.startswith("RN")
+    
+    @staticmethod
+    def renewal_payment_no(subscription_id: int, period_start: datetime) -> str:
+        """续费支付号 (格式: RNP + 当期到期日 + 10位订阅ID)"""
+        return f"RNP{period_start:%Y%m%d}{subscription_id:010d}"
+    
+    async def select_due(
+        self,
+        as_of: datetime,
+        after_id: int = 0,
+        limit: Optional[int] = None,
+    ) -> Sequence[Row]:
+        """
+        选取到期的自动续费订阅（按ID游标分页，使用 ix_subscriptions_renewal_due 索引）
+        
+        PostgreSQL 下对选中行加锁并跳过已被其他批处理锁定的行
+        """
+        result = await self.db.execute(
+            select(
+                Subscription.id,
+                Subscription.user_id,
+                Subscription.plan_code,
+                Subscription.payment_method,
+                Subscription.expires_at,
+            )
+            .where(
+                Subscription.auto_renew.is_(True),
+                Subscription.status == SubscriptionStatus.ACTIVE,
+                Subscription.expires_at <= as_of,
+                Subscription.id > after_id,
+            )
+            .order_by(Subscription.id)
+            .limit(limit or self.chunk_size)
+            .with_for_update(skip_locked=True)
+        )
+        return result.all()
+    
+    async def process_chunk(
+        self,
+        subscriptions: Sequence[Row],
+        result: BillingRunResult,
+    ) -> None:
+        """
+        处理一批到期订阅（不提交事务）
+        
+        1. 批量插入续费订单（冲突跳过）
+        2. 为新插入的订单批量插入支付记录
+        """
+        addresses = await OrderService(self.db).get_latest_shipping_addresses(
+            sub.id for sub in subscriptions
+        )
+        pricing: dict[str, tuple[Decimal, list[dict]]] = {}
+        
+        order_rows = []
+        pending_payments = {}
+        
+        for sub in subscriptions:
+            address = addresses.get(sub.id)
+            if address is None:
+                result.skipped.append(sub.id)
+                continue
+            
+            if sub.plan_code not in pricing:
+                try:
+                    pricing[sub.plan_code] = OrderService.subscription_pricing(sub.plan_code)
+                except ValueError:
+                    pricing[sub.plan_code] = None
+            if pricing[sub.plan_code] is None:
+                result.skipped.append(sub.id)
+                continue
+            
+            amount, items = pricing[sub.plan_code]
+            order_number = self.renewal_order_number(sub.id, sub.expires_at)
+            order_rows.append({
+                "order_number": order_number,
+                "user_id": sub.user_id,
+                "subscription_id": sub.id,
+                "status": OrderStatus.PENDING,
+                "total_amount": amount,
+                "items": items,
+                "shipping_address": address,
+            })
+            pending_payments[order_number] = {
+                "payment_no": self.renewal_payment_no(sub.id, sub.expires_at),
+                "user_id": sub.user_id,
+                "amount": amount,
+                "provider": (
+                    PaymentProvider.WECHAT
+                    if sub.payment_method == PaymentProvider.WECHAT.value
+                    else PaymentProvider.ALIPAY
+                ),
+                "status": PaymentStatus.PENDING,
+            }
+        
+        if not order_rows:
+            return
+        
+        # RETURNING 只返回实际插入的行（已存在的续费订单被跳过）
+        inserted = await self.db.execute(
+            insert_ignore(self.db, Order).returning(Order.id, Order.order_number),
+            order_rows,
+        )
+        payment_rows = [
+            {**pending_payments[order_number], "order_id": order_id}
+            for order_id, order_number in inserted.all()
+        ]
+        result.orders_created += len(payment_rows)
+        
+        if payment_rows:
+            payments = await self.db.execute(
+                insert_ignore(self.db, Payment).returning(Payment.id),
+                payment_rows,
+            )
+            result.payments_created += len(payments.all())
+    
+    async def settle_renewal(self, order: Order) -> Optional[Subscription]:
+        """
+        续费订单支付成功：延长订阅有效期（写入 subscription.renewed 事件，不提交事务）
+        
+        订单由 PENDING 变为已支付的状态变更只成功一次，因此每个计费周期只延长一次；
+        订阅已取消/暂停、或已过期且用户已有新的活跃订阅时不延长
+        
+        Returns:
+            Subscription: 已延长的订阅，未延长时返回None
+        """
+        subscription_service = SubscriptionService(self.db)
+        subscription = await subscription_service.get_by_id(order.subscription_id)
+        if subscription is None:
+            return None
+        try:
+            return await subscription_service.renew(subscription, self.period)
+        except ValueError:
+            return None
+    
+    async def run(self, as_of: Optional[datetime] = None) -> BillingRunResult:
+        """
+        执行续费批处理（每批提交一次）
+        
+        Args:
+            as_of: 计费时间点，到期时间不晚于该时间的订阅会生成续费订单（默认当前时间）
+        
+        Returns:
+            BillingRunResult: 处理统计
+        """
+        as_of = as_of or datetime.utcnow()
+        result = BillingRunResult(as_of=as_of)
+        started = time.perf_counter()
+        after_id = 0
+        
+        while True:
+            subscriptions = await self.select_due(as_of, after_id)
+            if not subscriptions:
+                break
+            
+            await self.process_chunk(subscriptions, result)
+            await self.db.commit()
+            
+            result.selected += len(subscriptions)
+            result.chunks += 1
+            after_id = subscriptions[-1].id
+        
+        result.elapsed = time.perf_counter() - started
+        return result
@@ -0,0 +1,313 @@
+"""
+配送生成服务
+按 next_delivery_at 选取到期、已付费且未过期的活跃订阅，批量生成发货订单并推进下次配送时间
+"""
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterator, Optional, Sequence
+
+from sqlalchemy import Row, case, exists, literal, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import insert_ignore
+from app.models.order import Order, OrderStatus
+from app.models.size_profile import SizeProfile
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.schemas.subscription import PLAN_CONFIG
+from app.services.order_service import OrderService
+
+# 一个配送周期（月）的天数
+DELIVERY_CYCLE_DAYS = 30
+
+# 发货订单号前缀（发货订单金额为0，不算作订阅的付费订单）
+DELIVERY_ORDER_PREFIX = "DL"
+
+# 已付款的订单状态
+PAID_ORDER_STATUSES = (OrderStatus.PAID, OrderStatus.SHIPPED, OrderStatus.DELIVERED)
+
+
+@dataclass
+class DeliveryRunResult:
+    """配送生成结果"""
+    as_of: datetime
+    dry_run: bool = False
+    selected: int = 0           # 到期的订阅数
+    orders_created: int = 0     # 新建发货订单数（dry-run 时为计划生成数）
+    advanced: int = 0           # 推进了下次配送时间的订阅数（含跳过的订阅）
+    skipped: list[int] = field(default_factory=list)  # 本期跳过的订阅ID（无配送地址/无效计划，顺延到下一期）
+    planned: list[dict] = field(default_factory=list)  # dry-run：将要生成的订单
+    phases: dict[str, float] = field(default_factory=dict)  # 各阶段累计耗时（秒）
+    batches: int = 0
+    elapsed: float = 0.0
+
+
+class DeliveryService:
+    """
+    配送生成服务类
+    
+    - 只为已付费的订阅配送：未过期（expires_at 晚于配送时间，续费未支付的订阅在宽限期内已过期）
+      且有已付款的订阅/续费订单（新订阅在支付前即为 ACTIVE）
+    - delivery_frequency 为每月配送次数：配送间隔 = 30 / 次数 天，每次数量 = 计划每月双数 / 次数（向上取整）
+    - 缺少配送地址或计划无效的订阅跳过本期并推进下次配送时间，不会每次执行都被重复选中
+    - 发货订单号由订阅ID和本次配送日期确定，重复执行时冲突行被跳过
+    - 下次配送时间用比较并交换（WHERE next_delivery_at = 原值）推进，并发执行不会重复推进
+    - 每批一个事务
+    """
+    
+    def __init__(self, db: AsyncSession, batch_size: Optional[int] = None):
+        self.db = db
+        self.batch_size = batch_size or settings.delivery_batch_size
+    
+    @staticmethod
+    def delivery_order_number(subscription_id: int, delivery_at: datetime) -> str:
+        """发货订单号 (格式: DL + 配送日期 + 10位订阅ID，如 DL202403010000000042)"""
+        return f"{DELIVERY_ORDER_PREFIX}{delivery_at:%Y%m%d}{subscription_id:010d}"
+    
+    @staticmethod
+    def delivery_interval(delivery_frequency: Optional[int]) -> timedelta:
+        """配送间隔"""
+        return timedelta(days=DELIVERY_CYCLE_DAYS / max(1, delivery_frequency or 1))
+    
+    @classmethod
+    def next_delivery(
+        cls,
+        current: datetime,
+        delivery_frequency: Optional[int],
+        as_of: datetime,
+    ) -> datetime:
+        """计算下次配送时间（积压多期时不补发，从当前时间起算）"""
+        interval = cls.delivery_interval(delivery_frequency)
+        following = current + interval
+        if following <= as_of:
+            following = as_of + interval
+        return following
+    
+    @contextmanager
+    def _phase(self, result: DeliveryRunResult, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            result.phases[name] = result.phases.get(name, 0.0) + time.perf_counter() - started
+    
+    async def select_due(
+        self,
+        as_of: datetime,
+        after_id: int = 0,
+        limit: Optional[int] = None,
+    ) -> Sequence[Row]:
+        """选取到期、已付费且未过期的活跃订阅（按ID游标分页，使用 ix_subscriptions_delivery_due 索引）"""
+        paid = exists().where(
+            Order.subscription_id == Subscription.id,
+            Order.status.in_(PAID_ORDER_STATUSES),
+            Order.order_number.not_like(f"{DELIVERY_ORDER_PREFIX}%"),
+        )
+        result = await self.db.execute(
+            select(
+                Subscription.id,
+                Subscription.user_id,
+                Subscription.plan_code,
+                Subscription.delivery_frequency,
+                Subscription.size_profile_id,
+                Subscription.next_delivery_at,
+            )
+            .where(
+                Subscription.status == SubscriptionStatus.ACTIVE,
+                Subscription.next_delivery_at <= as_of,
+                Subscription.expires_at > as_of,
+                paid,
+                Subscription.id > after_id,
+            )
+            .order_by(Subscription.id)
+            .limit(limit or self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        return result.all()
+    
+    async def _load_size_profiles(
+        self,
+        subscriptions: Sequence[Row],
+    ) -> tuple[dict[int, SizeProfile], dict[int, SizeProfile]]:
+        """
+        批量加载尺码档案（单次查询）
+        
+        Returns:
+            (档案ID -> 档案, 用户ID -> 默认档案)
+        """
+        profile_ids = {sub.size_profile_id for sub in subscriptions if sub.size_profile_id}
+        user_ids = {sub.user_id for sub in subscriptions if not sub.size_profile_id}
+        if not profile_ids and not user_ids:
+            return {}, {}
+        
+        result = await self.db.execute(
+            select(SizeProfile).where(or_(
+                SizeProfile.id.in_(profile_ids),
+                SizeProfile.user_id.in_(user_ids) & SizeProfile.is_default.is_(True),
+            ))
+        )
+        by_id, defaults = {}, {}
+        for profile in result.scalars():
+            by_id[profile.id] = profile
+            if profile.is_default:
+                defaults[profile.user_id] = profile
+        return by_id, defaults
+    
+    @staticmethod
+    def _shipment_items(plan_code: str, delivery_frequency: int, profile: Optional[SizeProfile]) -> list[dict]:
+        """发货商品列表（订阅已预付，单价为0）"""
+        plan = PLAN_CONFIG[plan_code.lower()]
+        pairs = math.ceil(plan["socks_per_month"] / max(1, delivery_frequency or 1))
+        item = {
+            "name": f"{plan['name']} - 每期配送",
+            "quantity": pairs,
+            "unit_price": 0.0,
+            "subtotal": 0.0,
+            "description": f"本期{pairs}双精选袜子",
+        }
+        if profile is not None:
+            item["size_profile_id"] = profile.id
+            item["sock_size"] = profile.sock_size
+            item["shoe_size"] = profile.shoe_size
+        return [item]
+    
+    async def process_batch(
+        self,
+        subscriptions: Sequence[Row],
+        as_of: datetime,
+        result: DeliveryRunResult,
+    ) -> None:
+        """
+        处理一批到期订阅（不提交事务）
+        
+        1. 批量加载配送地址和尺码档案
+        2. 批量插入发货订单（冲突跳过）
+        3. 比较并交换推进下次配送时间（跳过的订阅同样推进）
+        """
+        with self._phase(result, "load"):
+            addresses = await OrderService(self.db).get_latest_shipping_addresses(
+                sub.id for sub in subscriptions
+            )
+            profiles, default_profiles = await self._load_size_profiles(subscriptions)
+        
+        with self._phase(result, "build"):
+            order_rows = []
+            advances = []
+            for sub in subscriptions:
+                advances.append({
+                    "id": sub.id,
+                    "current": sub.next_delivery_at,
+                    "next": self.next_delivery(sub.next_delivery_at, sub.delivery_frequency, as_of),
+                })
+                address = addresses.get(sub.id)
+                if address is None or sub.plan_code.lower() not in PLAN_CONFIG:
+                    result.skipped.append(sub.id)
+                    continue
+                
+                profile = (
+                    profiles.get(sub.size_profile_id)
+                    if sub.size_profile_id
+                    else default_profiles.get(sub.user_id)
+                )
+                order_rows.append({
+                    "order_number": self.delivery_order_number(sub.id, sub.next_delivery_at),
+                    "user_id": sub.user_id,
+                    "subscription_id": sub.id,
+                    # 订阅已支付，发货订单直接进入待发货（已支付）状态
+                    "status": OrderStatus.PAID,
+                    "total_amount": Decimal("0.00"),
+                    "items": self._shipment_items(sub.plan_code, sub.delivery_frequency, profile),
+                    "shipping_address": address,
+                    "paid_at": as_of,
+                })
+        
+        if result.dry_run:
+            next_delivery = {advance["id"]: advance["next"] for advance in advances}
+            result.orders_created += len(order_rows)
+            result.advanced += len(advances)
+            result.planned.extend(
+                {
+                    "order_number": row["order_number"],
+                    "subscription_id": row["subscription_id"],
+                    "quantity": row["items"][0]["quantity"],
+                    "next_delivery_at": next_delivery[row["subscription_id"]],
+                }
+                for row in order_rows
+            )
+            return
+        
+        if order_rows:
+            with self._phase(result, "insert"):
+                inserted = await self.db.execute(
+                    insert_ignore(self.db, Order).returning(Order.id),
+                    order_rows,
+                )
+                result.orders_created += len(inserted.all())
+        
+        with self._phase(result, "advance"):
+            table = Subscription.__table__
+            # 单条 UPDATE：(id, 当前值) 不匹配的行已被并发执行推进，跳过即可；
+            # 影响行数只统计本次实际推进的订阅（executemany 在 asyncpg 下没有可靠的行数）
+            advanced = await self.db.execute(
+                update(table)
+                .where(tuple_(table.c.id, table.c.next_delivery_at).in_(
+                    [(advance["id"], advance["current"]) for advance in advances]
+                ))
+                .values(
+                    next_delivery_at=case(
+                        {
+                            advance["id"]: literal(advance["next"], table.c.next_delivery_at.type)
+                            for advance in advances
+                        },
+                        value=table.c.id,
+                    ),
+                    updated_at=datetime.utcnow(),
+                    version=table.c.version + 1,
+                )
+            )
+            result.advanced += advanced.rowcount
+    
+    async def run(
+        self,
+        as_of: Optional[datetime] = None,
+        dry_run: bool = False,
+    ) -> DeliveryRunResult:
+        """
+        执行配送生成（每批提交一次）
+        
+        Args:
+            as_of: 时间点，next_delivery_at 不晚于该时间的订阅会生成发货订单（默认当前时间）
+            dry_run: 只计算将要生成的订单，不写入数据库
+        
+        Returns:
+            DeliveryRunResult: 处理统计和各阶段耗时
+        """
+        as_of = as_of or datetime.utcnow()
+        result = DeliveryRunResult(as_of=as_of, dry_run=dry_run)
+        started = time.perf_counter()
+        after_id = 0
+        
+        while True:
+            with self._phase(result, "select"):
+                subscriptions = await self.select_due(as_of, after_id)
+            if not subscriptions:
+                break
+            
+            await self.process_batch(subscriptions, as_of, result)
+            
+            with self._phase(result, "commit"):
+                if dry_run:
+                    await self.db.rollback()
+                else:
+                    await self.db.commit()
+            
+            result.selected += len(subscriptions)
+            result.batches += 1
+            after_id = subscriptions[-1].id
+        
+        result.elapsed = time.perf_counter() - started
+        return result
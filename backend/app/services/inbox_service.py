@@ -0,0 +1,175 @@
+"""
+支付通知收件箱服务
+回调接口只负责验签和落库，通知由后台任务按批处理
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import insert_ignore
+from app.core.responses import json_dumps
+from app.models.payment import PaymentProvider
+from app.models.payment_notification import NotificationStatus, PaymentNotification
+from app.services.payment_service import PaymentService
+from app.services.providers import TradeResult, get_provider
+
+
+@dataclass
+class InboxDrainResult:
+    """收件箱处理结果"""
+    processed: int = 0   # 处理成功
+    retried: int = 0     # 处理出错，等待重试
+    failed: int = 0      # 最终失败
+    batches: int = 0
+    elapsed: float = 0.0
+
+
+class PaymentInboxService:
+    """支付通知收件箱服务类"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    @staticmethod
+    def notify_key(payload: dict[str, Any]) -> str:
+        """通知去重键（提供商未给出通知ID时）：支付宝 notify_id，缺失时使用通知内容摘要"""
+        notify_id = payload.get("notify_id")
+        if notify_id:
+            return str(notify_id)[:64]
+        return hashlib.sha256(json_dumps(dict(sorted(payload.items())))).hexdigest()
+    
+    async def record(self, provider: PaymentProvider, trade: TradeResult) -> bool:
+        """
+        保存已验签的通知（单条 INSERT，重复通知被忽略）
+        
+        Args:
+            provider: 支付提供商
+            trade: 提供商解析出的交易结果（保存其原始数据）
+        
+        Returns:
+            bool: 是否为新通知
+        """
+        notify_id = str(trade.notify_id)[:64] if trade.notify_id else self.notify_key(trade.raw)
+        result = await self.db.execute(
+            insert_ignore(self.db, PaymentNotification)
+            .values(
+                provider=provider.value,
+                out_trade_no=trade.out_trade_no,
+                notify_id=notify_id,
+                payload=trade.raw,
+                status=NotificationStatus.PENDING,
+                attempts=0,
+                received_at=datetime.utcnow(),
+            )
+            .returning(PaymentNotification.id)
+        )
+        return result.scalar_one_or_none() is not None
+    
+    async def _process(self, notification: PaymentNotification) -> Optional[str]:
+        """处理单条通知，返回错误信息（成功时为 None）"""
+        trade = get_provider(PaymentProvider(notification.provider)).trade_from_payload(
+            dict(notification.payload)
+        )
+        payment = await PaymentService(self.db).apply_trade_result(trade)
+        if payment is None:
+            return "支付记录不存在"
+        return None
+    
+    async def _drain_one(self, notification_id: int, result: InboxDrainResult) -> None:
+        """处理一条通知（独立事务）"""
+        # 锁定该通知；已被其他 worker 锁定或处理的跳过
+        notification = (await self.db.execute(
+            select(PaymentNotification)
+            .where(
+                PaymentNotification.id == notification_id,
+                PaymentNotification.status == NotificationStatus.PENDING,
+            )
+            .with_for_update(skip_locked=True)
+            .execution_options(populate_existing=True)
+        )).scalar_one_or_none()
+        if notification is None:
+            await self.db.commit()
+            return
+        
+        attempts = notification.attempts + 1
+        try:
+            error = await self._process(notification)
+            notification.attempts = attempts
+            notification.status = (
+                NotificationStatus.PROCESSED if error is None else NotificationStatus.FAILED
+            )
+            notification.last_error = error
+            notification.processed_at = datetime.utcnow()
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            final = attempts >= settings.inbox_max_attempts
+            await self.db.execute(
+                update(PaymentNotification)
+                .where(PaymentNotification.id == notification_id)
+                .values(
+                    attempts=attempts,
+                    last_error=str(e)[:500],
+                    status=NotificationStatus.FAILED if final else NotificationStatus.PENDING,
+                )
+            )
+            await self.db.commit()
+            if final:
+                result.failed += 1
+            else:
+                result.retried += 1
+            return
+        
+        if error is None:
+            result.processed += 1
+        else:
+            result.failed += 1
+    
+    async def drain(
+        self,
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None,
+    ) -> InboxDrainResult:
+        """
+        按批处理待处理的通知
+        
+        - 按ID顺序每批读取一组待处理通知
+        - 每条通知一个事务：处理结果与通知状态一起提交
+        - 出错的通知回滚后记录错误并计数，超过最大次数标记为失败
+        
+        Args:
+            batch_size: 每批读取的通知数
+            max_batches: 最多处理的批数（默认处理到收件箱为空）
+        """
+        batch_size = batch_size or settings.inbox_batch_size
+        result = InboxDrainResult()
+        started = time.perf_counter()
+        after_id = 0
+        
+        while max_batches is None or result.batches < max_batches:
+            ids = (await self.db.execute(
+                select(PaymentNotification.id)
+                .where(
+                    PaymentNotification.status == NotificationStatus.PENDING,
+                    PaymentNotification.id > after_id,
+                )
+                .order_by(PaymentNotification.id)
+                .limit(batch_size)
+            )).scalars().all()
+            if not ids:
+                break
+            
+            for notification_id in ids:
+                await self._drain_one(notification_id, result)
+            
+            result.batches += 1
+            after_id = ids[-1]
+        
+        result.elapsed = time.perf_counter() - started
+        return result
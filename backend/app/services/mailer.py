@@ -0,0 +1,295 @@
+"""
+SMTP 发送器
+进程内单例：保持少量已登录的 SMTP 连接，邮件按批在同一连接上连续发送，
+smtplib 的同步调用放到专用线程池执行，临时错误指数退避重试，永久错误和超过重试次数的邮件进入死信
+"""
+import asyncio
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import Optional, Sequence
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+@dataclass
+class OutgoingEmail:
+    """待发送邮件"""
+    to: str
+    subject: str
+    body: str
+    template: Optional[str] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+
+    def to_message(self, sender: Optional[str]) -> EmailMessage:
+        message = EmailMessage()
+        if sender:
+            message["From"] = sender
+        message["To"] = self.to
+        message["Subject"] = self.subject
+        message.set_content(self.body)
+        return message
+
+
+@dataclass
+class MailSendResult:
+    """发送结果"""
+    sent: int = 0
+    retried: int = 0     # 重试次数（同一封邮件可能重试多次）
+    dead: list[OutgoingEmail] = field(default_factory=list)  # 进入死信的邮件
+    batches: int = 0
+    elapsed: float = 0.0
+
+
+def is_permanent(error: Exception) -> bool:
+    """5xx 响应（收件人不存在、内容被拒等）重试无意义，直接进入死信"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+# 发送单封邮件出错后，连接仍可继续使用的错误（服务器已拒绝该邮件并重置会话）
+_MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
+class SMTPPool:
+    """
+    SMTP 连接池
+
+    - 连接按需创建（STARTTLS + 登录只做一次），用完放回池中复用
+    - 连接数不超过发送线程数；超过 max_age 的连接关闭重建，避免被服务器空闲断开
+    - send_batch 在调用线程中同步执行，应通过 Mailer 的线程池调用
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        timeout: float = 10.0,
+        max_age: float = 300.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_age = max_age
+        self._idle: queue.LifoQueue[tuple[smtplib.SMTP, float]] = queue.LifoQueue()
+        self.opened = 0  # 累计建立的连接数
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password or "")
+        except Exception:
+            smtp.close()
+            raise
+        self.opened += 1
+        metrics.inc("smtp_connections_opened_total")
+        return smtp
+
+    def _acquire(self) -> tuple[smtplib.SMTP, float]:
+        while True:
+            try:
+                smtp, opened_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), time.monotonic()
+            if time.monotonic() - opened_at < self.max_age:
+                return smtp, opened_at
+            self._quit(smtp)
+
+    @staticmethod
+    def _quit(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def send_batch(
+        self,
+        emails: Sequence[OutgoingEmail],
+        sender: Optional[str],
+    ) -> list[Optional[Exception]]:
+        """
+        在一个连接上连续发送一批邮件
+
+        Returns:
+            与 emails 一一对应的错误（成功为 None）；连接中断时本批剩余邮件都记为该错误
+        """
+        errors: list[Optional[Exception]] = [None] * len(emails)
+        try:
+            smtp, opened_at = self._acquire()
+        except Exception as exc:
+            return [exc] * len(emails)
+
+        for index, email in enumerate(emails):
+            try:
+                smtp.send_message(email.to_message(sender))
+            except _MESSAGE_ERRORS as exc:
+                errors[index] = exc
+            except Exception as exc:
+                # 连接已不可用：丢弃连接，剩余邮件交给上层重试
+                errors[index:] = [exc] * (len(emails) - index)
+                smtp.close()
+                return errors
+
+        self._idle.put((smtp, opened_at))
+        return errors
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                smtp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(smtp)
+
+
+class Mailer:
+    """
+    邮件发送器
+
+    - 邮件按 batch_size 分批，每批占用一个连接，最多 pool_size 批并发
+    - 临时错误（4xx、连接中断、超时）按 backoff * 2^(n-1) 退避后重试，最多 max_attempts 次
+    - 永久错误（5xx）和超过重试次数的邮件放入结果的 dead 列表，由调用方落库
+    - 记录 smtp_send_seconds 批次延迟直方图和 smtp_messages_total{outcome} 计数
+    """
+
+    def __init__(
+        self,
+        pool: Optional[SMTPPool] = None,
+        pool_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff: Optional[float] = None,
+        sender: Optional[str] = None,
+    ):
+        self.pool = pool or SMTPPool(
+            settings.smtp_host,
+            settings.smtp_port,
+            user=settings.smtp_user,
+            password=settings.smtp_password,
+            use_tls=settings.smtp_use_tls,
+            timeout=settings.smtp_timeout_seconds,
+            max_age=settings.smtp_connection_max_age_seconds,
+        )
+        self.batch_size = batch_size or settings.smtp_batch_size
+        self.max_attempts = max_attempts or settings.smtp_max_attempts
+        self.backoff = settings.smtp_retry_backoff_seconds if backoff is None else backoff
+        self.sender = sender or settings.smtp_from or settings.smtp_user
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size or settings.smtp_pool_size,
+            thread_name_prefix="smtp",
+        )
+
+    async def _send_batch(self, batch: list[OutgoingEmail]) -> list[Optional[Exception]]:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        errors = await loop.run_in_executor(
+            self._executor, self.pool.send_batch, batch, self.sender
+        )
+        metrics.observe("smtp_send_seconds", time.perf_counter() - started)
+        return errors
+
+    async def send(self, emails: Sequence[OutgoingEmail]) -> MailSendResult:
+        """
+        发送邮件
+
+        Args:
+            emails: 待发送邮件（attempts/last_error 会被更新）
+
+        Returns:
+            MailSendResult: 成功数、重试次数和死信邮件
+        """
+        result = MailSendResult()
+        started = time.perf_counter()
+        pending = list(emails)
+        round_number = 0
+
+        while pending:
+            if round_number:
+                await asyncio.sleep(self.backoff * 2 ** (round_number - 1))
+            round_number += 1
+
+            batches = [
+                pending[i:i + self.batch_size]
+                for i in range(0, len(pending), self.batch_size)
+            ]
+            outcomes = await asyncio.gather(*(self._send_batch(batch) for batch in batches))
+            result.batches += len(batches)
+
+            pending = []
+            for batch, errors in zip(batches, outcomes):
+                for email, error in zip(batch, errors):
+                    email.attempts += 1
+                    if error is None:
+                        result.sent += 1
+                        metrics.inc("smtp_messages_total", outcome="sent")
+                        continue
+
+                    email.last_error = f"{type(error).__name__}: {error}"[:500]
+                    if is_permanent(error) or email.attempts >= self.max_attempts:
+                        result.dead.append(email)
+                        metrics.inc("smtp_messages_total", outcome="dead")
+                    else:
+                        pending.append(email)
+                        result.retried += 1
+                        metrics.inc("smtp_messages_total", outcome="retry")
+
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def close(self) -> None:
+        """关闭线程池与连接池"""
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+
+_mailer: Optional[Mailer] = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer() -> Mailer:
+    """
+    获取邮件发送器单例（首次调用时创建）
+
+    Raises:
+        ValueError: SMTP 未配置
+    """
+    global _mailer
+    if _mailer is None:
+        if not settings.smtp_host:
+            raise ValueError("SMTP服务器未配置")
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = Mailer()
+    return _mailer
+
+
+def close_mailer() -> None:
+    """关闭邮件发送器（线程池与 SMTP 连接）"""
+    global _mailer
+    with _mailer_lock:
+        if _mailer is not None:
+            _mailer.close()
+            _mailer = None
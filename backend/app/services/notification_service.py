@@ -0,0 +1,211 @@
+"""
+通知服务
+模板预编译并缓存，邮件通过进程内共享的 SMTP 发送器批量发送，失败邮件写入死信表
+"""
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from string import Template
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.notification_dead_letter import NotificationDeadLetter
+from app.models.outbox_event import OutboxEvent
+from app.models.user import User
+from app.services.mailer import Mailer, OutgoingEmail, get_mailer
+from app.services.outbox_service import register_batch_handler
+
+logger = logging.getLogger(__name__)
+
+# 通知模板：名称 -> (主题, 正文)，使用 string.Template 的 ${field} 占位符
+NOTIFICATION_TEMPLATES: dict[str, tuple[str, str]] = {
+    "order_shipped": (
+        "您的订单 ${order_number} 已发货",
+        "${name}，您好：\n\n"
+        "您的订单 ${order_number} 已发货，快递单号 ${tracking_number}。\n\n"
+        "SocksFlow",
+    ),
+    "subscription_renewed": (
+        "您的袜子订阅已续费",
+        "${name}，您好：\n\n"
+        "您的 ${plan_code} 订阅已续费，有效期至 ${expires_at}。\n\n"
+        "SocksFlow",
+    ),
+}
+
+
+class TemplateError(ValueError):
+    """模板不存在、格式错误或缺少字段"""
+
+
+class NotificationTemplate:
+    """预编译的通知模板"""
+
+    def __init__(self, name: str, subject: str, body: str):
+        self.name = name
+        self.subject = Template(subject)
+        self.body = Template(body)
+        if not (self.subject.is_valid() and self.body.is_valid()):
+            raise TemplateError(f"模板格式错误: {name}")
+        self.fields = frozenset(self.subject.get_identifiers()) | frozenset(self.body.get_identifiers())
+
+    def render(self, context: dict[str, Any]) -> tuple[str, str]:
+        """
+        渲染模板
+
+        Returns:
+            tuple[str, str]: 主题和正文
+
+        Raises:
+            TemplateError: 缺少模板字段
+        """
+        missing = self.fields - context.keys()
+        if missing:
+            raise TemplateError(f"模板 {self.name} 缺少字段: {', '.join(sorted(missing))}")
+        return self.subject.substitute(context), self.body.substitute(context)
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> NotificationTemplate:
+    """获取预编译模板（每个模板只编译一次）"""
+    try:
+        subject, body = NOTIFICATION_TEMPLATES[name]
+    except KeyError:
+        raise TemplateError(f"未知通知模板: {name}")
+    return NotificationTemplate(name, subject, body)
+
+
+@dataclass
+class NotificationResult:
+    """通知发送结果"""
+    sent: int = 0
+    dead: int = 0      # 写入死信表
+    skipped: int = 0   # 用户不存在或未配置 SMTP
+    elapsed: float = 0.0
+
+
+class NotificationService:
+    """通知服务类"""
+
+    def __init__(self, db: AsyncSession, mailer: Optional[Mailer] = None):
+        self.db = db
+        self._mailer = mailer
+
+    @staticmethod
+    def render(template: str, to: str, context: dict[str, Any]) -> OutgoingEmail:
+        """按模板渲染一封邮件"""
+        subject, body = get_template(template).render(context)
+        return OutgoingEmail(to=to, subject=subject, body=body, template=template)
+
+    async def send(self, emails: Sequence[OutgoingEmail]) -> NotificationResult:
+        """
+        发送邮件，失败的邮件写入死信表（随当前事务提交）
+
+        未配置 SMTP 时（开发环境）只记录日志
+        """
+        result = NotificationResult()
+        started = time.perf_counter()
+
+        if self._mailer is None and not settings.smtp_host:
+            for email in emails:
+                logger.info("通知 -> %s: %s", email.to, email.subject)
+            result.skipped = len(emails)
+            return result
+
+        mailer = self._mailer or get_mailer()
+        sent = await mailer.send(emails)
+
+        self.db.add_all([
+            NotificationDeadLetter(
+                recipient=email.to,
+                template=email.template,
+                subject=email.subject,
+                body=email.body,
+                attempts=email.attempts,
+                last_error=email.last_error,
+            )
+            for email in sent.dead
+        ])
+        await self.db.flush()
+
+        result.sent = sent.sent
+        result.dead = len(sent.dead)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    async def notify_users(
+        self,
+        template: str,
+        notices: Sequence[tuple[int, dict[str, Any]]],
+    ) -> NotificationResult:
+        """
+        按模板给一批用户发送通知（收件人单次查询）
+
+        Args:
+            template: 模板名称
+            notices: (用户ID, 模板字段) 列表；模板中的 ${name} 默认取用户名
+
+        Returns:
+            NotificationResult: 发送统计
+        """
+        rows = await self.db.execute(
+            select(User.id, User.email, User.name)
+            .where(User.id.in_({user_id for user_id, _ in notices}))
+        )
+        users = {user_id: (email, name) for user_id, email, name in rows.all()}
+
+        emails = []
+        skipped = 0
+        for user_id, context in notices:
+            if user_id not in users:
+                logger.warning("通知收件人不存在: %s", user_id)
+                skipped += 1
+                continue
+            email, name = users[user_id]
+            emails.append(self.render(template, email, {"name": name, **context}))
+
+        result = await self.send(emails)
+        result.skipped += skipped
+        return result
+
+
+async def _enqueue_notifications(template: str, notices: list[list[Any]]) -> None:
+    """
+    投递模板通知任务（每批事件一个任务）
+
+    SMTP 发送（含重试退避）在任务中批量进行，不占用发件箱批次的事务和行锁；
+    任务在首次调用时才导入，Web 进程不加载 Celery
+    """
+    from app.tasks.base import dispatch
+    from app.tasks.notifications import send_template_notification
+
+    await dispatch(send_template_notification, template, notices)
+
+
+async def _notify_orders_shipped(events: Sequence[OutboxEvent]) -> None:
+    await _enqueue_notifications("order_shipped", [
+        [event.payload["user_id"], {
+            "order_number": event.payload["order_number"],
+            "tracking_number": event.payload.get("tracking_number") or "",
+        }]
+        for event in events
+    ])
+
+
+async def _notify_subscriptions_renewed(events: Sequence[OutboxEvent]) -> None:
+    await _enqueue_notifications("subscription_renewed", [
+        [event.payload["user_id"], {
+            "plan_code": event.payload["plan_code"],
+            "expires_at": event.payload["expires_at"][:10],
+        }]
+        for event in events
+    ])
+
+
+# 发件箱事件 -> 邮件通知（每批合并为一个发送任务，死信由任务写入）
+register_batch_handler("order.shipped", _notify_orders_shipped)
+register_batch_handler("subscription.renewed", _notify_subscriptions_renewed)
@@ -6,15 +6,18 @@ import random
 import string
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Iterable, Optional
 
-from sqlalchemy import select, func
+from sqlalchemy import or_, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.concurrency import transition
+from app.core.fields import load_options
 from app.models.order import Order, OrderStatus
 from app.models.subscription import Subscription
 from app.schemas.order import OrderCreate, OrderUpdate
 from app.schemas.subscription import PLAN_CONFIG
+from app.services.outbox_service import OutboxService
 
 
 class OrderService:
@@ -23,27 +26,67 @@ class OrderService:
     def __init__(self, db: AsyncSession):
         self.db = db
     
-    async def get_by_id(self, order_id: int) -> Optional[Order]:
-        """通过ID获取订单"""
+    async def get_by_id(
+        self,
+        order_id: int,
+        fields: Optional[Iterable[str]] = None
+    ) -> Optional[Order]:
+        """通过ID获取订单（fields 指定时只加载对应列）"""
         result = await self.db.execute(
-            select(Order).where(Order.id == order_id)
+            select(Order)
+            .options(*load_options(Order, fields))
+            .where(Order.id == order_id)
         )
         return result.scalar_one_or_none()
     
-    async def get_by_order_number(self, order_number: str) -> Optional[Order]:
-        """通过订单号获取订单"""
+    async def get_by_order_number(
+        self,
+        order_number: str,
+        fields: Optional[Iterable[str]] = None
+    ) -> Optional[Order]:
+        """通过订单号获取订单（fields 指定时只加载对应列）"""
         result = await self.db.execute(
-            select(Order).where(Order.order_number == order_number)
+            select(Order)
+            .options(*load_options(Order, fields))
+            .where(Order.order_number == order_number)
         )
         return result.scalar_one_or_none()
     
+    async def get_many(
+        self,
+        ids: Iterable[int] = (),
+        order_numbers: Iterable[str] = ()
+    ) -> list[Order]:
+        """
+        批量获取订单（单次 IN 查询）
+        
+        Args:
+            ids: 订单ID列表
+            order_numbers: 订单号列表
+        
+        Returns:
+            list[Order]: 找到的订单（顺序不保证）
+        """
+        ids, order_numbers = set(ids), set(order_numbers)
+        conditions = []
+        if ids:
+            conditions.append(Order.id.in_(ids))
+        if order_numbers:
+            conditions.append(Order.order_number.in_(order_numbers))
+        if not conditions:
+            return []
+        
+        result = await self.db.execute(select(Order).where(or_(*conditions)))
+        return list(result.scalars().all())
+    
     async def get_by_user_id(
         self, 
         user_id: int, 
         skip: int = 0, 
-        limit: int = 100
+        limit: int = 100,
+        fields: Optional[Iterable[str]] = None
     ) -> tuple[list[Order], int]:
-        """获取用户的所有订单（带分页）"""
+        """获取用户的所有订单（带分页，fields 指定时只加载对应列）"""
         # 获取总数
         count_result = await self.db.execute(
             select(func.count()).select_from(Order).where(Order.user_id == user_id)
@@ -53,6 +96,7 @@ class OrderService:
         # 获取列表
         result = await self.db.execute(
             select(Order)
+            .options(*load_options(Order, fields))
             .where(Order.user_id == user_id)
             .order_by(Order.created_at.desc())
             .offset(skip)
@@ -62,11 +106,32 @@ class OrderService:
         
         return orders, total
     
+    async def get_latest_shipping_addresses(
+        self,
+        subscription_ids: Iterable[int]
+    ) -> dict[int, dict]:
+        """
+        批量获取每个订阅最近一笔订单的配送地址（单次查询）
+        
+        Returns:
+            dict[int, dict]: 订阅ID -> 配送地址（没有订单的订阅不在结果中）
+        """
+        latest = (
+            select(func.max(Order.id))
+            .where(Order.subscription_id.in_(set(subscription_ids)))
+            .group_by(Order.subscription_id)
+        )
+        result = await self.db.execute(
+            select(Order.subscription_id, Order.shipping_address)
+            .where(Order.id.in_(latest))
+        )
+        return {subscription_id: address for subscription_id, address in result.all()}
+    
     async def get_pending_by_subscription(
         self, 
         subscription_id: int
     ) -> Optional[Order]:
-        """获取订阅的待支付订单"""
+        """获取订阅最新的待支付订单"""
         result = await self.db.execute(
             select(Order)
             .where(
@@ -74,9 +139,19 @@ class OrderService:
                 Order.status == OrderStatus.PENDING
             )
             .order_by(Order.created_at.desc())
+            .limit(1)
         )
         return result.scalar_one_or_none()
     
+    def _record_event(self, order: Order, event_type: str, **payload) -> None:
+        """在当前事务中写入订单事件（随状态变更一起提交）"""
+        OutboxService(self.db).add("order", order.id, event_type, {
+            "order_number": order.order_number,
+            "user_id": order.user_id,
+            "status": order.status.value,
+            **payload,
+        })
+    
     def _generate_order_number(self) -> str:
         """生成唯一订单号 (格式: SO202402150001)"""
         now = datetime.utcnow()
@@ -125,6 +200,34 @@ class OrderService:
         
         return order
     
+    @staticmethod
+    def subscription_pricing(plan_code: str, months: int = 1) -> tuple[Decimal, list[dict]]:
+        """
+        计算订阅订单的金额和商品列表
+        
+        Args:
+            plan_code: 计划代码
+            months: 订阅月数
+        
+        Returns:
+            tuple[Decimal, list[dict]]: 总价和商品列表
+        """
+        from app.services.subscription_service import SubscriptionService
+        
+        # 计算价格
+        total_amount = SubscriptionService.calculate_plan_price(plan_code, months)
+        
+        # 获取商品列表
+        items = SubscriptionService.get_plan_items(plan_code)
+        
+        # 调整价格和描述
+        for item in items:
+            item["subtotal"] = float(total_amount)
+            if months > 1:
+                item["description"] = f"{months}个月订阅 - {item['description']}"
+        
+        return total_amount, items
+    
     async def create_from_subscription(
         self,
         user_id: int,
@@ -144,21 +247,7 @@ class OrderService:
         Returns:
             Order: 创建的订单对象
         """
-        from app.services.subscription_service import SubscriptionService
-        
-        # 计算价格
-        total_amount = SubscriptionService.calculate_plan_price(
-            subscription.plan_code, months
-        )
-        
-        # 获取商品列表
-        items = SubscriptionService.get_plan_items(subscription.plan_code)
-        
-        # 调整价格和描述
-        for item in items:
-            item["subtotal"] = float(total_amount)
-            if months > 1:
-                item["description"] = f"{months}个月订阅 - {item['description']}"
+        total_amount, items = self.subscription_pricing(subscription.plan_code, months)
         
         order_data = OrderCreate(
             subscription_id=subscription.id,
@@ -198,15 +287,18 @@ class OrderService:
         
         Returns:
             Order: 更新后的订单对象
-        """
-        if order.status != OrderStatus.PENDING:
-            raise ValueError("只有待支付订单可以标记为已支付")
         
-        order.status = OrderStatus.PAID
-        order.paid_at = datetime.utcnow()
+        Raises:
+            ValueError: 订单不是待支付状态（包括被并发请求抢先更新）
+        """
+        def apply(order: Order) -> dict:
+            if order.status != OrderStatus.PENDING:
+                raise ValueError("只有待支付订单可以标记为已支付")
+            return {"status": OrderStatus.PAID, "paid_at": datetime.utcnow()}
         
+        await transition(self.db, order, apply)
+        self._record_event(order, "order.paid", transaction_id=transaction_id)
         await self.db.flush()
-        await self.db.refresh(order)
         return order
     
     async def mark_as_shipped(
@@ -215,27 +307,30 @@ class OrderService:
         tracking_number: str
     ) -> Order:
         """标记订单为已发货"""
-        if order.status != OrderStatus.PAID:
-            raise ValueError("只有已支付订单可以发货")
-        
-        order.status = OrderStatus.SHIPPED
-        order.tracking_number = tracking_number
-        order.shipped_at = datetime.utcnow()
-        
+        def apply(order: Order) -> dict:
+            if order.status != OrderStatus.PAID:
+                raise ValueError("只有已支付订单可以发货")
+            return {
+                "status": OrderStatus.SHIPPED,
+                "tracking_number": tracking_number,
+                "shipped_at": datetime.utcnow(),
+            }
+        
+        await transition(self.db, order, apply)
+        self._record_event(order, "order.shipped", tracking_number=tracking_number)
         await self.db.flush()
-        await self.db.refresh(order)
         return order
     
     async def mark_as_delivered(self, order: Order) -> Order:
         """标记订单为已送达"""
-        if order.status != OrderStatus.SHIPPED:
-            raise ValueError("只有已发货订单可以标记为已送达")
-        
-        order.status = OrderStatus.DELIVERED
-        order.delivered_at = datetime.utcnow()
+        def apply(order: Order) -> dict:
+            if order.status != OrderStatus.SHIPPED:
+                raise ValueError("只有已发货订单可以标记为已送达")
+            return {"status": OrderStatus.DELIVERED, "delivered_at": datetime.utcnow()}
         
+        await transition(self.db, order, apply)
+        self._record_event(order, "order.delivered")
         await self.db.flush()
-        await self.db.refresh(order)
         return order
     
     async def cancel(self, order: Order) -> Order:
@@ -251,13 +346,14 @@ class OrderService:
         Raises:
             ValueError: 订单状态不允许取消
         """
-        if order.status not in [OrderStatus.PENDING, OrderStatus.PAID]:
-            raise ValueError(f"当前状态({order.status})的订单无法取消")
-        
-        order.status = OrderStatus.CANCELLED
+        def apply(order: Order) -> dict:
+            if order.status not in [OrderStatus.PENDING, OrderStatus.PAID]:
+                raise ValueError(f"当前状态({order.status})的订单无法取消")
+            return {"status": OrderStatus.CANCELLED}
         
+        await transition(self.db, order, apply)
+        self._record_event(order, "order.cancelled")
         await self.db.flush()
-        await self.db.refresh(order)
         return order
     
     async def can_cancel(self, order: Order) -> bool:
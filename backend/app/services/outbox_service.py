@@ -0,0 +1,316 @@
+"""
+事务性发件箱服务
+- 写入：状态变更时在同一事务中追加事件（随业务一起提交或回滚）
+- 分发：后台任务按 id 顺序批量投递，投递成功后标记，至少一次语义；超过最大投递次数的事件放弃
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable, Optional, Sequence
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.events import emit_event
+from app.core.metrics import metrics
+from app.models.outbox_event import OutboxEvent
+
+# 事件处理函数：抛出异常表示投递失败，事件保留待下次重试
+EventHandler = Callable[[OutboxEvent], Awaitable[None]]
+
+# 批量处理函数：每批中同一类型的事件一次处理（如合并发送通知），抛出异常表示这些事件都投递失败
+BatchEventHandler = Callable[[Sequence[OutboxEvent]], Awaitable[None]]
+
+# 事件类型 -> 处理函数列表（"*" 匹配所有事件）
+_handlers: dict[str, list[EventHandler]] = {}
+_batch_handlers: dict[str, list[BatchEventHandler]] = {}
+
+
+def register_handler(event_type: str, handler: EventHandler) -> None:
+    """
+    注册事件处理函数
+
+    处理函数可能收到重复事件（至少一次投递），需按事件 id 自行幂等
+
+    Args:
+        event_type: 事件类型，"*" 表示所有事件
+        handler: 异步处理函数
+    """
+    _handlers.setdefault(event_type, []).append(handler)
+
+
+def register_batch_handler(event_type: str, handler: BatchEventHandler) -> None:
+    """
+    注册批量处理函数（每批调用一次，参数为本批中逐条处理成功的该类型事件，按 id 升序）
+
+    同样需要按事件 id 自行幂等
+    """
+    _batch_handlers.setdefault(event_type, []).append(handler)
+
+
+async def log_handler(event: OutboxEvent) -> None:
+    """默认处理函数：写入 socksflow.events 日志"""
+    emit_event(event.event_type, event.aggregate_id, {"event_id": event.id, **event.payload})
+
+
+register_handler("*", log_handler)
+
+
+@dataclass
+class OutboxDispatchResult:
+    """发件箱分发结果"""
+    dispatched: int = 0      # 投递成功
+    failed: int = 0          # 投递失败，等待重试
+    dead: int = 0            # 超过最大投递次数，放弃（标记 failed_at）
+    blocked: int = 0         # 同一聚合有更早的事件投递失败，本轮跳过
+    batches: int = 0
+    backlog: int = 0         # 分发后剩余的未投递事件数
+    lag_seconds: float = 0.0  # 最早未投递事件的等待时长
+    elapsed: float = 0.0
+
+
+class OutboxService:
+    """
+    发件箱服务类
+
+    分发顺序：
+    - 按 id 升序投递；某事件失败后，本轮同一聚合的后续事件都跳过，保证单个聚合内有序
+    - 每批使用 SELECT ... FOR UPDATE（不跳过锁定行），重叠执行的分发器会等待而不是越过前一批，
+      需要并行时用 partition/partitions 按聚合ID分片，每个分片一个分发器
+    - 批量处理函数在逐条处理之后按事件类型各调用一次；失败时该类型事件及同一聚合的后续事件都保留重试
+    - 投递次数达到 max_attempts 仍失败的事件标记 failed_at 后不再重试，也不再阻塞同一聚合的后续事件，
+      计入 outbox_dead_total{event_type}，需人工排查
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        handlers: Optional[dict[str, list[EventHandler]]] = None,
+        batch_handlers: Optional[dict[str, list[BatchEventHandler]]] = None,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        partition: int = 0,
+        partitions: int = 1,
+    ):
+        self.db = db
+        # 都未指定时使用全局注册的处理函数，指定任一项时只使用传入的
+        if handlers is None and batch_handlers is None:
+            handlers, batch_handlers = _handlers, _batch_handlers
+        self.handlers = handlers or {}
+        self.batch_handlers = batch_handlers or {}
+        self.batch_size = batch_size or settings.outbox_batch_size
+        self.max_attempts = max_attempts or settings.outbox_max_attempts
+        self.partition = partition
+        self.partitions = partitions
+
+    def add(
+        self,
+        aggregate_type: str,
+        aggregate_id: int,
+        event_type: str,
+        payload: Optional[dict[str, Any]] = None,
+    ) -> OutboxEvent:
+        """
+        追加事件（加入当前会话，随业务事务一起提交）
+
+        Args:
+            aggregate_type: 聚合类型 (order/subscription)
+            aggregate_id: 聚合ID
+            event_type: 事件类型，如 "order.paid"
+            payload: 事件数据（需可 JSON 序列化）
+        """
+        event = OutboxEvent(
+            aggregate_type=aggregate_type,
+            aggregate_id=aggregate_id,
+            event_type=event_type,
+            payload=payload or {},
+            attempts=0,
+        )
+        self.db.add(event)
+        return event
+
+    async def add_many(
+        self,
+        aggregate_type: str,
+        event_type: str,
+        events: Iterable[tuple[int, dict[str, Any]]],
+    ) -> int:
+        """
+        批量追加同类事件（单条 executemany INSERT，用于批处理的集合更新）
+
+        Args:
+            aggregate_type: 聚合类型
+            event_type: 事件类型
+            events: (聚合ID, 事件数据) 列表
+
+        Returns:
+            int: 写入的事件数
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "aggregate_type": aggregate_type,
+                "aggregate_id": aggregate_id,
+                "event_type": event_type,
+                "payload": payload,
+                "attempts": 0,
+                "created_at": now,
+            }
+            for aggregate_id, payload in events
+        ]
+        if rows:
+            await self.db.execute(insert(OutboxEvent), rows)
+        return len(rows)
+
+    def _pending(self) -> list:
+        conditions = [OutboxEvent.dispatched_at.is_(None), OutboxEvent.failed_at.is_(None)]
+        if self.partitions > 1:
+            conditions.append(OutboxEvent.aggregate_id % self.partitions == self.partition)
+        return conditions
+
+    async def _deliver(self, event: OutboxEvent) -> None:
+        for handler in (*self.handlers.get("*", ()), *self.handlers.get(event.event_type, ())):
+            await handler(event)
+
+    async def _deliver_batches(self, events: Sequence[OutboxEvent]) -> dict[str, str]:
+        """调用批量处理函数，返回 投递失败的事件类型 -> 错误信息"""
+        by_type: dict[str, list[OutboxEvent]] = {}
+        for event in events:
+            if event.event_type in self.batch_handlers:
+                by_type.setdefault(event.event_type, []).append(event)
+
+        failures = {}
+        for event_type, group in by_type.items():
+            try:
+                for handler in self.batch_handlers[event_type]:
+                    await handler(group)
+            except Exception as exc:
+                failures[event_type] = f"{type(exc).__name__}: {exc}"[:500]
+        return failures
+
+    async def dispatch_batch(
+        self,
+        after_id: int,
+        blocked: set[tuple[str, int]],
+        result: OutboxDispatchResult,
+    ) -> Optional[int]:
+        """
+        投递 id 大于 after_id 的一批事件并提交
+
+        Args:
+            after_id: 上一批最后一个事件的 id
+            blocked: 本轮已有事件投递失败的聚合（会被更新）
+            result: 累计结果
+
+        Returns:
+            本批最后一个事件的 id；没有更多事件时返回 None
+        """
+        events = (await self.db.execute(
+            select(OutboxEvent)
+            .where(*self._pending(), OutboxEvent.id > after_id)
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+            .with_for_update()
+        )).scalars().all()
+        if not events:
+            return None
+
+        delivered = []
+        for event in events:
+            key = (event.aggregate_type, event.aggregate_id)
+            if key in blocked:
+                result.blocked += 1
+                continue
+
+            event.attempts += 1
+            try:
+                await self._deliver(event)
+            except Exception as exc:
+                self._fail(event, f"{type(exc).__name__}: {exc}"[:500], blocked, result)
+                continue
+            delivered.append(event)
+
+        failures = await self._deliver_batches(delivered)
+        batch_blocked: set[tuple[str, int]] = set()
+        for event in delivered:
+            key = (event.aggregate_type, event.aggregate_id)
+            if event.event_type in failures:
+                self._fail(event, failures[event.event_type], batch_blocked, result)
+                continue
+            if key in batch_blocked:
+                # 同一聚合更早的事件批量投递失败，保持聚合内顺序
+                result.blocked += 1
+                continue
+
+            event.dispatched_at = datetime.utcnow()
+            result.dispatched += 1
+            metrics.inc("outbox_dispatched_total", event_type=event.event_type)
+        blocked |= batch_blocked
+
+        last_id = events[-1].id
+        await self.db.commit()
+        result.batches += 1
+        return last_id if len(events) == self.batch_size else None
+
+    def _fail(
+        self,
+        event: OutboxEvent,
+        error: str,
+        blocked: set[tuple[str, int]],
+        result: OutboxDispatchResult,
+    ) -> None:
+        event.last_error = error
+        metrics.inc("outbox_failures_total", event_type=event.event_type)
+        if event.attempts >= self.max_attempts:
+            # 放弃该事件：不再重试，同一聚合的后续事件照常投递
+            event.failed_at = datetime.utcnow()
+            result.dead += 1
+            metrics.inc("outbox_dead_total", event_type=event.event_type)
+            return
+        blocked.add((event.aggregate_type, event.aggregate_id))
+        result.failed += 1
+
+    async def measure(self, now: Optional[datetime] = None) -> tuple[int, float]:
+        """
+        统计积压并更新 outbox_backlog / outbox_lag_seconds 指标
+
+        Returns:
+            tuple[int, float]: 未投递事件数、最早未投递事件的等待秒数
+        """
+        backlog, oldest = (await self.db.execute(
+            select(func.count(), func.min(OutboxEvent.created_at)).where(*self._pending())
+        )).one()
+        lag = 0.0
+        if oldest is not None:
+            lag = max(((now or datetime.utcnow()) - oldest.replace(tzinfo=None)).total_seconds(), 0.0)
+
+        partition = f"{self.partition}/{self.partitions}"
+        metrics.set("outbox_backlog", backlog, partition=partition)
+        metrics.set("outbox_lag_seconds", lag, partition=partition)
+        return backlog, lag
+
+    async def dispatch(self, max_batches: Optional[int] = None) -> OutboxDispatchResult:
+        """
+        从最早的未投递事件开始，逐批投递到当前末尾
+
+        投递失败的事件保留，下次分发从它重新开始；达到最大投递次数的事件放弃
+
+        Args:
+            max_batches: 本轮最多处理的批数（默认不限）
+
+        Returns:
+            OutboxDispatchResult: 分发统计和积压情况
+        """
+        result = OutboxDispatchResult()
+        blocked: set[tuple[str, int]] = set()
+        started = time.perf_counter()
+
+        after_id: Optional[int] = 0
+        while after_id is not None and (max_batches is None or result.batches < max_batches):
+            after_id = await self.dispatch_batch(after_id, blocked, result)
+
+        result.backlog, result.lag_seconds = await self.measure()
+        await self.db.commit()
+        result.elapsed = time.perf_counter() - started
+        return result
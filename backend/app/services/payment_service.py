@@ -6,14 +6,25 @@ import random
 import string
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
 
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.payment import Payment, PaymentStatus, PaymentProvider
 from app.models.order import Order, OrderStatus
+from app.core.concurrency import transition
 from app.core.config import settings
+from app.services.alipay_gateway import AlipayGateway, get_alipay_gateway
+from app.services.billing_service import BillingService
+from app.services.order_service import OrderService
+from app.services.providers import (
+    ProviderError,
+    ProviderNotConfiguredError,
+    TradeResult,
+    TradeState,
+    get_provider,
+)
 
 
 class PaymentService:
@@ -21,30 +32,11 @@ class PaymentService:
     
     def __init__(self, db: AsyncSession):
         self.db = db
-        self._alipay_client = None
     
-    def _get_alipay_client(self):
-        """获取支付宝客户端（懒加载）"""
-        if self._alipay_client is None:
-            try:
-                from alipay import AliPay
-                
-                # 检查配置
-                if not settings.alipay_app_id:
-                    raise ValueError("支付宝APP_ID未配置")
-                
-                self._alipay_client = AliPay(
-                    appid=settings.alipay_app_id,
-                    app_notify_url=settings.frontend_url + "/api/v1/payments/callback",
-                    app_private_key_string=settings.alipay_private_key or "",
-                    alipay_public_key_string=settings.alipay_public_key or "",
-                    sign_type="RSA2",
-                    debug=True  # 沙箱模式
-                )
-            except ImportError:
-                raise ImportError("请先安装 python-alipay-sdk: pip install python-alipay-sdk")
-        
-        return self._alipay_client
+    @staticmethod
+    def _get_alipay_gateway() -> AlipayGateway:
+        """获取支付宝网关（进程内单例）"""
+        return get_alipay_gateway()
     
     async def get_by_id(self, payment_id: int) -> Optional[Payment]:
         """通过ID获取支付记录"""
@@ -53,6 +45,16 @@ class PaymentService:
         )
         return result.scalar_one_or_none()
     
+    async def get_many(self, ids: Iterable[int]) -> list[Payment]:
+        """批量获取支付记录（单次 IN 查询）"""
+        ids = set(ids)
+        if not ids:
+            return []
+        result = await self.db.execute(
+            select(Payment).where(Payment.id.in_(ids))
+        )
+        return list(result.scalars().all())
+    
     async def get_by_payment_no(self, payment_no: str) -> Optional[Payment]:
         """通过支付号获取支付记录"""
         result = await self.db.execute(
@@ -127,33 +129,42 @@ class PaymentService:
         
         return payment
     
-    async def create_alipay_payment(
+    async def create_provider_payment(
         self,
         user_id: int,
         order: Order,
+        provider: PaymentProvider,
         return_url: Optional[str] = None
     ) -> tuple[Payment, str]:
         """
-        创建支付宝支付
+        创建第三方支付
         
         Args:
             user_id: 用户ID
             order: 订单对象
+            provider: 支付提供商
             return_url: 支付成功后跳转URL
         
         Returns:
-            tuple[Payment, str]: 支付记录和支付URL
+            tuple[Payment, str]: 支付记录和支付URL（微信为二维码链接）
+        
+        Raises:
+            ProviderNotConfiguredError: 提供商未配置且未开启模拟支付
         """
+        # 检查是否配置了该提供商（未配置时仅开发模式使用模拟支付）
+        client = get_provider(provider)
+        if not client.configured and not settings.payment_mock_enabled:
+            raise ProviderNotConfiguredError(f"支付方式 {provider.value} 未配置")
+        
         # 创建支付记录
         payment = await self.create(
             user_id=user_id,
             order_id=order.id,
             amount=order.total_amount,
-            provider=PaymentProvider.ALIPAY
+            provider=provider
         )
         
-        # 检查是否配置了支付宝（未配置时使用模拟支付）
-        if not settings.alipay_app_id:
+        if not client.configured:
             # 模拟支付：直接标记为成功（仅用于开发测试）
             await self.mark_as_success(payment, f"MOCK_{payment.payment_no}")
             await self._update_order_status(payment.order_id)
@@ -161,100 +172,102 @@ class PaymentService:
             mock_url = f"{settings.frontend_url}/payment/success?out_trade_no={payment.payment_no}&mock=1"
             return payment, mock_url
         
-        # 生成支付宝支付URL
-        alipay = self._get_alipay_client()
-        
-        order_string = alipay.api_alipay_trade_page_pay(
-            out_trade_no=payment.payment_no,
-            total_amount=str(order.total_amount),
+        pay_url = await client.create_payment(
+            payment,
             subject=f"SocksFlow 订单 #{order.order_number}",
-            return_url=return_url or f"{settings.frontend_url}/payment/success",
-            notify_url=f"{settings.frontend_url}/api/v1/payments/callback"
+            return_url=return_url,
         )
-        
-        # 沙箱环境支付URL
-        pay_url = f"https://openapi.alipaydev.com/gateway.do?{order_string}"
-        
         return payment, pay_url
     
-    async def verify_alipay_callback(self, data: Dict[str, Any]) -> bool:
+    async def create_alipay_payment(
+        self,
+        user_id: int,
+        order: Order,
+        return_url: Optional[str] = None
+    ) -> tuple[Payment, str]:
+        """创建支付宝支付"""
+        return await self.create_provider_payment(
+            user_id, order, PaymentProvider.ALIPAY, return_url
+        )
+    
+    async def apply_trade_result(self, trade: TradeResult) -> Optional[Payment]:
         """
-        验证支付宝回调签名
+        按交易结果（回调通知或主动查询）更新支付记录和订单
         
         Args:
-            data: 回调数据
+            trade: 提供商返回的统一交易结果
         
         Returns:
-            bool: 验证是否通过
+            Payment: 更新后的支付记录，支付记录不存在时返回None
+        
+        Raises:
+            ValueError: 交易结果来自其他提供商
         """
-        try:
-            alipay = self._get_alipay_client()
-            
-            # 提取签名
-            signature = data.pop("sign", None)
-            
-            if not signature:
-                return False
-            
-            # 验证签名
-            return alipay.verify(data, signature)
-        except Exception:
-            return False
+        payment = await self.get_by_payment_no(trade.out_trade_no)
+        if not payment:
+            return None
+        if trade.provider is not None and trade.provider != payment.provider:
+            raise ValueError(
+                f"交易结果来自 {trade.provider.value}，与支付记录的提供商 {payment.provider.value} 不一致"
+            )
+        
+        def apply(payment: Payment) -> dict:
+            # 保存第三方返回数据
+            values: dict[str, Any] = {"provider_response": trade.raw}
+            # 处理交易状态
+            if trade.state == TradeState.PAID and payment.status != PaymentStatus.SUCCESS:
+                values.update(self._success_values(trade.trade_no))
+            elif trade.state == TradeState.CLOSED and payment.status == PaymentStatus.PENDING:
+                values["status"] = PaymentStatus.FAILED
+            return values
+        
+        await transition(self.db, payment, apply)
+        if payment.status == PaymentStatus.SUCCESS:
+            # 同时更新订单状态（订单已支付时不变）
+            await self._update_order_status(payment.order_id)
+        return payment
     
-    async def process_alipay_callback(
+    @staticmethod
+    def _success_values(transaction_id: Optional[str]) -> dict[str, Any]:
+        return {
+            "status": PaymentStatus.SUCCESS,
+            "transaction_id": transaction_id,
+            "paid_at": datetime.utcnow(),
+        }
+    
+    async def mark_as_success(
         self, 
-        data: Dict[str, Any]
-    ) -> Optional[Payment]:
+        payment: Payment, 
+        transaction_id: str
+    ) -> Payment:
         """
-        处理支付宝回调
+        标记支付为成功（已成功时不变）
         
         Args:
-            data: 回调数据
+            payment: 支付记录
+            transaction_id: 第三方交易号
         
         Returns:
-            Payment: 更新后的支付记录，失败返回None
+            Payment: 更新后的支付记录
         """
-        # 获取支付号和交易状态
-        payment_no = data.get("out_trade_no")
-        trade_status = data.get("trade_status")
-        trade_no = data.get("trade_no")  # 支付宝交易号
-        
-        if not payment_no:
-            return None
-        
-        # 查找支付记录
-        payment = await self.get_by_payment_no(payment_no)
-        if not payment:
-            return None
+        def apply(payment: Payment) -> Optional[dict]:
+            if payment.status == PaymentStatus.SUCCESS:
+                return None
+            return self._success_values(transaction_id)
         
-        # 保存第三方返回数据
-        payment.provider_response = data
-        
-        # 验证签名
-        if not await self.verify_alipay_callback(data.copy()):
-            # 沙箱环境可以跳过签名验证（仅用于开发）
-            pass
-        
-        # 处理交易状态
-        if trade_status in ["TRADE_SUCCESS", "TRADE_FINISHED"]:
-            if payment.status != PaymentStatus.SUCCESS:
-                await self.mark_as_success(payment, trade_no)
-                # 同时更新订单状态
-                await self._update_order_status(payment.order_id)
-        elif trade_status == "TRADE_CLOSED":
-            if payment.status == PaymentStatus.PENDING:
-                await self.mark_as_failed(payment)
-        
-        await self.db.flush()
+        await transition(self.db, payment, apply)
         return payment
     
-    async def mark_as_success(
-        self, 
-        payment: Payment, 
-        transaction_id: str
+    async def confirm_success(
+        self,
+        payment: Payment,
+        transaction_id: Optional[str] = None,
     ) -> Payment:
         """
-        标记支付为成功
+        确认支付成功并更新订单状态（已成功时不变）
+        
+        待支付 -> 成功；已失败的支付只有提供商查询确认已支付时才改为成功
+        （按查询结果经 apply_trade_result 回写，保存提供商响应）
         
         Args:
             payment: 支付记录
@@ -262,27 +275,41 @@ class PaymentService:
         
         Returns:
             Payment: 更新后的支付记录
+        
+        Raises:
+            ValueError: 支付已失败且提供商未确认已支付
+            ConcurrentUpdateError: 超过重试次数仍与并发更新冲突
         """
-        if payment.status == PaymentStatus.SUCCESS:
+        if payment.status == PaymentStatus.FAILED:
+            try:
+                trade = await self.query_status(payment)
+            except ProviderError as e:
+                raise ValueError(f"支付已失败，无法向提供商确认交易状态: {e}") from e
+            if trade.state != TradeState.PAID:
+                raise ValueError(f"支付已失败，提供商交易状态为 {trade.state.value}")
+            await self.apply_trade_result(trade)
             return payment
         
-        payment.status = PaymentStatus.SUCCESS
-        payment.transaction_id = transaction_id
-        payment.paid_at = datetime.utcnow()
+        def apply(payment: Payment) -> Optional[dict]:
+            if payment.status == PaymentStatus.SUCCESS:
+                return None
+            if payment.status != PaymentStatus.PENDING:
+                raise ValueError("只有待支付的支付记录可以确认成功")
+            return self._success_values(transaction_id)
         
-        await self.db.flush()
-        await self.db.refresh(payment)
+        await transition(self.db, payment, apply)
+        # 同时更新订单状态（订单已支付时不变）
+        await self._update_order_status(payment.order_id)
         return payment
     
     async def mark_as_failed(self, payment: Payment) -> Payment:
         """标记支付为失败"""
-        if payment.status != PaymentStatus.PENDING:
-            raise ValueError("只有待支付订单可以标记为失败")
+        def apply(payment: Payment) -> dict:
+            if payment.status != PaymentStatus.PENDING:
+                raise ValueError("只有待支付订单可以标记为失败")
+            return {"status": PaymentStatus.FAILED}
         
-        payment.status = PaymentStatus.FAILED
-        
-        await self.db.flush()
-        await self.db.refresh(payment)
+        await transition(self.db, payment, apply)
         return payment
     
     async def _update_order_status(self, order_id: int) -> None:
@@ -293,9 +320,23 @@ class PaymentService:
         order = result.scalar_one_or_none()
         
         if order and order.status == OrderStatus.PENDING:
-            order.status = OrderStatus.PAID
-            order.paid_at = datetime.utcnow()
-            await self.db.flush()
+            try:
+                await OrderService(self.db).mark_as_paid(order)
+            except ValueError:
+                # 并发请求已更新了订单（已支付或已取消）
+                return
+            if BillingService.is_renewal_order(order):
+                # 续费订单：支付成功后才延长订阅有效期
+                await BillingService(self.db).settle_renewal(order)
+    
+    async def query_status(self, payment: Payment) -> TradeResult:
+        """
+        向支付记录所属的提供商查询交易状态
+        
+        Raises:
+            ProviderError: 查询失败
+        """
+        return await get_provider(payment.provider).query(payment.payment_no)
     
     async def query_alipay_status(self, payment: Payment) -> Dict[str, Any]:
         """
@@ -308,11 +349,7 @@ class PaymentService:
             dict: 查询结果
         """
         try:
-            alipay = self._get_alipay_client()
-            
-            result = alipay.api_alipay_trade_query(
-                out_trade_no=payment.payment_no
-            )
+            result = await self._get_alipay_gateway().query_trade(payment.payment_no)
             
             return {
                 "success": True,
@@ -350,17 +387,11 @@ class PaymentService:
         refund_amount = refund_amount or payment.amount
         
         try:
-            alipay = self._get_alipay_client()
-            
             # 生成退款请求号
             refund_no = f"{payment.payment_no}{datetime.utcnow().strftime('%H%M%S')}"
             
-            result = alipay.api_alipay_trade_refund(
-                out_trade_no=payment.payment_no,
-                trade_no=payment.transaction_id,
-                refund_amount=str(refund_amount),
-                out_request_no=refund_no,
-                refund_reason=reason
+            result = await get_provider(payment.provider).refund(
+                payment, refund_amount, refund_no, reason
             )
             
             return {
@@ -0,0 +1,56 @@
+"""
+支付提供商
+按 PaymentProvider 查表分派，每个提供商进程内只创建一个实例
+"""
+import threading
+
+from app.models.payment import PaymentProvider
+from app.services.providers.alipay import AlipayProvider
+from app.services.providers.base import (
+    PaymentProviderClient,
+    ProviderError,
+    ProviderNotConfiguredError,
+    TradeResult,
+    TradeState,
+)
+from app.services.providers.wechat import WechatPayProvider
+
+# 提供商 -> 实现类（新增提供商只需在这里登记）
+PROVIDERS: dict[PaymentProvider, type[PaymentProviderClient]] = {
+    PaymentProvider.ALIPAY: AlipayProvider,
+    PaymentProvider.WECHAT: WechatPayProvider,
+}
+
+_instances: dict[PaymentProvider, PaymentProviderClient] = {}
+_instances_lock = threading.Lock()
+
+
+def get_provider(provider: PaymentProvider) -> PaymentProviderClient:
+    """获取提供商实例（首次调用时创建）"""
+    instance = _instances.get(provider)
+    if instance is None:
+        with _instances_lock:
+            instance = _instances.get(provider)
+            if instance is None:
+                instance = _instances[provider] = PROVIDERS[provider]()
+    return instance
+
+
+def reset_providers() -> None:
+    """丢弃已创建的实例（配置变更后重新加载密钥）"""
+    with _instances_lock:
+        _instances.clear()
+
+
+__all__ = [
+    "PROVIDERS",
+    "PaymentProviderClient",
+    "ProviderError",
+    "ProviderNotConfiguredError",
+    "TradeResult",
+    "TradeState",
+    "AlipayProvider",
+    "WechatPayProvider",
+    "get_provider",
+    "reset_providers",
+]
@@ -0,0 +1,113 @@
+"""
+支付宝支付提供商
+"""
+from decimal import Decimal
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import PlainTextResponse, Response
+
+from app.core.config import settings
+from app.models.payment import Payment, PaymentProvider
+from app.services.alipay_gateway import get_alipay_gateway
+from app.services.providers.base import PaymentProviderClient, ProviderError, TradeResult, TradeState
+
+# 支付宝交易状态 -> 统一状态
+ALIPAY_TRADE_STATES = {
+    "TRADE_SUCCESS": TradeState.PAID,
+    "TRADE_FINISHED": TradeState.PAID,
+    "TRADE_CLOSED": TradeState.CLOSED,
+    "WAIT_BUYER_PAY": TradeState.WAITING,
+}
+
+
+class AlipayProvider(PaymentProviderClient):
+    """支付宝（电脑网站支付），调用由进程内共享的 AlipayGateway 完成"""
+
+    provider = PaymentProvider.ALIPAY
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.alipay_app_id)
+
+    async def create_payment(
+        self,
+        payment: Payment,
+        subject: str,
+        return_url: Optional[str] = None,
+    ) -> str:
+        gateway = get_alipay_gateway()
+        order_string = await gateway.page_pay(
+            out_trade_no=payment.payment_no,
+            total_amount=str(payment.amount),
+            subject=subject,
+            return_url=return_url or f"{settings.frontend_url}/payment/success",
+            notify_url=f"{settings.frontend_url}/api/v1/payments/callback"
+        )
+        return f"{gateway.gateway_url}?{order_string}"
+
+    async def verify(self, data: dict[str, Any]) -> bool:
+        """验证异步通知签名"""
+        data = dict(data)
+        signature = data.pop("sign", None)
+        if not signature:
+            return False
+        try:
+            return await get_alipay_gateway().verify(data, signature)
+        except Exception:
+            return False
+
+    async def parse_callback(
+        self,
+        body: bytes,
+        headers: Mapping[str, str],
+        form: Mapping[str, Any],
+    ) -> Optional[TradeResult]:
+        data = dict(form)
+        if "out_trade_no" not in data:
+            raise ValueError("缺少 out_trade_no")
+        if not self.configured:
+            # 未配置支付宝：仅开启模拟支付的开发环境跳过验签
+            if not settings.payment_mock_enabled:
+                return None
+        elif not await self.verify(data):
+            return None
+        return self.trade_from_payload(data)
+
+    def trade_from_payload(self, payload: dict[str, Any]) -> TradeResult:
+        return TradeResult(
+            out_trade_no=payload["out_trade_no"],
+            state=ALIPAY_TRADE_STATES.get(payload.get("trade_status"), TradeState.UNKNOWN),
+            provider=self.provider,
+            trade_no=payload.get("trade_no"),
+            notify_id=payload.get("notify_id"),
+            raw=payload,
+        )
+
+    async def query(self, payment_no: str) -> TradeResult:
+        try:
+            data = await get_alipay_gateway().query_trade(payment_no)
+        except Exception as e:
+            raise ProviderError(str(e)) from e
+        return self.trade_from_payload({"out_trade_no": payment_no, **data})
+
+    async def refund(
+        self,
+        payment: Payment,
+        amount: Decimal,
+        refund_no: str,
+        reason: str,
+    ) -> dict[str, Any]:
+        try:
+            return await get_alipay_gateway().refund(
+                out_trade_no=payment.payment_no,
+                trade_no=payment.transaction_id,
+                refund_amount=str(amount),
+                out_request_no=refund_no,
+                refund_reason=reason
+            )
+        except Exception as e:
+            raise ProviderError(str(e)) from e
+
+    def callback_response(self, accepted: bool) -> Response:
+        # 支付宝要求返回纯文本 success，否则会重复通知
+        return PlainTextResponse("success" if accepted else "fail")
@@ -0,0 +1,109 @@
+"""
+支付提供商接口
+各提供商把自己的请求/回调格式转换为统一的交易结果，PaymentService 只处理统一结果
+"""
+import enum
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import Response
+
+from app.models.payment import Payment, PaymentProvider
+
+
+class TradeState(str, enum.Enum):
+    """统一的交易状态"""
+    PAID = "paid"          # 已支付
+    CLOSED = "closed"      # 已关闭（超时未支付、撤销）
+    WAITING = "waiting"    # 等待支付
+    UNKNOWN = "unknown"    # 其他状态（退款中等），不改变本地支付记录
+
+
+@dataclass
+class TradeResult:
+    """统一的交易结果（查询结果或回调通知）"""
+    out_trade_no: str
+    state: TradeState
+    provider: Optional[PaymentProvider] = None  # 结果来源提供商（须与支付记录一致）
+    trade_no: Optional[str] = None             # 第三方交易号
+    notify_id: Optional[str] = None            # 回调通知ID（用于收件箱去重）
+    raw: dict[str, Any] = field(default_factory=dict)  # 提供商原始数据
+
+
+class ProviderError(Exception):
+    """提供商调用失败（网络错误、业务错误、响应验签失败）"""
+
+
+class ProviderNotConfiguredError(ValueError):
+    """提供商未配置且未开启模拟支付"""
+
+
+class PaymentProviderClient(ABC):
+    """
+    支付提供商客户端
+
+    实现类在进程内只创建一次（密钥解析等初始化成本不随请求发生），
+    远程调用使用共享的 httpx.AsyncClient
+    """
+
+    provider: PaymentProvider
+
+    @property
+    @abstractmethod
+    def configured(self) -> bool:
+        """是否已配置（未配置时仅在开启 payment_mock_enabled 后使用模拟支付）"""
+
+    @abstractmethod
+    async def create_payment(
+        self,
+        payment: Payment,
+        subject: str,
+        return_url: Optional[str] = None,
+    ) -> str:
+        """
+        下单
+
+        Returns:
+            str: 支付链接（支付宝为收银台URL，微信为二维码链接 code_url）
+        """
+
+    @abstractmethod
+    async def parse_callback(
+        self,
+        body: bytes,
+        headers: Mapping[str, str],
+        form: Mapping[str, Any],
+    ) -> Optional[TradeResult]:
+        """
+        验证并解析回调通知
+
+        Returns:
+            TradeResult；验签失败返回 None
+
+        Raises:
+            ValueError: 通知格式错误
+        """
+
+    @abstractmethod
+    def trade_from_payload(self, payload: dict[str, Any]) -> TradeResult:
+        """从收件箱保存的通知数据（TradeResult.raw）还原交易结果"""
+
+    @abstractmethod
+    async def query(self, payment_no: str) -> TradeResult:
+        """查询交易状态"""
+
+    @abstractmethod
+    async def refund(
+        self,
+        payment: Payment,
+        amount: Decimal,
+        refund_no: str,
+        reason: str,
+    ) -> dict[str, Any]:
+        """申请退款，返回提供商响应"""
+
+    @abstractmethod
+    def callback_response(self, accepted: bool) -> Response:
+        """回调应答（各提供商要求的格式不同）"""
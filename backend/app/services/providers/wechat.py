@@ -0,0 +1,272 @@
+"""
+微信支付提供商（APIv3，Native 扫码支付）
+pycryptodomex 只在首次创建提供商实例 / 解密回调时导入，未启用微信支付的进程不承担导入开销
+"""
+import base64
+import json
+import secrets
+import time
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Mapping, Optional
+
+import httpx
+from fastapi.responses import JSONResponse, Response
+
+from app.core.config import settings
+from app.core.http import get_http_client
+from app.core.metrics import metrics
+from app.core.responses import json_dumps
+from app.models.payment import Payment, PaymentProvider
+from app.services.providers.base import PaymentProviderClient, ProviderError, TradeResult, TradeState
+
+if TYPE_CHECKING:
+    from Cryptodome.PublicKey.RSA import RsaKey
+
+# 微信支付交易状态 -> 统一状态
+WECHAT_TRADE_STATES = {
+    "SUCCESS": TradeState.PAID,
+    "CLOSED": TradeState.CLOSED,
+    "REVOKED": TradeState.CLOSED,
+    "PAYERROR": TradeState.CLOSED,
+    "NOTPAY": TradeState.WAITING,
+    "USERPAYING": TradeState.WAITING,
+}
+
+# 回调/响应签名时间戳允许的偏差（秒），防止重放
+SIGNATURE_MAX_SKEW = 300
+
+
+def _load_key(pem: Optional[str]) -> Optional["RsaKey"]:
+    if not pem:
+        return None
+    from Cryptodome.PublicKey import RSA
+
+    return RSA.import_key(pem)
+
+
+class WechatPayProvider(PaymentProviderClient):
+    """
+    微信支付
+
+    - 商户私钥、平台公钥在创建时解析一次
+    - 请求使用 WECHATPAY2-SHA256-RSA2048 签名，响应和回调用平台公钥验签
+    - 回调资源使用 APIv3 密钥 AEAD_AES_256_GCM 解密
+    - 记录 wechat_call_seconds{method, outcome} 延迟直方图
+    """
+
+    provider = PaymentProvider.WECHAT
+
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
+        self._http = http
+        self._private_key = _load_key(settings.wechat_pay_private_key)
+        self._platform_key = _load_key(settings.wechat_pay_platform_public_key)
+        self._api_key = (settings.wechat_pay_api_key or "").encode()
+
+    @property
+    def configured(self) -> bool:
+        return bool(
+            settings.wechat_pay_appid
+            and settings.wechat_pay_mchid
+            and settings.wechat_pay_cert_serial
+            and self._private_key
+            and self._platform_key
+            and self._api_key
+        )
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """远程调用使用的 HTTP 客户端（默认为共享客户端）"""
+        return self._http or get_http_client()
+
+    # ============ 签名 ============
+
+    def _sign(self, message: str) -> str:
+        from Cryptodome.Hash import SHA256
+        from Cryptodome.Signature import pkcs1_15
+
+        digest = SHA256.new(message.encode())
+        return base64.b64encode(pkcs1_15.new(self._private_key).sign(digest)).decode()
+
+    def authorization(self, method: str, url_path: str, body: str) -> str:
+        """请求签名头"""
+        timestamp = str(int(time.time()))
+        nonce = secrets.token_hex(16)
+        signature = self._sign(f"{method}\n{url_path}\n{timestamp}\n{nonce}\n{body}\n")
+        return (
+            f'WECHATPAY2-SHA256-RSA2048 mchid="{settings.wechat_pay_mchid}",'
+            f'nonce_str="{nonce}",signature="{signature}",'
+            f'timestamp="{timestamp}",serial_no="{settings.wechat_pay_cert_serial}"'
+        )
+
+    def verify(self, headers: Mapping[str, str], body: bytes) -> bool:
+        """验证响应/回调签名（Wechatpay-Timestamp/Nonce/Signature 头）"""
+        timestamp = headers.get("wechatpay-timestamp")
+        nonce = headers.get("wechatpay-nonce")
+        signature = headers.get("wechatpay-signature")
+        if not (self._platform_key and timestamp and nonce and signature):
+            return False
+        from Cryptodome.Hash import SHA256
+        from Cryptodome.Signature import pkcs1_15
+
+        try:
+            if abs(time.time() - int(timestamp)) > SIGNATURE_MAX_SKEW:
+                return False
+            message = f"{timestamp}\n{nonce}\n".encode() + body + b"\n"
+            pkcs1_15.new(self._platform_key).verify(SHA256.new(message), base64.b64decode(signature))
+            return True
+        except (ValueError, TypeError):
+            return False
+
+    def decrypt(self, resource: Mapping[str, str]) -> dict[str, Any]:
+        """解密回调资源（AEAD_AES_256_GCM）"""
+        if resource.get("algorithm") != "AEAD_AES_256_GCM":
+            raise ValueError(f"不支持的加密算法: {resource.get('algorithm')}")
+        from Cryptodome.Cipher import AES
+
+        data = base64.b64decode(resource["ciphertext"])
+        cipher = AES.new(self._api_key, AES.MODE_GCM, nonce=resource["nonce"].encode())
+        cipher.update((resource.get("associated_data") or "").encode())
+        return json.loads(cipher.decrypt_and_verify(data[:-16], data[-16:]))
+
+    # ============ 远程调用 ============
+
+    async def _request(
+        self,
+        name: str,
+        method: str,
+        url_path: str,
+        payload: Optional[dict[str, Any]] = None,
+    ) -> dict[str, Any]:
+        if not self.configured:
+            raise ProviderError("微信支付未配置")
+        body = json_dumps(payload).decode() if payload is not None else ""
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            response = await self.http.request(
+                method,
+                settings.wechat_pay_api_base + url_path,
+                content=body or None,
+                headers={
+                    "Authorization": self.authorization(method, url_path, body),
+                    "Accept": "application/json",
+                    "Content-Type": "application/json",
+                },
+                timeout=settings.wechat_pay_timeout_seconds,
+            )
+            if not self.verify(response.headers, response.content):
+                raise ProviderError(f"微信支付响应验签失败: HTTP {response.status_code}")
+            data = response.json() if response.content else {}
+            if response.status_code >= 400:
+                raise ProviderError(f"微信支付调用失败: {data.get('code')} {data.get('message')}")
+            return data
+        except httpx.TimeoutException as e:
+            outcome = "timeout"
+            raise ProviderError(f"微信支付调用超时: {name}") from e
+        except httpx.HTTPError as e:
+            outcome = "error"
+            raise ProviderError(f"微信支付网络错误: {e}") from e
+        except ProviderError:
+            outcome = "error"
+            raise
+        except ValueError as e:
+            outcome = "error"
+            raise ProviderError(f"微信支付响应格式错误: {e}") from e
+        finally:
+            metrics.observe(
+                "wechat_call_seconds",
+                time.perf_counter() - started,
+                method=name,
+                outcome=outcome,
+            )
+
+    @staticmethod
+    def _cents(amount: Decimal) -> int:
+        return int((amount * 100).to_integral_value())
+
+    async def create_payment(
+        self,
+        payment: Payment,
+        subject: str,
+        return_url: Optional[str] = None,
+    ) -> str:
+        data = await self._request("create", "POST", "/v3/pay/transactions/native", {
+            "appid": settings.wechat_pay_appid,
+            "mchid": settings.wechat_pay_mchid,
+            "description": subject[:127],
+            "out_trade_no": payment.payment_no,
+            "notify_url": f"{settings.frontend_url}/api/v1/payments/callback/wechat",
+            "amount": {"total": self._cents(payment.amount), "currency": "CNY"},
+        })
+        return data["code_url"]
+
+    async def parse_callback(
+        self,
+        body: bytes,
+        headers: Mapping[str, str],
+        form: Mapping[str, Any],
+    ) -> Optional[TradeResult]:
+        try:
+            envelope = json.loads(body)
+        except ValueError:
+            raise ValueError("回调数据不是 JSON")
+
+        if self.configured:
+            if not self.verify(headers, body):
+                return None
+            try:
+                transaction = self.decrypt(envelope["resource"])
+            except (KeyError, ValueError):
+                return None
+        elif settings.payment_mock_enabled:
+            # 未配置微信支付、开启模拟支付的开发环境：通知体即交易数据
+            transaction = envelope.get("resource") or envelope
+        else:
+            return None
+
+        if "out_trade_no" not in transaction:
+            raise ValueError("缺少 out_trade_no")
+        result = self.trade_from_payload(transaction)
+        result.notify_id = envelope.get("id")
+        return result
+
+    def trade_from_payload(self, payload: dict[str, Any]) -> TradeResult:
+        return TradeResult(
+            out_trade_no=payload["out_trade_no"],
+            state=WECHAT_TRADE_STATES.get(payload.get("trade_state"), TradeState.UNKNOWN),
+            provider=self.provider,
+            trade_no=payload.get("transaction_id"),
+            raw=payload,
+        )
+
+    async def query(self, payment_no: str) -> TradeResult:
+        data = await self._request(
+            "query",
+            "GET",
+            f"/v3/pay/transactions/out-trade-no/{payment_no}?mchid={settings.wechat_pay_mchid}",
+        )
+        return self.trade_from_payload({"out_trade_no": payment_no, **data})
+
+    async def refund(
+        self,
+        payment: Payment,
+        amount: Decimal,
+        refund_no: str,
+        reason: str,
+    ) -> dict[str, Any]:
+        return await self._request("refund", "POST", "/v3/refund/domestic/refunds", {
+            "out_trade_no": payment.payment_no,
+            "out_refund_no": refund_no,
+            "reason": reason,
+            "amount": {
+                "refund": self._cents(amount),
+                "total": self._cents(payment.amount),
+                "currency": "CNY",
+            },
+        })
+
+    def callback_response(self, accepted: bool) -> Response:
+        # 微信支付：2xx 无应答体表示成功，否则返回错误码并重试通知
+        if accepted:
+            return Response(status_code=204)
+        return JSONResponse({"code": "FAIL", "message": "验签失败"}, status_code=401)
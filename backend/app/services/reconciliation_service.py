@@ -0,0 +1,240 @@
+"""
+支付对账服务
+扫描已配置提供商的待支付记录，以受控并发向各提供商查询交易状态，并按批回写结果
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.concurrency import ConcurrentUpdateError
+from app.core.config import settings
+from app.models.payment import Payment, PaymentProvider, PaymentStatus
+from app.services.payment_service import PaymentService
+from app.services.providers import (
+    PROVIDERS,
+    PaymentProviderClient,
+    TradeResult,
+    TradeState,
+    get_provider,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def configured_providers() -> dict[PaymentProvider, PaymentProviderClient]:
+    """已配置的提供商（未配置的提供商没有可查询的第三方交易）"""
+    return {
+        provider: client
+        for provider in PROVIDERS
+        if (client := get_provider(provider)).configured
+    }
+
+
+class RateLimiter:
+    """简单速率限制：相邻两次放行间隔不小于 1 / rate 秒"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class ReconciliationSummary:
+    """对账结果"""
+    started_at: datetime
+    scanned: int = 0     # 扫描的待支付记录
+    paid: int = 0        # 查询为已支付、补记成功
+    closed: int = 0      # 交易已关闭、标记失败
+    waiting: int = 0     # 仍未支付（含交易不存在）
+    errors: int = 0      # 查询或回写失败
+    batches: int = 0
+    max_in_flight: int = 0  # 实际最大并发查询数
+    elapsed: float = 0.0
+    error_samples: list[str] = field(default_factory=list)
+    open_ids: list[int] = field(default_factory=list)  # 用户仍在支付或查询/回写失败的支付ID
+
+
+class ReconciliationService:
+    """
+    支付对账服务类
+    
+    - 按ID游标分批扫描创建超过 min_age、提供商可查询的待支付记录
+    - 每批经各自提供商的 query 并发查询（信号量限制并发数 + 速率上限，各提供商共用），
+      查询期间不持有数据库事务
+    - 查询结果转换为统一交易结果，在一个事务中经 PaymentService.apply_trade_result 回写
+      （与回调相同：保存提供商响应，已支付 -> 支付成功 + 更新订单，已关闭 -> 支付失败）；
+      每条记录在独立保存点内回写，单条冲突或失败只计入错误，不影响同批其他记录
+    """
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        providers: Optional[Mapping[PaymentProvider, PaymentProviderClient]] = None,
+        concurrency: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        min_age_seconds: Optional[int] = None,
+    ):
+        self.db = db
+        # 默认查询所有已配置的提供商（测试时可替换为本地桩）
+        self.providers = configured_providers() if providers is None else dict(providers)
+        self.concurrency = concurrency or settings.reconcile_concurrency
+        self.rate_per_second = (
+            settings.reconcile_rate_per_second if rate_per_second is None else rate_per_second
+        )
+        self.batch_size = batch_size or settings.reconcile_batch_size
+        self.min_age = timedelta(
+            seconds=settings.reconcile_min_age_seconds if min_age_seconds is None else min_age_seconds
+        )
+    
+    async def _scan(
+        self, cutoff: datetime, after_id: int
+    ) -> list[tuple[int, str, PaymentProvider]]:
+        """一批待对账的 (支付ID, 支付号, 提供商)"""
+        result = await self.db.execute(
+            select(Payment.id, Payment.payment_no, Payment.provider)
+            .where(
+                Payment.status == PaymentStatus.PENDING,
+                Payment.provider.in_(self.providers),
+                Payment.created_at < cutoff,
+                Payment.id > after_id,
+            )
+            .order_by(Payment.id)
+            .limit(self.batch_size)
+        )
+        rows = [tuple(row) for row in result.all()]
+        # 结束只读事务，网络查询期间不占用数据库连接上的事务
+        await self.db.commit()
+        return rows
+    
+    async def _query_all(
+        self,
+        rows: list[tuple[int, str, PaymentProvider]],
+        summary: ReconciliationSummary,
+    ) -> dict[int, TradeResult]:
+        """并发查询一批交易，返回 支付ID -> 交易结果（失败的不在结果中）"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate_per_second)
+        in_flight = 0
+        results: dict[int, TradeResult] = {}
+        
+        async def query(payment_id: int, payment_no: str, provider: PaymentProvider) -> None:
+            nonlocal in_flight
+            async with semaphore:
+                await limiter.acquire()
+                in_flight += 1
+                summary.max_in_flight = max(summary.max_in_flight, in_flight)
+                try:
+                    results[payment_id] = await self.providers[provider].query(payment_no)
+                except Exception as e:
+                    self._record_error(summary, payment_id, f"{payment_no}: {e}")
+                finally:
+                    in_flight -= 1
+        
+        await asyncio.gather(*(query(*row) for row in rows))
+        return results
+    
+    def _record_error(self, summary: ReconciliationSummary, payment_id: int, message: str) -> None:
+        summary.errors += 1
+        summary.open_ids.append(payment_id)
+        if len(summary.error_samples) < 10:
+            summary.error_samples.append(message)
+    
+    async def _apply(
+        self,
+        results: dict[int, TradeResult],
+        summary: ReconciliationSummary,
+    ) -> None:
+        """在一个事务中回写一批交易结果（每条记录一个保存点）"""
+        payment_service = PaymentService(self.db)
+        settled = {
+            payment_id: trade for payment_id, trade in results.items()
+            if trade.state in (TradeState.PAID, TradeState.CLOSED)
+        }
+        summary.waiting += len(results) - len(settled)
+        summary.open_ids.extend(
+            payment_id for payment_id, trade in results.items()
+            if trade.state == TradeState.WAITING
+        )
+        if not settled:
+            return
+        
+        for payment in await payment_service.get_many(settled):
+            # 查询期间可能已被支付回调处理
+            if payment.status != PaymentStatus.PENDING:
+                continue
+            
+            payment_id = payment.id
+            trade = settled[payment_id]
+            try:
+                async with self.db.begin_nested():
+                    await payment_service.apply_trade_result(trade)
+            except (ConcurrentUpdateError, ValueError) as e:
+                # 保存点已回滚，丢弃内存中可能已更新的属性
+                self.db.expire(payment)
+                self._record_error(summary, payment_id, f"{trade.out_trade_no}: {e}")
+                continue
+            
+            if payment.status == PaymentStatus.SUCCESS:
+                summary.paid += 1
+            elif payment.status == PaymentStatus.FAILED:
+                summary.closed += 1
+        
+        await self.db.commit()
+    
+    async def run(self, now: Optional[datetime] = None) -> ReconciliationSummary:
+        """
+        执行一轮对账
+        
+        Args:
+            now: 当前时间（默认 utcnow），创建时间早于 now - min_age 的待支付记录参与对账
+        
+        Returns:
+            ReconciliationSummary: 本轮统计
+        """
+        now = now or datetime.utcnow()
+        summary = ReconciliationSummary(started_at=now)
+        started = time.perf_counter()
+        
+        if not self.providers:
+            # 未配置任何提供商（模拟支付），没有需要对账的第三方交易
+            return summary
+        
+        cutoff = now - self.min_age
+        after_id = 0
+        while True:
+            rows = await self._scan(cutoff, after_id)
+            if not rows:
+                break
+            
+            results = await self._query_all(rows, summary)
+            await self._apply(results, summary)
+            
+            summary.scanned += len(rows)
+            summary.batches += 1
+            after_id = rows[-1][0]
+        
+        summary.elapsed = time.perf_counter() - started
+        logger.info(
+            "支付对账完成: 扫描 %s, 已支付 %s, 已关闭 %s, 未支付 %s, 查询失败 %s, 耗时 %.2fs",
+            summary.scanned, summary.paid, summary.closed,
+            summary.waiting, summary.errors, summary.elapsed,
+        )
+        return summary
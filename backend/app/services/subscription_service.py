@@ -4,17 +4,30 @@
 """
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Optional
+from typing import Callable, Iterable, Optional
 
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.concurrency import transition
+from app.core.database import insert_ignore
+from app.core.fields import load_options
 from app.models.subscription import Subscription, SubscriptionStatus
 from app.schemas.subscription import (
     SubscriptionCreate,
     SubscriptionUpdate,
     PLAN_CONFIG,
 )
+from app.services.outbox_service import OutboxService
+
+
+class ActiveSubscriptionExistsError(ValueError):
+    """用户已有活跃订阅"""
+    
+    def __init__(self, subscription: Subscription):
+        super().__init__("已有活跃订阅")
+        self.subscription = subscription
 
 
 class SubscriptionService:
@@ -23,22 +36,40 @@ class SubscriptionService:
     def __init__(self, db: AsyncSession):
         self.db = db
     
-    async def get_by_id(self, subscription_id: int) -> Optional[Subscription]:
-        """通过ID获取订阅"""
+    async def get_by_id(
+        self,
+        subscription_id: int,
+        fields: Optional[Iterable[str]] = None
+    ) -> Optional[Subscription]:
+        """通过ID获取订阅（fields 指定时只加载对应列）"""
         result = await self.db.execute(
-            select(Subscription).where(Subscription.id == subscription_id)
+            select(Subscription)
+            .options(*load_options(Subscription, fields))
+            .where(Subscription.id == subscription_id)
         )
         return result.scalar_one_or_none()
     
+    async def get_many(self, ids: Iterable[int]) -> list[Subscription]:
+        """批量获取订阅（单次 IN 查询）"""
+        ids = set(ids)
+        if not ids:
+            return []
+        result = await self.db.execute(
+            select(Subscription).where(Subscription.id.in_(ids))
+        )
+        return list(result.scalars().all())
+    
     async def get_by_user_id(
         self, 
         user_id: int, 
         skip: int = 0, 
-        limit: int = 100
+        limit: int = 100,
+        fields: Optional[Iterable[str]] = None
     ) -> list[Subscription]:
-        """获取用户的所有订阅"""
+        """获取用户的所有订阅（fields 指定时只加载对应列）"""
         result = await self.db.execute(
             select(Subscription)
+            .options(*load_options(Subscription, fields))
             .where(Subscription.user_id == user_id)
             .order_by(Subscription.created_at.desc())
             .offset(skip)
@@ -72,6 +103,34 @@ class SubscriptionService:
         Returns:
             Subscription: 创建的订阅对象
         
+        Raises:
+            ValueError: 计划代码无效
+            ActiveSubscriptionExistsError: 用户已有活跃订阅（携带该订阅）
+        """
+        subscription, created = await self.create_or_get_active(user_id, data)
+        if not created:
+            raise ActiveSubscriptionExistsError(subscription)
+        return subscription
+    
+    async def create_or_get_active(
+        self,
+        user_id: int,
+        data: SubscriptionCreate
+    ) -> tuple[Subscription, bool]:
+        """
+        创建活跃订阅；用户已有活跃订阅时返回已有的订阅
+        
+        依赖 ix_subscriptions_active_user 部分唯一索引：以 INSERT ... ON CONFLICT DO NOTHING
+        插入，并发请求（如重复提交）中只有一个插入成功，其余返回已存在的订阅，
+        不需要预先查询或锁表，也不会因唯一约束冲突返回 500。
+        
+        Args:
+            user_id: 用户ID
+            data: 订阅创建数据
+        
+        Returns:
+            tuple[Subscription, bool]: (订阅对象, 是否新建)
+        
         Raises:
             ValueError: 计划代码无效
         """
@@ -93,8 +152,7 @@ class SubscriptionService:
             import json
             style_prefs_str = json.dumps(data.style_preferences)
         
-        # 创建订阅
-        subscription = Subscription(
+        values = dict(
             user_id=user_id,
             plan_code=plan_code,
             plan_name=plan["name"],
@@ -110,11 +168,17 @@ class SubscriptionService:
             size_profile_id=data.size_profile_id,
         )
         
-        self.db.add(subscription)
-        await self.db.flush()
-        await self.db.refresh(subscription)
-        
-        return subscription
+        # 冲突的一方在插入和读取之间，已有订阅可能恰好被取消，此时再插入一次
+        for _ in range(2):
+            subscription = await self.db.scalar(
+                insert_ignore(self.db, Subscription).values(**values).returning(Subscription)
+            )
+            if subscription is not None:
+                return subscription, True
+            existing = await self.get_active_by_user(user_id)
+            if existing is not None:
+                return existing, False
+        raise ValueError("订阅创建冲突，请重试")
     
     async def update(
         self, 
@@ -151,6 +215,15 @@ class SubscriptionService:
         await self.db.refresh(subscription)
         return subscription
     
+    def _record_event(self, subscription: Subscription, event_type: str, **payload) -> None:
+        """在当前事务中写入订阅事件（随状态变更一起提交）"""
+        OutboxService(self.db).add("subscription", subscription.id, event_type, {
+            "user_id": subscription.user_id,
+            "plan_code": subscription.plan_code,
+            "status": subscription.status.value,
+            **payload,
+        })
+    
     async def pause(self, subscription: Subscription) -> Subscription:
         """
         暂停订阅
@@ -161,12 +234,14 @@ class SubscriptionService:
         Returns:
             Subscription: 更新后的订阅对象
         """
-        if subscription.status != SubscriptionStatus.ACTIVE:
-            raise ValueError("只有活跃订阅可以暂停")
+        def apply(subscription: Subscription) -> dict:
+            if subscription.status != SubscriptionStatus.ACTIVE:
+                raise ValueError("只有活跃订阅可以暂停")
+            return {"status": SubscriptionStatus.PAUSED}
         
-        subscription.status = SubscriptionStatus.PAUSED
+        await transition(self.db, subscription, apply)
+        self._record_event(subscription, "subscription.paused")
         await self.db.flush()
-        await self.db.refresh(subscription)
         return subscription
     
     async def resume(self, subscription: Subscription) -> Subscription:
@@ -178,16 +253,23 @@ class SubscriptionService:
         
         Returns:
             Subscription: 更新后的订阅对象
-        """
-        if subscription.status != SubscriptionStatus.PAUSED:
-            raise ValueError("只有暂停的订阅可以恢复")
-        
-        subscription.status = SubscriptionStatus.ACTIVE
-        # 更新下次配送时间
-        subscription.next_delivery_at = datetime.utcnow() + timedelta(days=7)
         
+        Raises:
+            ValueError: 订阅不是暂停状态
+            ActiveSubscriptionExistsError: 用户已有其他活跃订阅（携带该订阅）
+        """
+        def apply(subscription: Subscription) -> dict:
+            if subscription.status != SubscriptionStatus.PAUSED:
+                raise ValueError("只有暂停的订阅可以恢复")
+            return {
+                "status": SubscriptionStatus.ACTIVE,
+                # 更新下次配送时间
+                "next_delivery_at": datetime.utcnow() + timedelta(days=7),
+            }
+        
+        await self._activate(subscription, apply)
+        self._record_event(subscription, "subscription.resumed")
         await self.db.flush()
-        await self.db.refresh(subscription)
         return subscription
     
     async def cancel(self, subscription: Subscription) -> Subscription:
@@ -200,43 +282,83 @@ class SubscriptionService:
         Returns:
             Subscription: 更新后的订阅对象
         """
-        if subscription.status == SubscriptionStatus.CANCELLED:
-            raise ValueError("订阅已取消")
-        
-        subscription.status = SubscriptionStatus.CANCELLED
-        subscription.auto_renew = False
-        subscription.cancelled_at = datetime.utcnow()
-        subscription.expires_at = datetime.utcnow()
-        
+        def apply(subscription: Subscription) -> dict:
+            if subscription.status == SubscriptionStatus.CANCELLED:
+                raise ValueError("订阅已取消")
+            now = datetime.utcnow()
+            return {
+                "status": SubscriptionStatus.CANCELLED,
+                "auto_renew": False,
+                "cancelled_at": now,
+                "expires_at": now,
+            }
+        
+        await transition(self.db, subscription, apply)
+        self._record_event(subscription, "subscription.cancelled")
         await self.db.flush()
-        await self.db.refresh(subscription)
         return subscription
     
-    async def renew(self, subscription: Subscription) -> Subscription:
+    async def renew(
+        self,
+        subscription: Subscription,
+        period: Optional[timedelta] = None
+    ) -> Subscription:
         """
         续订订阅
         
         Args:
             subscription: 订阅对象
+            period: 延长时长（默认30天）
         
         Returns:
             Subscription: 更新后的订阅对象
-        """
-        if subscription.status not in [SubscriptionStatus.ACTIVE, SubscriptionStatus.EXPIRED]:
-            raise ValueError("无法续订当前状态的订阅")
-        
-        # 延长30天
-        if subscription.expires_at and subscription.expires_at > datetime.utcnow():
-            subscription.expires_at = subscription.expires_at + timedelta(days=30)
-        else:
-            subscription.expires_at = datetime.utcnow() + timedelta(days=30)
-        
-        subscription.status = SubscriptionStatus.ACTIVE
         
+        Raises:
+            ValueError: 当前状态无法续订
+            ActiveSubscriptionExistsError: 到期订阅续订时用户已有其他活跃订阅（携带该订阅）
+        """
+        period = period or timedelta(days=30)
+        
+        def apply(subscription: Subscription) -> dict:
+            if subscription.status not in [SubscriptionStatus.ACTIVE, SubscriptionStatus.EXPIRED]:
+                raise ValueError("无法续订当前状态的订阅")
+            # 未到期的从到期时间起延长，已到期的从当前时间起延长
+            now = datetime.utcnow()
+            if subscription.expires_at and subscription.expires_at > now:
+                expires_at = subscription.expires_at + period
+            else:
+                expires_at = now + period
+            return {"status": SubscriptionStatus.ACTIVE, "expires_at": expires_at}
+        
+        await self._activate(subscription, apply)
+        self._record_event(subscription, "subscription.renewed", expires_at=subscription.expires_at.isoformat())
         await self.db.flush()
-        await self.db.refresh(subscription)
         return subscription
     
+    async def _activate(
+        self,
+        subscription: Subscription,
+        apply: Callable[[Subscription], Optional[dict]]
+    ) -> None:
+        """
+        以比较并交换方式将订阅变更为活跃状态（恢复、续订到期订阅）
+        
+        ix_subscriptions_active_user 部分唯一索引保证每个用户只有一个活跃订阅：
+        用户已有其他活跃订阅时 UPDATE 违反索引，在保存点内回滚，不影响外层事务
+        
+        Raises:
+            ActiveSubscriptionExistsError: 用户已有其他活跃订阅（携带该订阅）
+        """
+        try:
+            async with self.db.begin_nested():
+                await transition(self.db, subscription, apply)
+        except IntegrityError:
+            existing = await self.get_active_by_user(subscription.user_id)
+            if existing is None:
+                # 冲突的活跃订阅恰好已被取消或暂停
+                raise ValueError("订阅状态冲突，请重试")
+            raise ActiveSubscriptionExistsError(existing)
+    
     @staticmethod
     def calculate_plan_price(plan_code: str, months: int = 1) -> Decimal:
         """
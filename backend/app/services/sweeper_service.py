@@ -0,0 +1,290 @@
+"""
+清理服务
+- 待支付清理：超过有效期仍未支付的支付记录标记为失败、订单自动取消
+- 到期清理：超过到期时间的活跃订阅标记为已过期
+"""
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator, Mapping, Optional
+
+from sqlalchemy import exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.order import Order, OrderStatus
+from app.models.payment import Payment, PaymentProvider, PaymentStatus
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.services.outbox_service import OutboxService
+from app.services.providers import PROVIDERS, PaymentProviderClient, get_provider
+from app.services.reconciliation_service import ReconciliationService, configured_providers
+
+
+@dataclass
+class SweepResult:
+    """清理结果"""
+    cutoff: datetime
+    payments_checked: int = 0    # 最终查询的支付记录数
+    payments_rescued: int = 0    # 查询发现已支付、补记成功的支付
+    payments_kept: list[int] = field(default_factory=list)  # 仍在等待支付/查询失败，本轮保留
+    payments_failed: int = 0     # 标记为失败的支付
+    orders_cancelled: int = 0    # 自动取消的订单
+    chunks: int = 0
+    elapsed: float = 0.0
+
+
+class PendingSweepService:
+    """
+    待支付清理服务类
+    
+    1. 对超时的待支付记录经各自提供商做最后一次交易查询：已支付的补记成功，仍在支付中的本轮保留
+    2. 其余超时待支付记录按批标记为失败（每批一条 UPDATE）；
+       只处理做过最终查询的提供商，以及开启模拟支付时未配置的提供商（模拟支付没有第三方交易），
+       无法确认交易状态的记录不会被标记失败
+    3. 超时且没有待支付/成功支付记录的待支付订单按批取消（每批一条 UPDATE）
+    
+    每批提交一次
+    """
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        ttl_minutes: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        providers: Optional[Mapping[PaymentProvider, PaymentProviderClient]] = None,
+    ):
+        self.db = db
+        self.ttl = timedelta(minutes=ttl_minutes or settings.pending_ttl_minutes)
+        self.chunk_size = chunk_size or settings.sweep_chunk_size
+        # 做最终查询的提供商（默认为所有已配置的提供商，测试时可替换为本地桩）
+        self.providers = configured_providers() if providers is None else dict(providers)
+    
+    def _sweepable_providers(self) -> list[PaymentProvider]:
+        """可以将超时待支付记录标记为失败的提供商"""
+        sweepable = list(self.providers)
+        if settings.payment_mock_enabled:
+            sweepable.extend(
+                provider for provider in PROVIDERS
+                if provider not in self.providers and not get_provider(provider).configured
+            )
+        return sweepable
+    
+    async def _final_check(self, cutoff: datetime, result: SweepResult) -> None:
+        """
+        超时的待支付记录：取消前向各自提供商确认最终交易状态
+        
+        复用对账服务（并发上限 + 速率限制，查询期间不持有事务）：已支付的补记成功，已关闭的标记失败，
+        用户仍在支付或查询/回写失败的本轮保留
+        """
+        summary = await ReconciliationService(
+            self.db, providers=self.providers, min_age_seconds=0
+        ).run(cutoff)
+        result.payments_checked += summary.scanned
+        result.payments_rescued += summary.paid
+        result.payments_failed += summary.closed
+        result.payments_kept.extend(summary.open_ids)
+    
+    async def _fail_payments(self, cutoff: datetime, result: SweepResult) -> None:
+        """按批将超时待支付记录标记为失败（未做最终查询的提供商除外）"""
+        stale = (
+            Payment.status == PaymentStatus.PENDING,
+            Payment.provider.in_(self._sweepable_providers()),
+            Payment.created_at < cutoff,
+            Payment.id.not_in(result.payments_kept),
+        )
+        while True:
+            chunk = select(Payment.id).where(*stale).order_by(Payment.id).limit(self.chunk_size)
+            updated = await self.db.execute(
+                update(Payment)
+                .where(Payment.id.in_(chunk.scalar_subquery()), *stale)
+                .values(
+                    status=PaymentStatus.FAILED,
+                    updated_at=datetime.utcnow(),
+                    version=Payment.version + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+            
+            result.payments_failed += updated.rowcount
+            result.chunks += 1
+            if updated.rowcount < self.chunk_size:
+                break
+    
+    async def _cancel_orders(self, cutoff: datetime, result: SweepResult) -> None:
+        """按批取消超时的待支付订单（仍有待支付或成功支付记录的订单除外）"""
+        open_payment = exists().where(
+            Payment.order_id == Order.id,
+            Payment.status.in_([PaymentStatus.PENDING, PaymentStatus.SUCCESS]),
+        )
+        stale = (
+            Order.status == OrderStatus.PENDING,
+            Order.created_at < cutoff,
+            ~open_payment,
+        )
+        while True:
+            chunk = select(Order.id).where(*stale).order_by(Order.id).limit(self.chunk_size)
+            rows = (await self.db.execute(
+                update(Order)
+                .where(Order.id.in_(chunk.scalar_subquery()), *stale)
+                .values(
+                    status=OrderStatus.CANCELLED,
+                    updated_at=datetime.utcnow(),
+                    version=Order.version + 1,
+                )
+                .returning(Order.id, Order.order_number, Order.user_id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await OutboxService(self.db).add_many("order", "order.cancelled", (
+                (order_id, {
+                    "order_number": order_number,
+                    "user_id": user_id,
+                    "status": OrderStatus.CANCELLED.value,
+                    "reason": "payment_timeout",
+                })
+                for order_id, order_number, user_id in rows
+            ))
+            await self.db.commit()
+            
+            result.orders_cancelled += len(rows)
+            result.chunks += 1
+            if len(rows) < self.chunk_size:
+                break
+    
+    async def sweep(self, now: Optional[datetime] = None) -> SweepResult:
+        """
+        执行清理
+        
+        Args:
+            now: 当前时间（默认 utcnow），创建时间早于 now - TTL 的待支付记录会被清理
+        
+        Returns:
+            SweepResult: 清理统计
+        """
+        cutoff = (now or datetime.utcnow()) - self.ttl
+        result = SweepResult(cutoff=cutoff)
+        started = time.perf_counter()
+        
+        await self._final_check(cutoff, result)
+        await self._fail_payments(cutoff, result)
+        await self._cancel_orders(cutoff, result)
+        
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+@dataclass
+class ExpirySweepResult:
+    """到期清理结果"""
+    now: datetime
+    expired: int = 0             # 标记为过期的订阅数
+    expired_auto_renew: int = 0  # 其中自动续费（宽限期后仍未续费）的订阅数
+    phases: dict[str, float] = field(default_factory=dict)  # 各阶段累计耗时（秒）
+    chunks: int = 0
+    elapsed: float = 0.0
+
+
+class ExpirySweepService:
+    """
+    订阅到期清理服务类
+    
+    - 未开启自动续费的订阅：到期即过期
+    - 自动续费的订阅：到期后留出宽限期给续费批处理，宽限期后仍未续费才过期
+    - 每批一条 UPDATE ... RETURNING，按返回的行在同一事务中写入 subscription.expired 发件箱事件，每批提交一次
+    
+    清理后活跃订阅的查询只需判断 status
+    """
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        chunk_size: Optional[int] = None,
+        grace_hours: Optional[int] = None,
+    ):
+        self.db = db
+        self.chunk_size = chunk_size or settings.sweep_chunk_size
+        self.grace = timedelta(
+            hours=settings.expiry_grace_hours if grace_hours is None else grace_hours
+        )
+    
+    @contextmanager
+    def _phase(self, result: ExpirySweepResult, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            result.phases[name] = result.phases.get(name, 0.0) + time.perf_counter() - started
+    
+    async def _expire(
+        self,
+        auto_renew: bool,
+        cutoff: datetime,
+        result: ExpirySweepResult,
+    ) -> int:
+        """按批将到期时间早于 cutoff 的活跃订阅标记为过期，返回处理数量"""
+        stale = (
+            Subscription.auto_renew.is_(True) if auto_renew else Subscription.auto_renew.is_not(True),
+            Subscription.status == SubscriptionStatus.ACTIVE,
+            Subscription.expires_at < cutoff,
+        )
+        total = 0
+        while True:
+            with self._phase(result, "update"):
+                chunk = (
+                    select(Subscription.id)
+                    .where(*stale)
+                    .order_by(Subscription.id)
+                    .limit(self.chunk_size)
+                )
+                rows = (await self.db.execute(
+                    update(Subscription)
+                    .where(Subscription.id.in_(chunk.scalar_subquery()), *stale)
+                    .values(
+                        status=SubscriptionStatus.EXPIRED,
+                        updated_at=result.now,
+                        version=Subscription.version + 1,
+                    )
+                    .returning(Subscription.id, Subscription.user_id, Subscription.expires_at)
+                    .execution_options(synchronize_session=False)
+                )).all()
+            
+            with self._phase(result, "events"):
+                await OutboxService(self.db).add_many("subscription", "subscription.expired", (
+                    (subscription_id, {
+                        "user_id": user_id,
+                        "status": SubscriptionStatus.EXPIRED.value,
+                        "expires_at": expires_at.isoformat(),
+                        "auto_renew": auto_renew,
+                    })
+                    for subscription_id, user_id, expires_at in rows
+                ))
+            
+            with self._phase(result, "commit"):
+                await self.db.commit()
+            
+            total += len(rows)
+            result.chunks += 1
+            if len(rows) < self.chunk_size:
+                return total
+    
+    async def sweep(self, now: Optional[datetime] = None) -> ExpirySweepResult:
+        """
+        执行到期清理
+        
+        Args:
+            now: 当前时间（默认 utcnow）
+        
+        Returns:
+            ExpirySweepResult: 处理数量和各阶段耗时
+        """
+        now = now or datetime.utcnow()
+        result = ExpirySweepResult(now=now)
+        started = time.perf_counter()
+        
+        result.expired += await self._expire(False, now, result)
+        result.expired_auto_renew = await self._expire(True, now - self.grace, result)
+        result.expired += result.expired_auto_renew
+        
+        result.elapsed = time.perf_counter() - started
+        return result
@@ -0,0 +1,31 @@
+"""
+后台任务模块
+耗时的副作用（支付确认、订单生成、通知）与定时批处理（自动续费、配送生成、支付对账、待支付/到期清理、发件箱分发）通过 Celery 移出请求路径
+"""
+from app.tasks.base import dispatch, run_async, task_session
+from app.tasks.billing import run_billing
+from app.tasks.celery_app import celery_app
+from app.tasks.deliveries import run_deliveries
+from app.tasks.notifications import send_notification, send_template_notification
+from app.tasks.orders import generate_order
+from app.tasks.outbox import dispatch_outbox
+from app.tasks.payments import confirm_payment, drain_inbox, reconcile_payments, sweep_pending
+from app.tasks.subscriptions import sweep_expired
+
+__all__ = [
+    "celery_app",
+    "dispatch",
+    "run_async",
+    "task_session",
+    "confirm_payment",
+    "run_billing",
+    "run_deliveries",
+    "drain_inbox",
+    "reconcile_payments",
+    "sweep_pending",
+    "sweep_expired",
+    "generate_order",
+    "dispatch_outbox",
+    "send_notification",
+    "send_template_notification",
+]
@@ -0,0 +1,110 @@
+"""
+任务基础设施
+异步数据库会话、在同步 worker 中运行协程、从请求中投递任务
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Coroutine, Optional, TypeVar
+
+from celery import Task
+from celery.result import AsyncResult
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.concurrency import ConcurrentUpdateError
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# 默认重试策略：数据库/网络类的临时错误和乐观并发冲突，指数退避 + 抖动
+RETRY_POLICY: dict[str, Any] = {
+    "autoretry_for": (OperationalError, DBAPIError, ConnectionError, TimeoutError, ConcurrentUpdateError),
+    "retry_backoff": True,
+    "retry_backoff_max": 600,
+    "retry_jitter": True,
+    "max_retries": 5,
+}
+
+_session_factory: Optional[async_sessionmaker] = None
+
+
+def get_session_factory() -> async_sessionmaker:
+    """
+    获取任务使用的会话工厂（懒加载）
+
+    每个任务在自己的事件循环中运行，使用 NullPool 避免连接跨事件循环复用
+    """
+    global _session_factory
+    if _session_factory is None:
+        engine = create_async_engine(
+            settings.database_url,
+            echo=settings.database_echo,
+            poolclass=NullPool,
+        )
+        _session_factory = async_sessionmaker(
+            engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+    return _session_factory
+
+
+def set_session_factory(factory: Optional[async_sessionmaker]) -> None:
+    """替换任务会话工厂（测试使用，传 None 恢复默认）"""
+    global _session_factory
+    _session_factory = factory
+
+
+@asynccontextmanager
+async def task_session() -> AsyncIterator[AsyncSession]:
+    """
+    任务数据库会话
+
+    正常结束时提交，异常时回滚
+    """
+    async with get_session_factory()() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    在同步任务中运行协程
+
+    当前线程已有运行中的事件循环时（如 eager 模式下从请求中直接调用），
+    在独立线程中运行，避免嵌套事件循环
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+async def dispatch(task: Task, *args: Any, **kwargs: Any) -> AsyncResult:
+    """
+    从异步代码（路由）中投递任务
+
+    apply_async 会进行网络调用（eager 模式下直接执行任务），放到线程池中避免阻塞事件循环
+
+    Args:
+        task: Celery 任务
+        *args, **kwargs: 任务参数
+
+    Returns:
+        AsyncResult: 任务结果句柄（eager 模式下为 EagerResult）
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, partial(task.apply_async, args=args, kwargs=kwargs)
+    )
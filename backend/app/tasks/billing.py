@@ -0,0 +1,37 @@
+"""
+续费批处理任务
+"""
+from celery.utils.log import get_task_logger
+
+from app.services.billing_service import BillingService
+from app.tasks.base import RETRY_POLICY, run_async, task_session
+from app.tasks.celery_app import celery_app
+
+logger = get_task_logger(__name__)
+
+
+async def _run_billing() -> dict:
+    async with task_session() as db:
+        result = await BillingService(db).run()
+
+    logger.info(
+        "续费批处理完成: 到期 %s, 新建订单 %s, 新建支付 %s, 跳过 %s, 耗时 %.2fs",
+        result.selected, result.orders_created, result.payments_created,
+        len(result.skipped), result.elapsed,
+    )
+    return {
+        "selected": result.selected,
+        "orders_created": result.orders_created,
+        "payments_created": result.payments_created,
+        "skipped": len(result.skipped),
+    }
+
+
+@celery_app.task(name="billing.run_billing", **RETRY_POLICY)
+def run_billing() -> dict:
+    """
+    自动续费批处理（每批提交，可安全重试）
+
+    由 celery beat 每日触发：celery -A app.tasks beat
+    """
+    return run_async(_run_billing())
@@ -0,0 +1,67 @@
+"""
+Celery 应用
+使用配置中的 broker / result backend；支持 eager 模式（测试、单机部署）
+
+启动 worker:
+    celery -A app.tasks worker --loglevel=info
+启动定时调度:
+    celery -A app.tasks beat --loglevel=info
+"""
+from celery import Celery
+from celery.schedules import crontab
+
+from app.core.config import settings
+
+celery_app = Celery(
+    "socksflow",
+    broker=settings.celery_broker_url,
+    backend=settings.celery_result_backend,
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    timezone="UTC",
+    enable_utc=True,
+    # 任务执行完成后再确认，worker 崩溃时任务会重新投递（任务需保证幂等）
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    result_expires=3600,
+    # eager 模式：任务在调用方进程内同步执行，无需 broker
+    task_always_eager=settings.celery_task_always_eager,
+    task_eager_propagates=True,
+)
+
+# 定时任务
+celery_app.conf.beat_schedule = {
+    "billing-run-daily": {
+        "task": "billing.run_billing",
+        "schedule": crontab(hour=2, minute=0),
+    },
+    "delivery-run-hourly": {
+        "task": "deliveries.run_deliveries",
+        "schedule": crontab(minute=15),
+    },
+    "drain-payment-inbox": {
+        "task": "payments.drain_inbox",
+        "schedule": 10.0,
+    },
+    "dispatch-outbox": {
+        "task": "outbox.dispatch",
+        "schedule": 5.0,
+    },
+    "reconcile-payments": {
+        "task": "payments.reconcile_payments",
+        "schedule": crontab(minute="*/5"),
+    },
+    "sweep-pending": {
+        "task": "payments.sweep_pending",
+        "schedule": crontab(minute="*/10"),
+    },
+    "sweep-expired-hourly": {
+        "task": "subscriptions.sweep_expired",
+        "schedule": crontab(minute=45),
+    },
+}
@@ -0,0 +1,33 @@
+"""
+配送生成任务
+"""
+from celery.utils.log import get_task_logger
+
+from app.services.delivery_service import DeliveryService
+from app.tasks.base import RETRY_POLICY, run_async, task_session
+from app.tasks.celery_app import celery_app
+
+logger = get_task_logger(__name__)
+
+
+async def _run_deliveries() -> dict:
+    async with task_session() as db:
+        result = await DeliveryService(db).run()
+
+    logger.info(
+        "配送生成完成: 到期 %s, 发货订单 %s, 跳过 %s, 耗时 %.2fs %s",
+        result.selected, result.orders_created, len(result.skipped),
+        result.elapsed, result.phases,
+    )
+    return {
+        "selected": result.selected,
+        "orders_created": result.orders_created,
+        "advanced": result.advanced,
+        "skipped": len(result.skipped),
+    }
+
+
+@celery_app.task(name="deliveries.run_deliveries", **RETRY_POLICY)
+def run_deliveries() -> dict:
+    """按 next_delivery_at 生成发货订单（每批提交，可安全重试）"""
+    return run_async(_run_deliveries())
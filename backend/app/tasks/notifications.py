@@ -0,0 +1,63 @@
+"""
+通知相关任务
+"""
+from celery.utils.log import get_task_logger
+
+from app.services.mailer import OutgoingEmail
+from app.services.notification_service import NotificationService
+from app.services.user_service import UserService
+from app.tasks.base import RETRY_POLICY, run_async, task_session
+from app.tasks.celery_app import celery_app
+
+logger = get_task_logger(__name__)
+
+
+async def _send_notification(user_id: int, subject: str, body: str) -> bool:
+    async with task_session() as db:
+        user = await UserService(db).get_by_id(user_id)
+        if not user:
+            logger.warning("用户不存在: %s", user_id)
+            return False
+
+        result = await NotificationService(db).send(
+            [OutgoingEmail(to=user.email, subject=subject, body=body)]
+        )
+        await db.commit()
+    return result.sent == 1
+
+
+async def _send_template_notification(template: str, notices: list) -> dict:
+    async with task_session() as db:
+        result = await NotificationService(db).notify_users(
+            template, [(user_id, context) for user_id, context in notices]
+        )
+        await db.commit()
+
+    logger.info(
+        "模板通知 %s: 发送 %s, 死信 %s, 跳过 %s, 耗时 %.2fs",
+        template, result.sent, result.dead, result.skipped, result.elapsed,
+    )
+    return {"sent": result.sent, "dead": result.dead, "skipped": result.skipped}
+
+
+@celery_app.task(name="notifications.send_notification", **RETRY_POLICY)
+def send_notification(user_id: int, subject: str, body: str) -> bool:
+    """
+    发送邮件通知（SMTP 临时错误在发送器内重试，最终失败写入死信表）
+
+    Returns:
+        是否实际发送（未配置 SMTP 或进入死信时返回 False）
+    """
+    return run_async(_send_notification(user_id, subject, body))
+
+
+@celery_app.task(name="notifications.send_template_notification", **RETRY_POLICY)
+def send_template_notification(template: str, notices: list) -> dict:
+    """
+    按模板批量发送通知
+
+    Args:
+        template: 模板名称
+        notices: [用户ID, 模板字段] 列表
+    """
+    return run_async(_send_template_notification(template, notices))
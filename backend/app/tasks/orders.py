@@ -0,0 +1,54 @@
+"""
+订单相关任务
+"""
+from typing import Optional
+
+from celery.utils.log import get_task_logger
+
+from app.services.order_service import OrderService
+from app.services.subscription_service import SubscriptionService
+from app.tasks.base import RETRY_POLICY, run_async, task_session
+from app.tasks.celery_app import celery_app
+
+logger = get_task_logger(__name__)
+
+
+async def _generate_order(
+    subscription_id: int,
+    shipping_address: dict,
+    months: int,
+) -> Optional[int]:
+    async with task_session() as db:
+        subscription = await SubscriptionService(db).get_by_id(subscription_id)
+        if not subscription:
+            logger.warning("订阅不存在: %s", subscription_id)
+            return None
+
+        order_service = OrderService(db)
+        # 已有待支付订单时不重复生成（任务重试/重复投递安全）
+        pending = await order_service.get_pending_by_subscription(subscription_id)
+        if pending:
+            return pending.id
+
+        order = await order_service.create_from_subscription(
+            user_id=subscription.user_id,
+            subscription=subscription,
+            shipping_address=shipping_address,
+            months=months,
+        )
+        return order.id
+
+
+@celery_app.task(name="orders.generate_order", **RETRY_POLICY)
+def generate_order(
+    subscription_id: int,
+    shipping_address: dict,
+    months: int = 1,
+) -> Optional[int]:
+    """
+    为订阅生成订单
+
+    Returns:
+        订单ID，订阅不存在时返回 None
+    """
+    return run_async(_generate_order(subscription_id, shipping_address, months))
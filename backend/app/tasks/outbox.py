@@ -0,0 +1,35 @@
+"""
+发件箱分发任务
+"""
+from celery.utils.log import get_task_logger
+
+from app.services.outbox_service import OutboxService
+from app.tasks.base import RETRY_POLICY, run_async, task_session
+from app.tasks.celery_app import celery_app
+
+logger = get_task_logger(__name__)
+
+
+async def _dispatch_outbox(partition: int, partitions: int) -> dict:
+    async with task_session() as db:
+        result = await OutboxService(db, partition=partition, partitions=partitions).dispatch()
+
+    if result.dispatched or result.failed or result.dead:
+        logger.info(
+            "发件箱分发: 成功 %s, 失败 %s, 放弃 %s, 跳过 %s, 积压 %s（延迟 %.1fs）, 耗时 %.2fs",
+            result.dispatched, result.failed, result.dead, result.blocked,
+            result.backlog, result.lag_seconds, result.elapsed,
+        )
+    return {
+        "dispatched": result.dispatched,
+        "failed": result.failed,
+        "dead": result.dead,
+        "backlog": result.backlog,
+        "lag_seconds": result.lag_seconds,
+    }
+
+
+@celery_app.task(name="outbox.dispatch", **RETRY_POLICY)
+def dispatch_outbox(partition: int = 0, partitions: int = 1) -> dict:
+    """投递发件箱事件（投递成功后才标记，重试只会重复投递）"""
+    return run_async(_dispatch_outbox(partition, partitions))
@@ -0,0 +1,110 @@
+"""
+支付相关任务
+"""
+from typing import Optional
+
+from celery.utils.log import get_task_logger
+
+from app.services.inbox_service import PaymentInboxService
+from app.services.payment_service import PaymentService
+from app.services.reconciliation_service import ReconciliationService
+from app.services.sweeper_service import PendingSweepService
+from app.tasks.base import RETRY_POLICY, run_async, task_session
+from app.tasks.celery_app import celery_app
+
+logger = get_task_logger(__name__)
+
+
+async def _confirm_payment(payment_no: str, transaction_id: Optional[str]) -> Optional[str]:
+    async with task_session() as db:
+        payment_service = PaymentService(db)
+        payment = await payment_service.get_by_payment_no(payment_no)
+        if not payment:
+            logger.warning("支付记录不存在: %s", payment_no)
+            return None
+
+        try:
+            await payment_service.confirm_success(payment, transaction_id)
+        except ValueError as e:
+            # 已失败且提供商未确认已支付：保持原状态，不重试
+            logger.warning("拒绝确认支付 %s: %s", payment_no, e)
+
+        return payment.status.value
+
+
+@celery_app.task(name="payments.confirm_payment", **RETRY_POLICY)
+def confirm_payment(payment_no: str, transaction_id: Optional[str] = None) -> Optional[str]:
+    """
+    确认支付成功并更新订单状态（幂等，重复执行不会重复更新）
+
+    已失败的支付只有提供商查询确认已支付时才改为成功；并发更新冲突时按重试策略重试
+
+    Returns:
+        支付状态，支付记录不存在时返回 None
+    """
+    return run_async(_confirm_payment(payment_no, transaction_id))
+
+
+async def _sweep_pending() -> dict:
+    async with task_session() as db:
+        result = await PendingSweepService(db).sweep()
+
+    logger.info(
+        "待支付清理完成: 补记成功 %s, 保留 %s, 支付失败 %s, 订单取消 %s, 耗时 %.2fs",
+        result.payments_rescued, len(result.payments_kept),
+        result.payments_failed, result.orders_cancelled, result.elapsed,
+    )
+    return {
+        "payments_rescued": result.payments_rescued,
+        "payments_kept": len(result.payments_kept),
+        "payments_failed": result.payments_failed,
+        "orders_cancelled": result.orders_cancelled,
+    }
+
+
+@celery_app.task(name="payments.sweep_pending", **RETRY_POLICY)
+def sweep_pending() -> dict:
+    """取消超时未支付的订单和支付记录（每批提交，可安全重试）"""
+    return run_async(_sweep_pending())
+
+
+async def _reconcile_payments() -> dict:
+    async with task_session() as db:
+        summary = await ReconciliationService(db).run()
+
+    return {
+        "scanned": summary.scanned,
+        "paid": summary.paid,
+        "closed": summary.closed,
+        "waiting": summary.waiting,
+        "errors": summary.errors,
+        "elapsed": summary.elapsed,
+    }
+
+
+@celery_app.task(name="payments.reconcile_payments", **RETRY_POLICY)
+def reconcile_payments() -> dict:
+    """待支付记录对账（所有已配置的提供商，并发与速率受配置限制）"""
+    return run_async(_reconcile_payments())
+
+
+async def _drain_inbox() -> dict:
+    async with task_session() as db:
+        result = await PaymentInboxService(db).drain()
+
+    if result.processed or result.retried or result.failed:
+        logger.info(
+            "支付通知处理: 成功 %s, 待重试 %s, 失败 %s, 耗时 %.2fs",
+            result.processed, result.retried, result.failed, result.elapsed,
+        )
+    return {
+        "processed": result.processed,
+        "retried": result.retried,
+        "failed": result.failed,
+    }
+
+
+@celery_app.task(name="payments.drain_inbox", **RETRY_POLICY)
+def drain_inbox() -> dict:
+    """处理支付通知收件箱（每条通知独立事务，可安全重试）"""
+    return run_async(_drain_inbox())
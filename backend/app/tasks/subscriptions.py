@@ -0,0 +1,30 @@
+"""
+订阅相关任务
+"""
+from celery.utils.log import get_task_logger
+
+from app.services.sweeper_service import ExpirySweepService
+from app.tasks.base import RETRY_POLICY, run_async, task_session
+from app.tasks.celery_app import celery_app
+
+logger = get_task_logger(__name__)
+
+
+async def _sweep_expired() -> dict:
+    async with task_session() as db:
+        result = await ExpirySweepService(db).sweep()
+
+    logger.info(
+        "到期清理完成: 过期 %s（自动续费 %s）, 耗时 %.2fs %s",
+        result.expired, result.expired_auto_renew, result.elapsed, result.phases,
+    )
+    return {
+        "expired": result.expired,
+        "expired_auto_renew": result.expired_auto_renew,
+    }
+
+
+@celery_app.task(name="subscriptions.sweep_expired", **RETRY_POLICY)
+def sweep_expired() -> dict:
+    """将到期的活跃订阅标记为过期（每批提交，可安全重试）"""
+    return run_async(_sweep_expired())
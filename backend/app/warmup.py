@@ -0,0 +1,166 @@
+"""
+启动预热
+worker 报告就绪前执行：建立连接池连接、执行热点查询（编译并缓存 SQL）、编译 ORM 序列化器、
+构建静态目录、创建出站 HTTP 客户端，避免部署后的首批请求承担这些一次性开销
+（支付宝密钥在 init_alipay_gateway 中解析）
+"""
+import logging
+import time
+from contextlib import AsyncExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterator, Optional
+
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from app.api.v1.subscriptions import get_plan_catalog
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.database import engine as app_engine
+from app.core.http import get_http_client
+from app.core.security import get_password_hash
+from app.core.serializers import prepare_serializer
+from app.schemas.order import OrderDetailResponse, OrderResponse
+from app.schemas.payment import PaymentResponse
+from app.schemas.subscription import SubscriptionDetailResponse, SubscriptionResponse
+from app.services.address_service import AddressService
+from app.services.notification_service import NOTIFICATION_TEMPLATES, get_template
+from app.services.order_service import OrderService
+from app.services.payment_service import PaymentService
+from app.services.subscription_service import SubscriptionService
+from app.services.user_service import UserService
+
+logger = logging.getLogger(__name__)
+
+# 路由直出（orm_response / batch_orm_response）使用的响应 Schema
+ORM_SCHEMAS = (
+    OrderResponse,
+    OrderDetailResponse,
+    PaymentResponse,
+    SubscriptionResponse,
+    SubscriptionDetailResponse,
+)
+
+# 请求路径上的热点查询（参数不匹配任何行，只为编译并缓存语句）
+HOT_QUERIES: tuple[Callable[[AsyncSession], Awaitable[object]], ...] = (
+    lambda db: UserService(db).get_by_id(0),
+    lambda db: UserService(db).get_by_email(""),
+    lambda db: OrderService(db).get_by_id(0),
+    lambda db: OrderService(db).get_by_order_number(""),
+    lambda db: OrderService(db).get_by_user_id(0),
+    lambda db: OrderService(db).get_many([0]),
+    lambda db: SubscriptionService(db).get_by_id(0),
+    lambda db: SubscriptionService(db).get_by_user_id(0),
+    lambda db: SubscriptionService(db).get_active_by_user(0),
+    lambda db: SubscriptionService(db).get_many([0]),
+    lambda db: PaymentService(db).get_by_id(0),
+    lambda db: PaymentService(db).get_by_payment_no(""),
+    lambda db: PaymentService(db).get_by_order_id(0),
+    lambda db: PaymentService(db).get_many([0]),
+    lambda db: AddressService(db).get_by_user_id(0),
+    lambda db: AddressService(db).get_default_address(0),
+)
+
+
+@dataclass
+class WarmupResult:
+    """预热结果"""
+    connections: int = 0        # 预先建立的连接数
+    statements: int = 0         # 执行的热点查询数
+    serializers: int = 0        # 编译的序列化器数
+    errors: list[str] = field(default_factory=list)
+    phases: dict[str, float] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+
+@contextmanager
+def _phase(result: WarmupResult, name: str) -> Iterator[None]:
+    """记录阶段耗时；预热失败只记录，不阻止启动（首个请求再承担对应开销）"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        logger.warning("预热阶段 %s 失败: %s", name, e)
+        result.errors.append(f"{name}: {e}")
+    finally:
+        result.phases[name] = time.perf_counter() - started
+
+
+async def open_connections(engine: AsyncEngine, count: int) -> int:
+    """同时持有 count 个连接后归还，连接留在池中（不超过连接池大小；NullPool 不保留连接，跳过）"""
+    if isinstance(engine.pool, NullPool):
+        return 0
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        count = min(count, size())
+    async with AsyncExitStack() as stack:
+        for _ in range(count):
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.execute(text("SELECT 1"))
+    return count
+
+
+async def compile_statements(session_factory: Callable[[], AsyncSession]) -> int:
+    """执行热点查询，填充引擎的 SQL 编译缓存"""
+    async with session_factory() as db:
+        for query in HOT_QUERIES:
+            await query(db)
+        await db.rollback()
+    return len(HOT_QUERIES)
+
+
+def build_serializers() -> int:
+    """编译 ORM 直出序列化器（关闭可信序列化时构建 Pydantic TypeAdapter）"""
+    for schema in ORM_SCHEMAS:
+        prepare_serializer(schema)
+    return len(ORM_SCHEMAS)
+
+
+def load_catalogs(app: Optional[FastAPI]) -> None:
+    """构建静态目录：计划目录（预压缩）、通知模板、OpenAPI 文档；加载密码哈希后端"""
+    get_plan_catalog()
+    for name in NOTIFICATION_TEMPLATES:
+        get_template(name)
+    if app is not None:
+        app.openapi()
+    get_password_hash("warmup")
+
+
+async def warm_up(
+    app: Optional[FastAPI] = None,
+    engine: Optional[AsyncEngine] = None,
+    session_factory: Optional[Callable[[], AsyncSession]] = None,
+    connections: Optional[int] = None,
+) -> WarmupResult:
+    """
+    执行启动预热
+
+    Args:
+        app: 应用实例（用于预先生成 OpenAPI 文档）
+        engine: 数据库引擎，默认应用引擎
+        session_factory: 会话工厂，默认应用会话工厂
+        connections: 预先建立的连接数，默认 settings.warmup_pool_connections
+    """
+    engine = engine or app_engine
+    session_factory = session_factory or AsyncSessionLocal
+    started = time.perf_counter()
+    result = WarmupResult()
+
+    with _phase(result, "pool"):
+        result.connections = await open_connections(
+            engine, settings.warmup_pool_connections if connections is None else connections
+        )
+    with _phase(result, "statements"):
+        result.statements = await compile_statements(session_factory)
+    with _phase(result, "serializers"):
+        result.serializers = build_serializers()
+    with _phase(result, "catalogs"):
+        load_catalogs(app)
+    with _phase(result, "http"):
+        # 共享出站客户端（SSL 上下文、连接池），支付请求不再承担创建开销
+        get_http_client()
+
+    result.elapsed = time.perf_counter() - started
+    return result
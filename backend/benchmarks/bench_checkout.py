@@ -0,0 +1,122 @@
+"""
+下单到支付成功的端到端吞吐基准测试
+
+对运行中的后端（支付宝指向 benchmarks.mock_alipay）并发执行：
+创建订单 -> 创建支付宝支付 -> 打开收银台（模拟网关完成支付并投递通知）
+-> 轮询支付状态直到 success。统计吞吐量和每单耗时分位数。
+
+需同时运行 Celery worker/beat（payments.drain_inbox 处理回调收件箱）。
+
+用法:
+    python -m benchmarks.mock_alipay --latency-ms 50 --duplicate-rate 0.1 &
+    python -m benchmarks.bench_checkout [--base-url http://localhost:8000]
+        [--gateway-url http://127.0.0.1:9100] [--orders 200] [--concurrency 20] [--timeout 30]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+ORDER = {
+    "items": [{"name": "标准版袜子", "quantity": 1, "unit_price": 49.9, "subtotal": 49.9}],
+    "shipping_address": {
+        "name": "压测用户", "phone": "13800138000", "province": "北京市",
+        "city": "北京市", "district": "朝阳区", "address": "测试路123号",
+    },
+    "total_amount": "49.90",
+}
+
+
+async def _login(client: httpx.AsyncClient) -> str:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    user = {"email": email, "password": "password123", "name": "压测用户"}
+    (await client.post("/api/v1/auth/register", json=user)).raise_for_status()
+    response = await client.post("/api/v1/auth/login", json={"email": email, "password": "password123"})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def _checkout(client: httpx.AsyncClient, timeout: float, poll_interval: float) -> float:
+    """完成一单，返回耗时（秒）"""
+    started = time.perf_counter()
+    response = await client.post("/api/v1/orders", json=ORDER)
+    response.raise_for_status()
+    response = await client.post(f"/api/v1/payments/{response.json()['id']}/alipay")
+    response.raise_for_status()
+    payment = response.json()
+    (await client.get(payment["pay_url"])).raise_for_status()
+
+    while time.perf_counter() - started < timeout:
+        response = await client.get(f"/api/v1/payments/{payment['payment_id']}/status")
+        response.raise_for_status()
+        if response.json()["status"] == "success":
+            return time.perf_counter() - started
+        await asyncio.sleep(poll_interval)
+    raise TimeoutError(f"支付 {payment['payment_no']} 未在 {timeout}s 内完成")
+
+
+async def run(
+    base_url: str,
+    gateway_url: str,
+    orders: int,
+    concurrency: int,
+    timeout: float,
+    poll_interval: float,
+) -> None:
+    limits = httpx.Limits(max_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        client.headers["Authorization"] = f"Bearer {await _login(client)}"
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+        errors: list[str] = []
+
+        async def one() -> None:
+            async with semaphore:
+                try:
+                    latencies.append(await _checkout(client, timeout, poll_interval))
+                except (httpx.HTTPError, TimeoutError) as e:
+                    errors.append(str(e))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(orders)))
+        elapsed = time.perf_counter() - started
+
+        print(f"下单到支付成功（{orders} 单，并发 {concurrency}）")
+        print(f"  成功:   {len(latencies)}")
+        print(f"  失败:   {len(errors)}")
+        print(f"  耗时:   {elapsed:.2f}s")
+        print(f"  吞吐:   {len(latencies) / elapsed:.1f} 单/秒")
+        if latencies:
+            cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            print(f"  p50:    {cuts[49] * 1000:.0f}ms")
+            print(f"  p95:    {cuts[94] * 1000:.0f}ms")
+            print(f"  p99:    {cuts[98] * 1000:.0f}ms")
+        for error in errors[:5]:
+            print(f"  ! {error}")
+
+        response = await client.get(f"{gateway_url}/__stats")
+        if response.is_success:
+            print("模拟网关计数")
+            for key, value in sorted(response.json().items()):
+                print(f"  {key:<36}{value}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="下单到支付成功的端到端吞吐")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--gateway-url", default="http://127.0.0.1:9100")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(run(
+        args.base_url, args.gateway_url, args.orders, args.concurrency, args.timeout, args.poll_interval,
+    ))
+
+
+if __name__ == "__main__":
+    main()
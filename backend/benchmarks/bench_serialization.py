@@ -0,0 +1,147 @@
+"""
+响应序列化基准测试
+
+- FastAPI 默认 JSONResponse（标准库 json）与 FastJSONResponse（orjson）的编码耗时
+- response_model 校验路径与 ORM 直出序列化的耗时
+
+用法:
+    python -m benchmarks.bench_serialization [--number 2000]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+
+from app.core.responses import FastJSONResponse, json_dumps
+from app.core.serializers import get_serializer
+from app.schemas.order import OrderDetailResponse, OrderListResponse, OrderResponse
+from app.schemas.payment import PaymentResponse
+from app.schemas.subscription import SubscriptionDetailResponse, SubscriptionResponse
+
+
+def _payment(i: int, order_id: int) -> SimpleNamespace:
+    now = datetime(2026, 1, 1, 12, 0, 0) + timedelta(minutes=i)
+    return SimpleNamespace(
+        id=i, payment_no=f"PAY20260101{i:08d}", user_id=1, order_id=order_id,
+        amount=Decimal("49.90"), provider="alipay", status="success",
+        transaction_id=f"2026010122001{i:010d}",
+        provider_response={"trade_status": "TRADE_SUCCESS", "total_amount": "49.90"},
+        paid_at=now, created_at=now, updated_at=now,
+    )
+
+
+def _order(i: int) -> SimpleNamespace:
+    now = datetime(2026, 1, 1, 12, 0, 0) + timedelta(hours=i)
+    return SimpleNamespace(
+        id=i, order_number=f"SO2026010{i:05d}", user_id=1, subscription_id=1,
+        status="paid", total_amount=Decimal("49.90"),
+        items=[{
+            "name": "标准版 - 月度订阅", "quantity": 1, "unit_price": 49.9,
+            "subtotal": 49.9, "description": "包含每月4双精选袜子",
+        }],
+        shipping_address={
+            "name": "测试用户", "phone": "13800138000", "province": "北京市",
+            "city": "北京市", "district": "朝阳区", "address": "测试路123号",
+            "zip_code": "100000",
+        },
+        tracking_number=None, created_at=now, updated_at=now, paid_at=now,
+        shipped_at=None, delivered_at=None,
+        payments=[_payment(i * 2, i), _payment(i * 2 + 1, i)],
+    )
+
+
+def _subscription(orders: list) -> SimpleNamespace:
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    return SimpleNamespace(
+        id=1, user_id=1, plan_code="standard", plan_name="标准版", status="active",
+        price_monthly=Decimal("49.90"), payment_method="alipay", auto_renew=True,
+        started_at=now, expires_at=now + timedelta(days=30),
+        next_delivery_at=now + timedelta(days=7), delivery_frequency=1,
+        style_preferences='{"size": "M"}', size_profile_id=None, cancelled_at=None,
+        created_at=now, updated_at=now, orders=orders,
+    )
+
+
+def build_orm_cases() -> dict:
+    """构建各响应 Schema 对应的 ORM 风格对象"""
+    orders = [_order(i) for i in range(1, 51)]
+    return {
+        PaymentResponse: orders[0].payments[0],
+        OrderResponse: orders[0],
+        OrderDetailResponse: orders[0],
+        SubscriptionResponse: _subscription([]),
+        SubscriptionDetailResponse: _subscription(orders),
+    }
+
+
+def build_cases() -> dict:
+    """构建各响应 Schema 的序列化输入（已完成 Schema 校验）"""
+    orders = [_order(i) for i in range(1, 51)]
+    order = orders[0]
+    return {
+        "PaymentResponse": PaymentResponse.model_validate(order.payments[0]),
+        "OrderResponse": OrderResponse.model_validate(order),
+        "OrderDetailResponse": OrderDetailResponse.model_validate(order),
+        "SubscriptionResponse": SubscriptionResponse.model_validate(_subscription([])),
+        "SubscriptionDetailResponse(50 orders)": SubscriptionDetailResponse.model_validate(
+            _subscription(orders)
+        ),
+        "OrderListResponse(50 items)": OrderListResponse(
+            total=50, items=[OrderResponse.model_validate(o) for o in orders]
+        ),
+    }
+
+
+def run(number: int) -> None:
+    print(f"{'schema':<40}{'json (us)':>12}{'orjson (us)':>14}{'speedup':>10}")
+    for name, model in build_cases().items():
+        # FastAPI 的 response_model 路径：先转成 JSON 兼容对象再交给响应类编码
+        content = model.model_dump(mode="json")
+        # FastJSONResponse 可直接编码 Decimal/datetime，无需 JSON 模式转换
+        raw = model.model_dump()
+
+        baseline = timeit.timeit(lambda: JSONResponse(content), number=number)
+        fast = timeit.timeit(lambda: FastJSONResponse(raw), number=number)
+        # 两种编码输出必须等价
+        assert json.loads(JSONResponse(content).body) == json.loads(FastJSONResponse(raw).body), name
+
+        print(
+            f"{name:<40}{baseline / number * 1e6:>12.1f}"
+            f"{fast / number * 1e6:>14.1f}{baseline / fast:>9.1f}x"
+        )
+
+
+def run_trusted(number: int) -> None:
+    """对比 response_model 路径（校验 + 序列化）与 ORM 直出序列化"""
+    print(f"\n{'schema':<40}{'validate (us)':>14}{'trusted (us)':>14}{'speedup':>10}")
+    for schema, obj in build_orm_cases().items():
+        serializer = get_serializer(schema)
+
+        def validated():
+            return FastJSONResponse(schema.model_validate(obj).model_dump(mode="json"))
+
+        def trusted():
+            return json_dumps(serializer.dump(obj))
+
+        baseline = timeit.timeit(validated, number=number)
+        fast = timeit.timeit(trusted, number=number)
+        print(
+            f"{schema.__name__:<40}{baseline / number * 1e6:>14.1f}"
+            f"{fast / number * 1e6:>14.1f}{baseline / fast:>9.1f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="响应序列化基准测试")
+    parser.add_argument("--number", type=int, default=2000, help="每个用例的执行次数")
+    args = parser.parse_args()
+    run(args.number)
+    run_trusted(args.number)
+
+
+if __name__ == "__main__":
+    main()
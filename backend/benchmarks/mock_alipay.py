@@ -0,0 +1,416 @@
+"""
+本地模拟支付宝网关（压测/长稳测试用）
+
+实现电脑网站支付（alipay.trade.page.pay）、交易查询（alipay.trade.query）、
+退款（alipay.trade.refund）和异步通知，请求验签、响应和通知签名均为 RSA2，
+后端按真实网关的方式调用，无需改动支付代码。
+
+- 可配置响应延迟（固定 + 随机抖动）
+- 可配置错误率（返回签名的 20000 系统错误）
+- 可注入重复通知（同一 notify_id 重复投递），通知未应答 success 时按退避重试
+- GET /__stats 查看计数，POST /__pay/{out_trade_no} 手动完成支付（--no-auto-pay 时）
+
+用法:
+    python -m benchmarks.mock_alipay [--port 9100] [--latency-ms 50] [--jitter-ms 20]
+        [--error-rate 0.01] [--duplicate-rate 0.1] [--keys-dir .mock_alipay]
+
+首次启动在 keys-dir 生成应用密钥和网关密钥，并写出 mock_alipay.env，
+将其中的 ALIPAY_* 配置合并到后端 .env 后启动后端即可。
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import secrets
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Mapping, Optional
+
+import httpx
+from Cryptodome.Hash import SHA256
+from Cryptodome.PublicKey import RSA
+from Cryptodome.Signature import PKCS1_v1_5
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+
+MOCK_APP_ID = "2021000000000000"
+
+
+@dataclass
+class MockAlipayConfig:
+    """模拟网关行为"""
+    latency_ms: float = 0.0          # 同步接口和通知的固定延迟
+    jitter_ms: float = 0.0           # 随机抖动上限
+    error_rate: float = 0.0          # 查询/退款返回系统错误的概率
+    duplicate_rate: float = 0.0      # 通知重复投递的概率
+    duplicates: int = 1              # 每次重复投递的额外次数
+    auto_pay: bool = True            # 打开收银台即视为支付成功
+    notify_retries: int = 3          # 通知未应答 success 时的重试次数
+    notify_retry_ms: float = 200.0   # 通知重试的初始退避（毫秒，逐次翻倍）
+    verify_requests: bool = True     # 是否校验请求签名
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockTrade:
+    app_id: str
+    out_trade_no: str
+    trade_no: str
+    total_amount: str
+    subject: str
+    notify_url: Optional[str]
+    status: str = "WAIT_BUYER_PAY"
+    gmt_create: datetime = field(default_factory=datetime.now)
+    gmt_payment: Optional[datetime] = None
+    refunds: dict[str, str] = field(default_factory=dict)  # out_request_no -> 金额
+
+
+def _sign(key: RSA.RsaKey, message: str) -> str:
+    signature = PKCS1_v1_5.new(key).sign(SHA256.new(message.encode()))
+    return base64.b64encode(signature).decode()
+
+
+def _verify(key: RSA.RsaKey, message: str, signature: str) -> bool:
+    try:
+        return PKCS1_v1_5.new(key).verify(SHA256.new(message.encode()), base64.b64decode(signature))
+    except (ValueError, TypeError):
+        return False
+
+
+def _content(params: Mapping[str, str], exclude: tuple[str, ...]) -> str:
+    """待签名字符串：参数按键排序，值不做 URL 编码"""
+    return "&".join(f"{k}={v}" for k, v in sorted(params.items()) if k not in exclude)
+
+
+class MockAlipay:
+    """
+    模拟网关状态
+
+    Args:
+        alipay_key: 网关私钥（签名响应和通知）
+        app_public_key: 应用公钥（校验请求签名）
+        config: 行为配置
+        notify_client: 投递通知使用的 HTTP 客户端（默认新建）
+    """
+
+    def __init__(
+        self,
+        alipay_key: RSA.RsaKey,
+        app_public_key: Optional[RSA.RsaKey] = None,
+        config: Optional[MockAlipayConfig] = None,
+        notify_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.alipay_key = alipay_key
+        self.app_public_key = app_public_key
+        self.config = config or MockAlipayConfig()
+        self.notify_client = notify_client
+        self.trades: dict[str, MockTrade] = {}
+        self.stats: Counter = Counter()
+        self._random = random.Random(self.config.seed)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _delay(self) -> None:
+        delay = self.config.latency_ms + self._random.uniform(0, self.config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _signed_response(self, api: str, content: dict[str, Any]) -> Response:
+        """同步响应：{"<api>_response": {...}, "sign": "..."}，对响应体原文签名"""
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+        sign = _sign(self.alipay_key, body)
+        response_type = api.replace(".", "_") + "_response"
+        raw = f'{{"{response_type}":{body},"sign":"{sign}"}}'
+        return Response(raw, media_type="application/json; charset=utf-8")
+
+    def _check_signature(self, params: Mapping[str, str]) -> bool:
+        if not (self.config.verify_requests and self.app_public_key):
+            return True
+        return _verify(self.app_public_key, _content(params, ("sign",)), params.get("sign", ""))
+
+    # ============ 网关接口 ============
+
+    async def handle(self, params: dict[str, str]) -> Response:
+        """gateway.do 入口，按 method 分派"""
+        api = params.get("method", "")
+        self.stats[f"requests.{api}"] += 1
+
+        if not self._check_signature(params):
+            self.stats["errors.signature"] += 1
+            return self._signed_response(api, {
+                "code": "40002", "msg": "Invalid Arguments",
+                "sub_code": "isv.invalid-signature", "sub_msg": "验签出错",
+            })
+        try:
+            biz = json.loads(params.get("biz_content") or "{}")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="biz_content 不是 JSON")
+
+        if api == "alipay.trade.page.pay":
+            return self.page_pay(params, biz)
+
+        await self._delay()
+        if self._random.random() < self.config.error_rate:
+            self.stats["errors.injected"] += 1
+            return self._signed_response(api, {
+                "code": "20000", "msg": "Service Currently Unavailable",
+                "sub_code": "aop.ACQ.SYSTEM_ERROR", "sub_msg": "系统繁忙",
+            })
+        if api == "alipay.trade.query":
+            return self.query(api, biz)
+        if api == "alipay.trade.refund":
+            return self.refund(api, biz)
+        return self._signed_response(api, {
+            "code": "40004", "msg": "Business Failed",
+            "sub_code": "isv.invalid-method", "sub_msg": f"模拟网关不支持 {api}",
+        })
+
+    def page_pay(self, params: Mapping[str, str], biz: dict[str, Any]) -> Response:
+        """收银台：登记交易，auto_pay 时立即完成支付并投递通知"""
+        out_trade_no = biz["out_trade_no"]
+        trade = self.trades.get(out_trade_no)
+        if trade is None:
+            trade = self.trades[out_trade_no] = MockTrade(
+                app_id=params.get("app_id", ""),
+                out_trade_no=out_trade_no,
+                trade_no=datetime.now().strftime("%Y%m%d") + secrets.token_hex(8),
+                total_amount=str(biz["total_amount"]),
+                subject=biz.get("subject", ""),
+                notify_url=params.get("notify_url"),
+            )
+        if self.config.auto_pay:
+            self.pay(out_trade_no)
+        return HTMLResponse(
+            f"<html><body><h1>模拟收银台</h1><p>{trade.subject}</p>"
+            f"<p>订单 {trade.out_trade_no}：￥{trade.total_amount}（{trade.status}）</p></body></html>"
+        )
+
+    def pay(self, out_trade_no: str) -> MockTrade:
+        """完成支付（已支付的交易不重复通知）"""
+        trade = self.trades.get(out_trade_no)
+        if trade is None:
+            raise HTTPException(status_code=404, detail="交易不存在")
+        if trade.status == "WAIT_BUYER_PAY":
+            trade.status = "TRADE_SUCCESS"
+            trade.gmt_payment = datetime.now()
+            self.stats["paid"] += 1
+            if trade.notify_url:
+                task = asyncio.create_task(self._notify(trade))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        return trade
+
+    def query(self, api: str, biz: dict[str, Any]) -> Response:
+        trade = self.trades.get(biz.get("out_trade_no", ""))
+        if trade is None:
+            return self._signed_response(api, {
+                "code": "40004", "msg": "Business Failed",
+                "sub_code": "ACQ.TRADE_NOT_EXIST", "sub_msg": "交易不存在",
+            })
+        return self._signed_response(api, {
+            "code": "10000", "msg": "Success",
+            "out_trade_no": trade.out_trade_no,
+            "trade_no": trade.trade_no,
+            "trade_status": trade.status,
+            "total_amount": trade.total_amount,
+        })
+
+    def refund(self, api: str, biz: dict[str, Any]) -> Response:
+        trade = self.trades.get(biz.get("out_trade_no", ""))
+        if trade is None or trade.status not in ("TRADE_SUCCESS", "TRADE_FINISHED"):
+            return self._signed_response(api, {
+                "code": "40004", "msg": "Business Failed",
+                "sub_code": "ACQ.TRADE_STATUS_ERROR", "sub_msg": "交易状态不合法",
+            })
+        request_no = biz.get("out_request_no") or trade.out_trade_no
+        if request_no not in trade.refunds:
+            refunded = sum(Decimal(v) for v in trade.refunds.values())
+            amount = Decimal(str(biz["refund_amount"]))
+            if refunded + amount > Decimal(trade.total_amount):
+                return self._signed_response(api, {
+                    "code": "40004", "msg": "Business Failed",
+                    "sub_code": "ACQ.REFUND_AMT_NOT_EQUAL_TOTAL", "sub_msg": "退款金额超限",
+                })
+            trade.refunds[request_no] = str(amount)
+            self.stats["refunds"] += 1
+        refund_fee = sum(Decimal(v) for v in trade.refunds.values())
+        return self._signed_response(api, {
+            "code": "10000", "msg": "Success",
+            "out_trade_no": trade.out_trade_no,
+            "trade_no": trade.trade_no,
+            "fund_change": "Y",
+            "refund_fee": str(refund_fee),
+        })
+
+    # ============ 异步通知 ============
+
+    def notification(self, trade: MockTrade) -> dict[str, str]:
+        """签名后的异步通知参数（sign、sign_type 不参与签名）"""
+        params = {
+            "notify_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "notify_type": "trade_status_sync",
+            "notify_id": secrets.token_hex(16),
+            "app_id": trade.app_id,
+            "charset": "utf-8",
+            "version": "1.0",
+            "trade_no": trade.trade_no,
+            "out_trade_no": trade.out_trade_no,
+            "trade_status": trade.status,
+            "total_amount": trade.total_amount,
+            "receipt_amount": trade.total_amount,
+            "subject": trade.subject,
+            "gmt_create": trade.gmt_create.strftime("%Y-%m-%d %H:%M:%S"),
+            "gmt_payment": trade.gmt_payment.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        params["sign"] = _sign(self.alipay_key, _content(params, ("sign", "sign_type")))
+        params["sign_type"] = "RSA2"
+        return params
+
+    async def _deliver(self, url: str, params: dict[str, str]) -> bool:
+        """投递一次通知，未应答 success 时按退避重试"""
+        client = self.notify_client or httpx.AsyncClient(timeout=10.0)
+        self.notify_client = client
+        backoff = self.config.notify_retry_ms / 1000
+        for attempt in range(self.config.notify_retries + 1):
+            if attempt:
+                self.stats["notify.retries"] += 1
+                await asyncio.sleep(backoff)
+                backoff *= 2
+            self.stats["notify.sent"] += 1
+            try:
+                response = await client.post(url, data=params)
+                if response.text.strip() == "success":
+                    self.stats["notify.acked"] += 1
+                    return True
+            except httpx.HTTPError:
+                pass
+        self.stats["notify.failed"] += 1
+        return False
+
+    async def _notify(self, trade: MockTrade) -> None:
+        await self._delay()
+        params = self.notification(trade)
+        copies = 1
+        if self._random.random() < self.config.duplicate_rate:
+            copies += self.config.duplicates
+            self.stats["notify.duplicated"] += self.config.duplicates
+        for _ in range(copies):
+            await self._deliver(trade.notify_url, params)
+
+    async def join(self) -> None:
+        """等待所有在途通知投递完成"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self.notify_client is not None:
+            await self.notify_client.aclose()
+
+
+def create_app(mock: MockAlipay) -> FastAPI:
+    """模拟网关 ASGI 应用"""
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await mock.close()
+
+    app = FastAPI(title="Mock Alipay Gateway", docs_url=None, redoc_url=None, lifespan=lifespan)
+    app.state.mock = mock
+
+    @app.api_route("/gateway.do", methods=["GET", "POST"])
+    async def gateway(request: Request) -> Response:
+        params = dict(request.query_params)
+        if request.method == "POST":
+            params.update((await request.form()).items())
+        return await mock.handle(params)
+
+    @app.post("/__pay/{out_trade_no}")
+    async def pay(out_trade_no: str) -> dict:
+        trade = mock.pay(out_trade_no)
+        return {"out_trade_no": trade.out_trade_no, "trade_status": trade.status}
+
+    @app.get("/__stats")
+    async def stats() -> JSONResponse:
+        return JSONResponse({"trades": len(mock.trades), "in_flight": len(mock._tasks), **mock.stats})
+
+    @app.post("/__reset")
+    async def reset() -> dict:
+        mock.trades.clear()
+        mock.stats.clear()
+        return {"ok": True}
+
+    return app
+
+
+def load_keys(keys_dir: Path, gateway_url: str) -> tuple[RSA.RsaKey, RSA.RsaKey]:
+    """
+    读取（不存在时生成）网关密钥和应用密钥，并写出后端配置 mock_alipay.env
+
+    Returns:
+        (网关私钥, 应用公钥)
+    """
+    keys_dir.mkdir(parents=True, exist_ok=True)
+    keys = {}
+    for name in ("alipay", "app"):
+        path = keys_dir / f"{name}_private.pem"
+        if not path.exists():
+            path.write_bytes(RSA.generate(2048).export_key())
+        keys[name] = RSA.import_key(path.read_bytes())
+
+    app_private = keys["app"].export_key().decode()
+    alipay_public = keys["alipay"].publickey().export_key().decode()
+    (keys_dir / "mock_alipay.env").write_text(
+        f"ALIPAY_APP_ID={MOCK_APP_ID}\n"
+        f"ALIPAY_GATEWAY_URL={gateway_url}\n"
+        f'ALIPAY_PRIVATE_KEY="{app_private}"\n'
+        f'ALIPAY_PUBLIC_KEY="{alipay_public}"\n'
+    )
+    return keys["alipay"], keys["app"].publickey()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="本地模拟支付宝网关")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--keys-dir", type=Path, default=Path(".mock_alipay"))
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--duplicates", type=int, default=1)
+    parser.add_argument("--no-auto-pay", dest="auto_pay", action="store_false")
+    parser.add_argument("--notify-retries", type=int, default=3)
+    parser.add_argument("--notify-retry-ms", type=float, default=200.0)
+    parser.add_argument("--no-verify", dest="verify_requests", action="store_false")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    gateway_url = f"http://{args.host}:{args.port}/gateway.do"
+    alipay_key, app_public_key = load_keys(args.keys_dir, gateway_url)
+    config = MockAlipayConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        duplicate_rate=args.duplicate_rate,
+        duplicates=args.duplicates,
+        auto_pay=args.auto_pay,
+        notify_retries=args.notify_retries,
+        notify_retry_ms=args.notify_retry_ms,
+        verify_requests=args.verify_requests,
+        seed=args.seed,
+    )
+    print(f"模拟支付宝网关: {gateway_url}")
+    print(f"后端配置: {args.keys_dir / 'mock_alipay.env'}")
+    uvicorn.run(create_app(MockAlipay(alipay_key, app_public_key, config)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,5 +19,8 @@ echo "🚀 Starting SocksFlow API Server..."
 echo "📡 Port: $PORT"
 echo "🗄️  Database: $DATABASE_URL"
 
-# 启动 uvicorn
-exec uvicorn app.main:app --host 0.0.0.0 --port "$PORT" --workers 1
+# 升级数据库结构（应用启动时只检查版本，不再 create_all）
+python -m app.cli db-upgrade || exit 1
+
+# 启动服务（gunicorn + UvicornWorker，worker 数按 CPU 与内存自动计算，可用 WEB_CONCURRENCY 覆盖）
+exec python -m app.serve --bind "0.0.0.0:$PORT"
@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core import Base, get_db
+from app.core.config import settings
 from app.main import app
 
 # 测试数据库 URL (使用 SQLite)
@@ -64,6 +65,12 @@ async def client(db_session) -> AsyncGenerator[AsyncClient, None]:
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def payment_mock(monkeypatch):
+    """开启模拟支付（未配置的支付提供商下单即成功、回调跳过验签）"""
+    monkeypatch.setattr(settings, "payment_mock_enabled", True)
+
+
 @pytest.fixture
 def sample_user_data():
     """示例用户数据"""
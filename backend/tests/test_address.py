@@ -0,0 +1,93 @@
+"""
+地址服务测试
+"""
+import pytest
+from sqlalchemy import exists, false, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.address import Address
+from app.schemas.address import AddressCreate, AddressUpdate
+from app.schemas.user import UserCreate
+from app.services import address_service
+from app.services.address_service import AddressService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+def _address(tag: str, is_default: bool = False) -> AddressCreate:
+    return AddressCreate(
+        name="测试用户",
+        phone="13800138000",
+        province="北京市",
+        city="北京市",
+        district="朝阳区",
+        address=f"测试路{tag}号",
+        tag=tag,
+        is_default=is_default,
+    )
+
+
+async def _defaults(db: AsyncSession, user_id: int) -> list[int]:
+    result = await db.execute(
+        select(Address.id).where(Address.user_id == user_id, Address.is_default == True)
+    )
+    return list(result.scalars().all())
+
+
+class TestAddressService:
+    """地址服务测试类"""
+
+    async def test_default_switching(self, db_session: AsyncSession):
+        """测试首个地址自动设为默认，切换后始终只有一个默认地址"""
+        user = await UserService(db_session).create(
+            UserCreate(email="address@example.com", password="password123", name="地址用户")
+        )
+        service = AddressService(db_session)
+
+        first = await service.create(user.id, _address("1"))
+        second = await service.create(user.id, _address("2"))
+        assert (first.is_default, second.is_default) == (True, False)
+
+        third = await service.create(user.id, _address("3", is_default=True))
+        assert await _defaults(db_session, user.id) == [third.id]
+
+        # 目标 id 小于当前默认地址 id：先清除再设置，不触发唯一索引冲突
+        await service.set_default(first.id, user.id)
+        assert await _defaults(db_session, user.id) == [first.id]
+        assert (first.is_default, third.is_default) == (True, False)
+
+        await service.update(second, AddressUpdate(is_default=True, tag="公司"))
+        assert await _defaults(db_session, user.id) == [second.id]
+        assert (await service.get_default_address(user.id)).tag == "公司"
+        await db_session.commit()
+
+    async def test_second_default_rejected(self, db_session: AsyncSession):
+        """测试部分唯一索引拒绝同一用户的第二个默认地址"""
+        user = await UserService(db_session).create(
+            UserCreate(email="address-unique@example.com", password="password123", name="地址用户")
+        )
+        await AddressService(db_session).create(user.id, _address("1"))
+        await db_session.commit()
+
+        db_session.add(Address(user_id=user.id, **_address("2", is_default=True).model_dump()))
+        with pytest.raises(IntegrityError):
+            await db_session.flush()
+        await db_session.rollback()
+
+    async def test_concurrent_first_addresses(self, db_session: AsyncSession, monkeypatch):
+        """测试并发创建首个地址：违反默认地址唯一索引的插入作为普通地址重试"""
+        user = await UserService(db_session).create(
+            UserCreate(email="address-race@example.com", password="password123", name="地址用户")
+        )
+        service = AddressService(db_session)
+        first = await service.create(user.id, _address("1"))
+
+        # 模拟并发请求：NOT EXISTS 判断时尚未看到另一请求插入的默认地址
+        monkeypatch.setattr(address_service, "exists", lambda: exists().where(false()))
+        second = await service.create(user.id, _address("2"))
+        await db_session.commit()
+
+        assert (first.is_default, second.is_default) == (True, False)
+        assert await _defaults(db_session, user.id) == [first.id]
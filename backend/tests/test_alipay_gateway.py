@@ -0,0 +1,95 @@
+"""
+支付宝网关测试
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from Cryptodome.PublicKey import RSA
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.alipay_gateway import AlipayGateway, AlipayTimeoutError
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def rsa_keys():
+    """测试用密钥对（应用私钥与"支付宝公钥"为同一对，便于构造签名响应）"""
+    key = RSA.generate(2048)
+    return key.export_key().decode(), key.publickey().export_key().decode()
+
+
+@pytest.fixture
+def gateway(rsa_keys, monkeypatch):
+    private_key, public_key = rsa_keys
+    monkeypatch.setattr(settings, "alipay_app_id", "2021000000000000")
+    monkeypatch.setattr(settings, "alipay_private_key", private_key)
+    monkeypatch.setattr(settings, "alipay_public_key", public_key)
+    gateway = AlipayGateway(timeout=0.2, max_workers=2)
+    yield gateway
+    gateway.close()
+
+
+class TestAlipayGateway:
+    """支付宝网关测试类"""
+
+    async def test_page_pay_and_verify(self, gateway: AlipayGateway):
+        """测试签名与验签在线程池中完成"""
+        order_string = await gateway.page_pay(
+            out_trade_no="PAY2024000001",
+            total_amount="29.90",
+            subject="SocksFlow 订单",
+        )
+        assert "out_trade_no" in order_string
+        assert "sign=" in order_string
+
+        data = {"out_trade_no": "PAY2024000001", "trade_status": "TRADE_SUCCESS"}
+        signature = gateway.client._sign("&".join(f"{k}={v}" for k, v in sorted(data.items())))
+        assert await gateway.verify(dict(data), signature) is True
+        assert await gateway.verify({**data, "trade_status": "TRADE_CLOSED"}, signature) is False
+
+    async def test_query_uses_pooled_http(self, gateway: AlipayGateway):
+        """测试交易查询经由异步 HTTP 客户端，签名与响应验签在线程池中完成"""
+        inner = json.dumps({
+            "code": "10000",
+            "out_trade_no": "PAY2024000002",
+            "trade_status": "TRADE_SUCCESS",
+            "trade_no": "T2024000002",
+        }, separators=(",", ":"))
+        body = f'{{"alipay_trade_query_response":{inner},"sign":"{gateway.client._sign(inner)}"}}'
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, text=body)
+
+        gateway._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        result = await gateway.query_trade("PAY2024000002")
+        await gateway._http.aclose()
+
+        assert result["trade_status"] == "TRADE_SUCCESS"
+        assert "alipay.trade.query" in str(requests[0].url)
+        assert metrics.histogram_count("alipay_call_seconds", method="query", outcome="ok") >= 1
+
+    async def test_timeout_does_not_block_loop(self, gateway: AlipayGateway):
+        """测试慢调用超时，且期间事件循环不被阻塞"""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        with pytest.raises(AlipayTimeoutError):
+            await gateway._call("slow", time.sleep, 0.5)
+        task.cancel()
+
+        assert ticks >= 5
+        assert metrics.histogram_count("alipay_call_seconds", method="slow", outcome="timeout") == 1
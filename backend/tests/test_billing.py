@@ -0,0 +1,136 @@
+"""
+续费批处理测试
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderStatus
+from app.models.outbox_event import OutboxEvent
+from app.models.payment import Payment
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.services.billing_service import BillingService
+from app.services.payment_service import PaymentService
+from app.services.providers import TradeResult, TradeState
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+# 远早于其他测试数据的时间点，避免选中其他测试创建的订阅
+PERIOD_START = datetime(2020, 1, 1)
+AS_OF = datetime(2020, 1, 2)
+
+
+async def _create_subscriptions(
+    db: AsyncSession, count: int, prefix: str = "billing", expires_at: datetime = PERIOD_START
+) -> list[Subscription]:
+    """Helper: 创建已到期的自动续费订阅（每个用户一个，各带一笔历史订单）"""
+    subscriptions = []
+    for index in range(count):
+        user = await UserService(db).create(
+            type("obj", (object,), {
+                "email": f"{prefix}-{index}@example.com",
+                "password": "password123",
+                "name": "续费测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        subscription = Subscription(
+            user_id=user.id,
+            plan_code="standard",
+            status=SubscriptionStatus.ACTIVE,
+            price_monthly=Decimal("49.90"),
+            payment_method="alipay",
+            auto_renew=True,
+            expires_at=expires_at,
+        )
+        db.add(subscription)
+        await db.flush()
+        db.add(Order(
+            order_number=f"SO{prefix.upper()}{index:04d}",
+            user_id=user.id,
+            subscription_id=subscription.id,
+            status=OrderStatus.PAID,
+            total_amount=Decimal("49.90"),
+            items=[],
+            shipping_address={"name": f"收货人{index}", "phone": "13800138000"},
+        ))
+        subscriptions.append(subscription)
+    await db.commit()
+    return subscriptions
+
+
+class TestBillingRun:
+    """续费批处理测试类"""
+
+    async def test_billing_run_idempotent(self, db_session: AsyncSession):
+        """测试分批续费、重复执行不重复生成订单"""
+        subscriptions = await _create_subscriptions(db_session, 5)
+        ids = [sub.id for sub in subscriptions]
+
+        result = await BillingService(db_session, chunk_size=2).run(AS_OF)
+
+        assert result.chunks == 3
+        assert result.selected == 5
+        assert result.orders_created == 5
+        assert result.payments_created == 5
+
+        orders = (await db_session.execute(
+            select(Order).where(Order.order_number.like("RN%"))
+        )).scalars().all()
+        assert {order.order_number for order in orders} == {
+            BillingService.renewal_order_number(sub_id, PERIOD_START) for sub_id in ids
+        }
+        assert all(order.total_amount == Decimal("49.90") for order in orders)
+        assert orders[0].shipping_address["phone"] == "13800138000"
+
+        payments = (await db_session.execute(
+            select(Payment).where(Payment.order_id.in_([order.id for order in orders]))
+        )).scalars().all()
+        assert len(payments) == 5
+
+        # 未支付前不延长有效期：重复执行仍选中，但同一计费周期的订单已存在，不重复创建
+        for sub in subscriptions:
+            await db_session.refresh(sub)
+            assert sub.expires_at.replace(tzinfo=None) == PERIOD_START
+
+        rerun = await BillingService(db_session, chunk_size=2).run(AS_OF)
+        assert rerun.selected == 5
+        assert rerun.orders_created == 0
+        assert rerun.payments_created == 0
+
+    async def test_renewal_extended_on_payment(self, db_session: AsyncSession):
+        """测试续费订单支付成功后才延长有效期并写入续订事件，重复回调不重复延长"""
+        period_start = datetime(2020, 2, 1)
+        subscriptions = await _create_subscriptions(db_session, 2, "renewal", period_start)
+        await BillingService(db_session).run(datetime(2020, 2, 2))
+        paid, unpaid = subscriptions
+
+        payment_service = PaymentService(db_session)
+        payment = await payment_service.get_by_payment_no(
+            BillingService.renewal_payment_no(paid.id, period_start)
+        )
+        for _ in range(2):
+            await payment_service.apply_trade_result(TradeResult(
+                out_trade_no=payment.payment_no,
+                state=TradeState.PAID,
+                trade_no="RENEWAL0001",
+            ))
+            await db_session.commit()
+
+        await db_session.refresh(paid)
+        await db_session.refresh(unpaid)
+        assert paid.expires_at.replace(tzinfo=None) > datetime.utcnow() + timedelta(days=29)
+        assert unpaid.expires_at.replace(tzinfo=None) == period_start
+
+        events = (await db_session.execute(
+            select(OutboxEvent).where(
+                OutboxEvent.event_type == "subscription.renewed",
+                OutboxEvent.aggregate_id.in_([paid.id, unpaid.id]),
+            )
+        )).scalars().all()
+        assert [event.aggregate_id for event in events] == [paid.id]
@@ -0,0 +1,47 @@
+"""
+冷启动测试
+"""
+import pytest
+
+from app.core.coldstart import measure_imports, parse_importtime
+from app.core.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def report():
+    return measure_imports()
+
+
+class TestColdStart:
+    """冷启动测试类"""
+
+    async def test_parse_importtime(self):
+        """测试解析 -X importtime 输出的耗时与嵌套层级"""
+        records = parse_importtime([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |     app.core.config",
+            "import time:        80 |        200 |   app.core",
+            "unrelated line",
+        ])
+        assert [(r.name, r.self_us, r.cumulative_us, r.depth) for r in records] == [
+            ("app.core.config", 120, 120, 2),
+            ("app.core", 80, 200, 1),
+        ]
+        assert records[0].package == "app"
+
+    async def test_import_time_budget(self, report):
+        """测试导入应用入口的耗时不超过预算"""
+        slowest = "\n".join(
+            f"{record.cumulative_us / 1000:8.1f}ms  {record.name}" for record in report.slowest(10)
+        )
+        assert report.total_ms <= settings.cold_start_budget_ms, (
+            f"导入 app.main 耗时 {report.total_ms:.0f}ms，超出预算 {settings.cold_start_budget_ms}ms:\n{slowest}"
+        )
+
+    async def test_heavy_dependencies_are_lazy(self, report):
+        """测试支付宝 SDK、Celery、微信支付加解密库不在启动时导入"""
+        assert report.imports
+        assert report.eager_lazy_packages() == []
+        assert "app.services.providers.wechat" in {record.name for record in report.imports}
@@ -0,0 +1,96 @@
+"""
+响应压缩测试
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response
+from httpx import AsyncClient, ASGITransport
+from starlette.requests import Request
+
+from app.core.compression import CompressionMiddleware, PrecompressedPayload
+
+pytestmark = pytest.mark.asyncio
+
+
+def _build_app() -> FastAPI:
+    application = FastAPI()
+    application.add_middleware(CompressionMiddleware, minimum_size=500, enable_brotli=False)
+
+    @application.get("/large")
+    async def large():
+        return {"items": [{"name": "袜子", "address": "测试路123号"}] * 100}
+
+    @application.get("/small")
+    async def small():
+        return {"status": "ok"}
+
+    @application.get("/binary")
+    async def binary():
+        return Response(b"\x00" * 2000, media_type="image/png")
+
+    return application
+
+
+class TestCompressionMiddleware:
+    """压缩中间件测试类"""
+
+    async def _get(self, path: str, encoding: str = "gzip"):
+        transport = ASGITransport(app=_build_app())
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await ac.get(path, headers={"Accept-Encoding": encoding})
+
+    async def test_large_json_compressed(self):
+        """测试超过阈值的 JSON 被压缩"""
+        response = await self._get("/large")
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert len(response.json()["items"]) == 100
+
+    async def test_small_response_not_compressed(self):
+        """测试小于阈值的响应不压缩"""
+        response = await self._get("/small")
+        assert "content-encoding" not in response.headers
+
+    async def test_content_type_allowlist(self):
+        """测试非白名单类型不压缩"""
+        response = await self._get("/binary")
+        assert "content-encoding" not in response.headers
+
+    async def test_client_without_gzip(self):
+        """测试客户端不支持压缩时原样返回"""
+        response = await self._get("/large", encoding="identity")
+        assert "content-encoding" not in response.headers
+
+
+class TestPrecompressedCatalog:
+    """预压缩计划目录测试类"""
+
+    async def test_plans_precompressed(self, client: AsyncClient):
+        """测试计划目录返回预压缩内容"""
+        response = await client.get(
+            "/api/v1/subscriptions/plans", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()["plans"]) == 3
+
+    async def test_plans_identity(self, client: AsyncClient):
+        """测试不支持压缩的客户端获取原始内容"""
+        response = await client.get(
+            "/api/v1/subscriptions/plans", headers={"Accept-Encoding": "identity"}
+        )
+        assert "content-encoding" not in response.headers
+        assert response.json()["plans"][0]["code"] == "basic"
+
+    async def test_precompressed_brotli_disabled(self):
+        """测试关闭 brotli 后预压缩响应退回 gzip"""
+        payload = PrecompressedPayload(b'{"plans": []}' * 100, enable_brotli=False)
+        request = Request({
+            "type": "http",
+            "headers": [(b"accept-encoding", b"br, gzip")],
+        })
+
+        response = payload.response(request)
+
+        assert "br" not in payload.variants
+        assert response.headers["content-encoding"] == "gzip"
@@ -0,0 +1,116 @@
+"""
+乐观并发控制测试
+"""
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.concurrency import ConcurrentUpdateError, transition
+from app.core.metrics import metrics
+from app.models.order import OrderStatus
+from app.models.outbox_event import OutboxEvent
+from app.models.payment import PaymentProvider, PaymentStatus
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService
+from app.services.payment_service import PaymentService
+from app.services.providers import TradeResult, TradeState
+from app.services.user_service import UserService
+from tests.conftest import TestingSessionLocal
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _pending_payment(db: AsyncSession, email: str):
+    user = await UserService(db).create(
+        type("obj", (object,), {
+            "email": email,
+            "password": "password123",
+            "name": "并发测试用户",
+            "phone": None,
+            "avatar_url": None,
+        })()
+    )
+    order = await OrderService(db).create(
+        user.id,
+        OrderCreate(
+            items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+            shipping_address={"name": "测试", "phone": "13800138000"},
+            total_amount=Decimal("29.90"),
+        ),
+    )
+    payment = await PaymentService(db).create(
+        user.id, order.id, Decimal("29.90"), PaymentProvider.ALIPAY
+    )
+    await db.commit()
+    return order, payment
+
+
+class TestOptimisticConcurrency:
+    """乐观并发控制测试类"""
+
+    async def test_callback_racing_query(self, db_session: AsyncSession):
+        """测试回调与主动查询并发：后到者检测到版本冲突，重新加载后不重复变更"""
+        order, payment = await _pending_payment(db_session, "cas-race@example.com")
+        assert (order.version, payment.version) == (1, 1)
+        payment_conflicts = metrics.get("optimistic_conflicts_total", entity="payments")
+        order_conflicts = metrics.get("optimistic_conflicts_total", entity="orders")
+
+        # 另一个请求（独立会话）先完成支付
+        async with TestingSessionLocal() as other:
+            await PaymentService(other).apply_trade_result(
+                TradeResult(payment.payment_no, TradeState.PAID, trade_no="T-FIRST")
+            )
+            await other.commit()
+
+        # 本会话持有的仍是旧版本（PENDING，version=1）
+        assert payment.status == PaymentStatus.PENDING
+        await PaymentService(db_session).apply_trade_result(
+            TradeResult(payment.payment_no, TradeState.PAID, trade_no="T-SECOND", raw={"n": 2})
+        )
+        await db_session.commit()
+
+        assert metrics.get("optimistic_conflicts_total", entity="payments") == payment_conflicts + 1
+        assert metrics.get("optimistic_conflicts_total", entity="orders") == order_conflicts + 1
+        assert payment.status == PaymentStatus.SUCCESS
+        assert payment.transaction_id == "T-FIRST"
+        assert payment.provider_response == {"n": 2}
+        assert payment.version == 3
+        assert (order.status, order.version) == (OrderStatus.PAID, 2)
+
+        paid_events = await db_session.scalar(
+            select(func.count()).select_from(OutboxEvent).where(
+                OutboxEvent.aggregate_type == "order",
+                OutboxEvent.aggregate_id == order.id,
+                OutboxEvent.event_type == "order.paid",
+            )
+        )
+        assert paid_events == 1
+
+    async def test_conflict_rechecks_transition(self, db_session: AsyncSession):
+        """测试冲突后按最新状态重新校验：已被取消的订单不能再发货"""
+        order, _ = await _pending_payment(db_session, "cas-recheck@example.com")
+        await OrderService(db_session).mark_as_paid(order)
+        await db_session.commit()
+
+        async with TestingSessionLocal() as other:
+            await OrderService(other).cancel(await OrderService(other).get_by_id(order.id))
+            await other.commit()
+
+        with pytest.raises(ValueError, match="只有已支付订单可以发货"):
+            await OrderService(db_session).mark_as_shipped(order, "SF1234567890")
+        assert order.status == OrderStatus.CANCELLED
+
+    async def test_retries_exhausted(self, db_session: AsyncSession):
+        """测试超过重试次数仍冲突时抛出 ConcurrentUpdateError"""
+        _, payment = await _pending_payment(db_session, "cas-exhausted@example.com")
+        exhausted = metrics.get("optimistic_conflicts_exhausted_total", entity="payments")
+
+        async with TestingSessionLocal() as other:
+            await PaymentService(other).mark_as_failed(await PaymentService(other).get_by_id(payment.id))
+            await other.commit()
+
+        with pytest.raises(ConcurrentUpdateError):
+            await transition(db_session, payment, lambda p: {"status": PaymentStatus.FAILED}, attempts=1)
+        assert metrics.get("optimistic_conflicts_exhausted_total", entity="payments") == exhausted + 1
@@ -0,0 +1,196 @@
+"""
+配送生成测试
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderStatus
+from app.models.size_profile import SizeProfile
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.services.delivery_service import DeliveryRunResult, DeliveryService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+# 远早于其他测试数据的时间点，避免选中其他测试创建的订阅
+DELIVERY_AT = datetime(2019, 6, 1)
+AS_OF = datetime(2019, 6, 2)
+
+
+async def _create_subscriptions(
+    db: AsyncSession, prefix: str = "delivery", delivery_at: datetime = DELIVERY_AT
+) -> list[Subscription]:
+    """Helper: 为两个用户各创建一个到期的订阅（每月1次 / 每月2次，后者指定尺码档案）"""
+    subscriptions = []
+    for index, frequency in enumerate([1, 2]):
+        user = await UserService(db).create(
+            type("obj", (object,), {
+                "email": f"{prefix}-{index}@example.com",
+                "password": "password123",
+                "name": "配送测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        profile_id = None
+        if frequency == 2:
+            profile = SizeProfile(user_id=user.id, name="我的尺码", sock_size="M", shoe_size="42")
+            db.add(profile)
+            await db.flush()
+            profile_id = profile.id
+        subscription = Subscription(
+            user_id=user.id,
+            plan_code="premium",
+            status=SubscriptionStatus.ACTIVE,
+            price_monthly=Decimal("79.90"),
+            expires_at=delivery_at + timedelta(days=30),
+            next_delivery_at=delivery_at,
+            delivery_frequency=frequency,
+            size_profile_id=profile_id,
+        )
+        db.add(subscription)
+        await db.flush()
+        db.add(Order(
+            order_number=f"SO{prefix[:6].upper()}{index:04d}",
+            user_id=user.id,
+            subscription_id=subscription.id,
+            status=OrderStatus.PAID,
+            total_amount=Decimal("79.90"),
+            items=[],
+            shipping_address={"name": "收货人", "phone": "13800138000"},
+        ))
+        subscriptions.append(subscription)
+    await db.commit()
+    return subscriptions
+
+
+class TestDeliveryRun:
+    """配送生成测试类"""
+
+    async def test_dry_run_then_run(self, db_session: AsyncSession):
+        """测试预演不写入，正式执行生成发货订单并推进下次配送时间"""
+        monthly, biweekly = await _create_subscriptions(db_session)
+        monthly_id, biweekly_id = monthly.id, biweekly.id
+        service = DeliveryService(db_session, batch_size=1)
+
+        preview = await service.run(AS_OF, dry_run=True)
+        assert preview.selected == 2
+        assert preview.orders_created == 2
+        assert {p["quantity"] for p in preview.planned} == {6, 3}
+        assert {"select", "load", "build", "commit"} <= set(preview.phases)
+        assert (await db_session.execute(
+            select(Order).where(Order.order_number.like("DL%"))
+        )).scalars().all() == []
+
+        result = await service.run(AS_OF)
+        assert result.batches == 2
+        assert result.orders_created == 2
+        assert result.advanced == 2
+        assert "insert" in result.phases
+
+        orders = {
+            order.subscription_id: order
+            for order in (await db_session.execute(
+                select(Order).where(Order.order_number.like("DL%"))
+            )).scalars()
+        }
+        assert orders[monthly_id].order_number == DeliveryService.delivery_order_number(monthly_id, DELIVERY_AT)
+        assert orders[monthly_id].total_amount == Decimal("0.00")
+        assert orders[biweekly_id].items[0]["sock_size"] == "M"
+
+        await db_session.refresh(monthly)
+        await db_session.refresh(biweekly)
+        assert monthly.next_delivery_at.replace(tzinfo=None) == DELIVERY_AT + timedelta(days=30)
+        assert biweekly.next_delivery_at.replace(tzinfo=None) == DELIVERY_AT + timedelta(days=15)
+
+        # 已推进的订阅不再到期
+        again = await service.run(AS_OF)
+        assert again.selected == 0
+
+    async def test_advanced_counts_only_updated_rows(self, db_session: AsyncSession):
+        """测试被并发执行抢先推进的订阅不计入推进数"""
+        delivery_at, as_of = datetime(2018, 1, 1), datetime(2018, 1, 2)
+        first, second = await _create_subscriptions(db_session, "advance", delivery_at)
+        service = DeliveryService(db_session)
+        due = await service.select_due(as_of)
+        assert {row.id for row in due} == {first.id, second.id}
+
+        # 模拟并发执行已推进第一个订阅
+        concurrent_next = delivery_at + timedelta(days=30)
+        await db_session.execute(
+            update(Subscription)
+            .where(Subscription.id == first.id)
+            .values(next_delivery_at=concurrent_next)
+        )
+
+        result = DeliveryRunResult(as_of=as_of)
+        await service.process_batch(due, as_of, result)
+        await db_session.commit()
+
+        assert result.advanced == 1
+        await db_session.refresh(first)
+        await db_session.refresh(second)
+        assert first.next_delivery_at.replace(tzinfo=None) == concurrent_next
+        assert second.next_delivery_at.replace(tzinfo=None) == delivery_at + timedelta(days=15)
+
+    async def test_only_paid_subscriptions_delivered(self, db_session: AsyncSession):
+        """测试未支付的新订阅、续费未支付已过期的订阅不配送；无效计划的订阅跳过并顺延"""
+        delivery_at, as_of = datetime(2017, 3, 1), datetime(2017, 3, 2)
+        paid, unknown_plan = await _create_subscriptions(db_session, "paidonly", delivery_at)
+        unknown_plan.plan_code = "legacy"
+
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "paidonly-unpaid@example.com",
+                "password": "password123",
+                "name": "配送测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        unpaid = Subscription(
+            user_id=user.id,
+            plan_code="premium",
+            status=SubscriptionStatus.ACTIVE,
+            price_monthly=Decimal("79.90"),
+            expires_at=delivery_at + timedelta(days=30),
+            next_delivery_at=delivery_at,
+            delivery_frequency=1,
+        )
+        db_session.add(unpaid)
+        await db_session.flush()
+        db_session.add(Order(
+            order_number="SOUNPAID0001",
+            user_id=user.id,
+            subscription_id=unpaid.id,
+            status=OrderStatus.PENDING,
+            total_amount=Decimal("79.90"),
+            items=[],
+            shipping_address={"name": "收货人", "phone": "13800138000"},
+        ))
+        # 续费未支付：已有付款订单，但已过期（宽限期内仍为 ACTIVE）
+        lapsed = await _create_subscriptions(db_session, "lapsed", delivery_at)
+        for subscription in lapsed:
+            subscription.expires_at = delivery_at
+        await db_session.commit()
+
+        service = DeliveryService(db_session)
+        due = {row.id for row in await service.select_due(as_of)}
+        assert paid.id in due and unknown_plan.id in due
+        assert unpaid.id not in due
+        assert not due & {subscription.id for subscription in lapsed}
+
+        result = await service.run(as_of)
+        assert result.skipped == [unknown_plan.id]
+        assert result.orders_created == 1
+        assert result.advanced == 2
+        await db_session.refresh(unknown_plan)
+        assert unknown_plan.next_delivery_at.replace(tzinfo=None) == delivery_at + timedelta(days=15)
+
+        # 跳过的订阅已顺延，不再被重复选中
+        again = await service.run(as_of)
+        assert again.selected == 0 and again.skipped == []
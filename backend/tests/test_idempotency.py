@@ -0,0 +1,153 @@
+"""
+幂等键测试
+"""
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import idempotency
+from app.core.idempotency import (
+    IDEMPOTENCY_HEADER,
+    REPLAYED_HEADER,
+    MemoryIdempotencyStore,
+    StoredResponse,
+)
+from app.models.order import Order
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+ORDER = {
+    "items": [{"name": "标准版袜子", "quantity": 1, "unit_price": 49.9, "subtotal": 49.9}],
+    "shipping_address": {"name": "测试", "phone": "13800138000"},
+    "total_amount": "49.90",
+}
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    """每个测试使用独立的内存存储"""
+    store = MemoryIdempotencyStore(ttl=60, lock_ttl=5)
+    monkeypatch.setattr(idempotency, "_store", store)
+    return store
+
+
+async def _login(client: AsyncClient, db: AsyncSession, email: str) -> dict:
+    user = await UserService(db).create(
+        type("obj", (object,), {
+            "email": email,
+            "password": "password123",
+            "name": "幂等测试用户",
+            "phone": None,
+            "avatar_url": None,
+        })()
+    )
+    await db.commit()
+    response = await client.post("/api/v1/auth/login", json={"email": email, "password": "password123"})
+    return {"user_id": user.id, "Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _order_count(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(func.count()).select_from(Order).where(Order.user_id == user_id))
+
+
+class TestIdempotencyKey:
+    """幂等键测试类"""
+
+    async def test_retry_replays_response(self, client: AsyncClient, db_session: AsyncSession):
+        """测试相同幂等键重试回放首次响应，不重复创建订单"""
+        auth = await _login(client, db_session, "idem-retry@example.com")
+        user_id = auth.pop("user_id")
+        headers = {**auth, IDEMPOTENCY_HEADER: "checkout-1"}
+
+        first = await client.post("/api/v1/orders", json=ORDER, headers=headers)
+        second = await client.post("/api/v1/orders", json=ORDER, headers=headers)
+
+        assert first.status_code == second.status_code == 201
+        assert second.content == first.content
+        assert second.headers[REPLAYED_HEADER] == "true"
+        assert REPLAYED_HEADER not in first.headers
+        assert await _order_count(db_session, user_id) == 1
+
+        # 未带幂等键的请求照常执行
+        await client.post("/api/v1/orders", json=ORDER, headers=auth)
+        assert await _order_count(db_session, user_id) == 2
+
+    async def test_concurrent_duplicates_wait(self, client: AsyncClient, db_session: AsyncSession):
+        """测试并发的重复请求等待进行中的请求完成，只执行一次"""
+        auth = await _login(client, db_session, "idem-concurrent@example.com")
+        user_id = auth.pop("user_id")
+        headers = {**auth, IDEMPOTENCY_HEADER: "checkout-2"}
+
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/orders", json=ORDER, headers=headers) for _ in range(3)
+        ))
+
+        assert [r.status_code for r in responses] == [201, 201, 201]
+        assert len({r.json()["id"] for r in responses}) == 1
+        assert sum(REPLAYED_HEADER in r.headers for r in responses) == 2
+        assert await _order_count(db_session, user_id) == 1
+
+    async def test_key_reuse_rejected(self, client: AsyncClient, db_session: AsyncSession):
+        """测试幂等键用于不同请求体时返回 422，不同用户的相同幂等键互不影响"""
+        auth = await _login(client, db_session, "idem-reuse@example.com")
+        auth.pop("user_id")
+        other = await _login(client, db_session, "idem-reuse-other@example.com")
+        other.pop("user_id")
+
+        headers = {**auth, IDEMPOTENCY_HEADER: "checkout-3"}
+        assert (await client.post("/api/v1/orders", json=ORDER, headers=headers)).status_code == 201
+
+        changed = {**ORDER, "total_amount": "59.90"}
+        response = await client.post("/api/v1/orders", json=changed, headers=headers)
+        assert response.status_code == 422
+
+        response = await client.post(
+            "/api/v1/orders", json=ORDER, headers={**other, IDEMPOTENCY_HEADER: "checkout-3"}
+        )
+        assert response.status_code == 201
+        assert REPLAYED_HEADER not in response.headers
+
+    async def test_failure_releases_key(self, client: AsyncClient, db_session: AsyncSession):
+        """测试请求失败时释放幂等键，重试重新执行"""
+        auth = await _login(client, db_session, "idem-failure@example.com")
+        auth.pop("user_id")
+        headers = {**auth, IDEMPOTENCY_HEADER: "pay-1"}
+
+        first = await client.post("/api/v1/payments/999999/alipay", headers=headers)
+        second = await client.post("/api/v1/payments/999999/alipay", headers=headers)
+
+        assert first.status_code == second.status_code == 404
+        assert REPLAYED_HEADER not in second.headers
+
+
+class TestMemoryIdempotencyStore:
+    """内存幂等存储测试类"""
+
+    async def test_claim_save_release(self):
+        """测试占位、保存、释放与过期"""
+        store = MemoryIdempotencyStore(ttl=60, lock_ttl=0.05)
+        fingerprint = b"f" * 32
+        pending = b"\x00" + fingerprint + b"token123"
+
+        assert await store.claim("k", pending) is None
+        assert await store.claim("k", b"\x00" + fingerprint + b"othertok") == pending
+
+        # 只释放自己的占位
+        await store.release("k", b"\x00" + fingerprint + b"othertok")
+        assert await store.wait("k", 0.01) is None
+        await store.release("k", pending)
+        assert await store.claim("k", pending) is None
+
+        # 占位过期后可重新占用（进程崩溃不会永久锁住键）
+        await asyncio.sleep(0.06)
+        assert await store.claim("k", pending) is None
+
+        record = StoredResponse(fingerprint, 201, {"content-type": "application/json"}, b'{"id":1}')
+        waiter = asyncio.create_task(store.wait("k", 1))
+        await asyncio.sleep(0)
+        await store.save("k", record.encode())
+        assert StoredResponse.decode(await waiter) == record
@@ -0,0 +1,136 @@
+"""
+数据库迁移测试
+"""
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import Base
+from app.core.migrations import (
+    BASELINE_REVISION,
+    SchemaOutOfDateError,
+    alembic_config,
+    current_revision,
+    ensure_schema,
+    head_revision,
+    upgrade_database,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+def _engine(path: Path):
+    return create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+
+def _create_baseline(connection) -> None:
+    """建出基线结构（此前 create_all 建出的库），不记录迁移版本"""
+    config = alembic_config()
+    config.attributes["connection"] = connection
+    command.upgrade(config, BASELINE_REVISION)
+    connection.execute(text("DROP TABLE alembic_version"))
+
+
+class TestMigrations:
+    """数据库迁移测试类"""
+
+    async def test_migrations_match_models(self, tmp_path: Path):
+        """测试升级到最新版本后的表结构与模型一致（含 version 列与部分唯一索引）"""
+        engine = _engine(tmp_path / "migrated.db")
+        try:
+            assert await upgrade_database(engine) == (None, head_revision())
+            async with engine.connect() as conn:
+                diff = await conn.run_sync(
+                    lambda c: compare_metadata(MigrationContext.configure(c), Base.metadata)
+                )
+                indexes = dict((await conn.execute(text(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+                ))).all())
+        finally:
+            await engine.dispose()
+
+        assert diff == []
+        assert "WHERE status = 'ACTIVE'" in indexes["ix_subscriptions_active_user"]
+        assert "WHERE is_default" in indexes["ix_addresses_default_user"]
+
+    async def test_boot_check(self, tmp_path: Path):
+        """测试启动检查：未迁移的数据库拒绝启动，升级后通过"""
+        engine = _engine(tmp_path / "boot.db")
+        try:
+            with pytest.raises(SchemaOutOfDateError, match="alembic upgrade head"):
+                await ensure_schema(engine)
+            await upgrade_database(engine)
+            assert await ensure_schema(engine) == head_revision()
+        finally:
+            await engine.dispose()
+
+    async def test_create_all_flag(self, tmp_path: Path):
+        """测试开发模式：空库 create_all 建表并标记为最新版本"""
+        engine = _engine(tmp_path / "dev.db")
+        try:
+            assert await ensure_schema(engine, create_all=True) == head_revision()
+            async with engine.connect() as conn:
+                assert await conn.run_sync(current_revision) == head_revision()
+                assert await conn.scalar(text("SELECT count(*) FROM users")) == 0
+        finally:
+            await engine.dispose()
+
+    async def test_baseline_existing_database(self, tmp_path: Path):
+        """测试迁移前由 create_all 建表（已含部分新增表和列）、尚无迁移版本的数据库同样可以升级"""
+        engine = _engine(tmp_path / "legacy.db")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            assert await upgrade_database(engine) == (None, head_revision())
+            assert await ensure_schema(engine) == head_revision()
+        finally:
+            await engine.dispose()
+
+    async def test_upgrade_baseline_with_duplicates(self, tmp_path: Path):
+        """测试基线结构的数据库升级：添加 version 列，建唯一索引前清理重复的活跃订阅和默认地址"""
+        engine = _engine(tmp_path / "baseline.db")
+        now = "'2024-01-01 00:00:00'"
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(_create_baseline)
+                await conn.execute(text(
+                    "INSERT INTO users (id, email, password_hash, name, is_active, is_verified, created_at, updated_at) "
+                    f"VALUES (1, 'baseline@example.com', 'x', '基线用户', 1, 0, {now}, {now})"
+                ))
+                for sub_id in (1, 2):
+                    await conn.execute(text(
+                        "INSERT INTO subscriptions (id, user_id, plan_code, status, price_monthly, auto_renew, "
+                        "started_at, delivery_frequency, created_at, updated_at) "
+                        f"VALUES ({sub_id}, 1, 'basic', 'ACTIVE', 29.90, 1, {now}, 30, {now}, {now})"
+                    ))
+                for address_id in (1, 2):
+                    await conn.execute(text(
+                        "INSERT INTO addresses (id, user_id, name, phone, province, city, district, address, "
+                        "is_default, created_at, updated_at) "
+                        f"VALUES ({address_id}, 1, '测试', '13800138000', '北京市', '北京市', '朝阳区', '测试路', 1, {now}, {now})"
+                    ))
+
+            assert await upgrade_database(engine) == (None, head_revision())
+
+            async with engine.connect() as conn:
+                columns = await conn.run_sync(
+                    lambda c: {table: {col["name"] for col in inspect(c).get_columns(table)}
+                               for table in ("orders", "payments", "subscriptions")}
+                )
+                subscriptions = (await conn.execute(text(
+                    "SELECT id, status, auto_renew, version FROM subscriptions ORDER BY id"
+                ))).all()
+                defaults = (await conn.execute(text(
+                    "SELECT id FROM addresses WHERE is_default"
+                ))).scalars().all()
+        finally:
+            await engine.dispose()
+
+        assert all("version" in names for names in columns.values())
+        assert [tuple(row) for row in subscriptions] == [(1, "CANCELLED", 0, 1), (2, "ACTIVE", 1, 1)]
+        assert defaults == [2]
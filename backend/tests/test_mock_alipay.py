@@ -0,0 +1,131 @@
+"""
+模拟支付宝网关测试
+"""
+from decimal import Decimal
+
+import httpx
+import pytest
+import pytest_asyncio
+from Cryptodome.PublicKey import RSA
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.order import OrderStatus
+from app.models.payment import PaymentProvider, PaymentStatus
+from app.models.payment_notification import PaymentNotification
+from app.schemas.order import OrderCreate
+from app.services import alipay_gateway
+from app.services.alipay_gateway import AlipayGateway, get_alipay_gateway
+from app.services.inbox_service import PaymentInboxService
+from app.services.order_service import OrderService
+from app.services.payment_service import PaymentService
+from app.services.providers import TradeState, get_provider
+from app.services.user_service import UserService
+from benchmarks.mock_alipay import MOCK_APP_ID, MockAlipay, MockAlipayConfig, create_app
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope="module")
+def keys():
+    """(网关密钥, 应用密钥)"""
+    return RSA.generate(2048), RSA.generate(2048)
+
+
+@pytest_asyncio.fixture
+async def mock_gateway(keys, monkeypatch, client: AsyncClient):
+    """后端指向模拟网关；模拟网关的通知直接投递到测试应用"""
+    alipay_key, app_key = keys
+    monkeypatch.setattr(settings, "alipay_app_id", MOCK_APP_ID)
+    monkeypatch.setattr(settings, "alipay_private_key", app_key.export_key().decode())
+    monkeypatch.setattr(settings, "alipay_public_key", alipay_key.publickey().export_key().decode())
+    monkeypatch.setattr(settings, "alipay_gateway_url", "http://mock-alipay/gateway.do")
+
+    mock = MockAlipay(
+        alipay_key,
+        app_key.publickey(),
+        MockAlipayConfig(duplicate_rate=1.0, duplicates=2, notify_retry_ms=1, seed=1),
+        notify_client=client,
+    )
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(mock)))
+    gateway = AlipayGateway(http=http)
+    monkeypatch.setattr(alipay_gateway, "_gateway", gateway)
+    yield mock
+    gateway.close()
+    await http.aclose()
+
+
+async def _pending_payment(db: AsyncSession, email: str):
+    user = await UserService(db).create(
+        type("obj", (object,), {
+            "email": email,
+            "password": "password123",
+            "name": "模拟网关测试用户",
+            "phone": None,
+            "avatar_url": None,
+        })()
+    )
+    order = await OrderService(db).create(
+        user.id,
+        OrderCreate(
+            items=[{"name": "袜子", "quantity": 1, "unit_price": 49.9, "subtotal": 49.9}],
+            shipping_address={"name": "测试", "phone": "13800138000"},
+            total_amount=Decimal("49.90"),
+        ),
+    )
+    payment, pay_url = await PaymentService(db).create_provider_payment(
+        user.id, order, PaymentProvider.ALIPAY
+    )
+    await db.commit()
+    return order, payment, pay_url
+
+
+class TestMockAlipay:
+    """模拟支付宝网关测试类"""
+
+    async def test_checkout_to_paid(self, db_session: AsyncSession, mock_gateway: MockAlipay):
+        """测试收银台 -> 签名通知（含重复投递） -> 收件箱 -> 已支付，查询验签通过"""
+        order, payment, pay_url = await _pending_payment(db_session, "mock-alipay@example.com")
+        assert pay_url.startswith("http://mock-alipay/gateway.do?")
+
+        response = await get_alipay_gateway().http.get(pay_url)
+        assert response.status_code == 200
+        await mock_gateway.join()
+
+        assert mock_gateway.stats["notify.sent"] == 3
+        assert mock_gateway.stats["notify.acked"] == 3
+        notifications = await db_session.scalar(
+            select(func.count()).select_from(PaymentNotification)
+            .where(PaymentNotification.out_trade_no == payment.payment_no)
+        )
+        assert notifications == 1
+
+        await PaymentInboxService(db_session).drain()
+        await db_session.refresh(payment)
+        await db_session.refresh(order)
+        assert payment.status == PaymentStatus.SUCCESS
+        assert payment.transaction_id == mock_gateway.trades[payment.payment_no].trade_no
+        assert order.status == OrderStatus.PAID
+
+        trade = await get_provider(PaymentProvider.ALIPAY).query(payment.payment_no)
+        assert trade.state == TradeState.PAID
+
+        refund = await get_alipay_gateway().refund(
+            out_trade_no=payment.payment_no, refund_amount="10.00", out_request_no="R1"
+        )
+        assert (refund["code"], refund["refund_fee"]) == ("10000", "10.00")
+
+    async def test_injected_errors(self, db_session: AsyncSession, mock_gateway: MockAlipay):
+        """测试注入的系统错误按签名响应返回，交易状态不被误判"""
+        _, payment, _ = await _pending_payment(db_session, "mock-alipay-error@example.com")
+        mock_gateway.config.error_rate = 1.0
+
+        result = await get_alipay_gateway().query_trade(payment.payment_no)
+        trade = await get_provider(PaymentProvider.ALIPAY).query(payment.payment_no)
+
+        assert result["code"] == "20000"
+        assert trade.state == TradeState.UNKNOWN
+        assert mock_gateway.stats["errors.injected"] == 2
+        assert mock_gateway.stats["errors.signature"] == 0
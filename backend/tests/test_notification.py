@@ -0,0 +1,164 @@
+"""
+邮件通知测试（本地 SMTP 收信服务）
+"""
+import asyncio
+from email import message_from_bytes, policy
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.notification_dead_letter import NotificationDeadLetter
+from app.services.mailer import Mailer, OutgoingEmail, SMTPPool
+from app.services.notification_service import NotificationService, TemplateError, get_template
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+class SMTPSink:
+    """
+    最小 SMTP 收信服务
+
+    收件人以 reject 开头返回 550（永久错误），以 busy 开头返回 451（临时错误）
+    """
+
+    def __init__(self):
+        self.messages: list = []
+        self.connections = 0
+        self.server = None
+        self.port = 0
+
+    async def __aenter__(self) -> "SMTPSink":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        writer.write(b"220 sink ESMTP\r\n")
+        rejected = False
+        while line := await reader.readline():
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                writer.write(b"250-sink\r\n250 8BITMIME\r\n")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address.startswith("reject"):
+                    writer.write(b"550 mailbox unavailable\r\n")
+                    rejected = True
+                elif address.startswith("busy"):
+                    writer.write(b"451 try again later\r\n")
+                    rejected = True
+                else:
+                    writer.write(b"250 OK\r\n")
+            elif verb == "DATA":
+                writer.write(b"354 go ahead\r\n")
+                await writer.drain()
+                data = b""
+                while (chunk := await reader.readline()) != b".\r\n":
+                    data += chunk
+                self.messages.append(message_from_bytes(data, policy=policy.default))
+                writer.write(b"250 OK\r\n")
+            elif verb == "QUIT":
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                # MAIL / RSET / NOOP
+                rejected = False if verb == "RSET" else rejected
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+
+def _mailer(sink: SMTPSink, **kwargs) -> Mailer:
+    pool = SMTPPool("127.0.0.1", sink.port, use_tls=False, timeout=5)
+    return Mailer(pool=pool, pool_size=2, backoff=0, sender="noreply@socksflow.test", **kwargs)
+
+
+class TestNotification:
+    """邮件通知测试类"""
+
+    async def test_template_compiled_once(self):
+        """测试模板只编译一次，缺少字段时报错"""
+        template = get_template("order_shipped")
+        assert get_template("order_shipped") is template
+        assert {"name", "order_number", "tracking_number"} <= template.fields
+
+        subject, body = template.render({"name": "小明", "order_number": "SO1", "tracking_number": "SF1"})
+        assert subject == "您的订单 SO1 已发货"
+        assert "SF1" in body
+
+        with pytest.raises(TemplateError):
+            template.render({"name": "小明"})
+        with pytest.raises(TemplateError):
+            get_template("missing")
+
+    async def test_batches_reuse_pooled_connections(self):
+        """测试邮件分批在池化连接上发送，后续发送复用已有连接"""
+        emails = [OutgoingEmail(to=f"user{i}@example.com", subject=f"主题{i}", body="正文") for i in range(5)]
+
+        async with SMTPSink() as sink:
+            mailer = _mailer(sink, batch_size=2)
+            try:
+                result = await mailer.send(emails)
+                assert result.sent == 5
+                assert result.batches == 3
+                assert sink.connections <= 2
+
+                again = await mailer.send([OutgoingEmail(to="user9@example.com", subject="再次", body="正文")])
+                assert again.sent == 1
+                assert sink.connections == mailer.pool.opened <= 2
+            finally:
+                # 收信服务与测试共用事件循环，QUIT 需在线程中等待响应
+                await asyncio.to_thread(mailer.close)
+
+        assert sorted(m["To"] for m in sink.messages) == sorted(
+            [f"user{i}@example.com" for i in range(5)] + ["user9@example.com"]
+        )
+        assert {m["Subject"] for m in sink.messages} >= {"主题0", "再次"}
+
+    async def test_dead_letters(self, db_session: AsyncSession):
+        """测试永久错误直接进入死信，临时错误重试到上限后进入死信，其余邮件正常发送"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "notify@example.com",
+                "password": "password123",
+                "name": "通知测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        context = {"order_number": "SO20240101", "tracking_number": "SF100"}
+
+        async with SMTPSink() as sink:
+            mailer = _mailer(sink, batch_size=10, max_attempts=3)
+            service = NotificationService(db_session, mailer=mailer)
+            try:
+                result = await service.send([
+                    service.render("order_shipped", "reject@example.com", {"name": "甲", **context}),
+                    service.render("order_shipped", "busy@example.com", {"name": "乙", **context}),
+                ])
+                notified = await service.notify_users("order_shipped", [(user.id, context), (999999, context)])
+            finally:
+                await asyncio.to_thread(mailer.close)
+
+        assert (result.sent, result.dead) == (0, 2)
+        assert (notified.sent, notified.skipped) == (1, 1)
+        assert sink.messages[-1]["To"] == "notify@example.com"
+        assert "通知测试用户" in sink.messages[-1].get_content()
+
+        letters = {
+            letter.recipient: letter
+            for letter in (await db_session.execute(select(NotificationDeadLetter))).scalars()
+        }
+        assert letters["reject@example.com"].attempts == 1
+        assert letters["busy@example.com"].attempts == 3
+        assert "451" in letters["busy@example.com"].last_error
+        assert letters["busy@example.com"].template == "order_shipped"
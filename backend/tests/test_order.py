@@ -0,0 +1,185 @@
+"""
+订单模块测试
+"""
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import concurrency
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestSparseFields:
+    """稀疏字段集测试类"""
+
+    async def _login_with_order(
+        self, client: AsyncClient, db_session: AsyncSession, email: str
+    ) -> tuple[str, int]:
+        """Helper: 创建用户和订单，返回 token 和订单ID"""
+        user_service = UserService(db_session)
+        user = await user_service.create(
+            type("obj", (object,), {
+                "email": email,
+                "password": "password123",
+                "name": "字段测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order = await OrderService(db_session).create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        await db_session.commit()
+
+        login_response = await client.post(
+            "/api/v1/auth/login",
+            json={"email": email, "password": "password123"}
+        )
+        return login_response.json()["access_token"], order.id
+
+    async def test_list_orders_with_fields(self, client: AsyncClient, db_session: AsyncSession):
+        """测试订单列表只返回指定字段"""
+        token, _ = await self._login_with_order(client, db_session, "fields_list@example.com")
+
+        response = await client.get(
+            "/api/v1/orders?fields=id,status,total_amount",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert set(data["items"][0]) == {"id", "status", "total_amount"}
+        assert data["items"][0]["total_amount"] == "29.90"
+
+    async def test_get_order_with_fields(self, client: AsyncClient, db_session: AsyncSession):
+        """测试订单详情只返回指定字段（含关系字段）"""
+        token, order_id = await self._login_with_order(client, db_session, "fields_detail@example.com")
+
+        response = await client.get(
+            f"/api/v1/orders/{order_id}?fields=status,payments",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "pending", "payments": []}
+
+    async def test_unknown_field_rejected(self, client: AsyncClient, db_session: AsyncSession):
+        """测试未知字段返回400"""
+        token, _ = await self._login_with_order(client, db_session, "fields_bad@example.com")
+
+        response = await client.get(
+            "/api/v1/orders?fields=id,password_hash",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 400
+        assert "password_hash" in response.json()["detail"]
+
+
+class TestBatchGet:
+    """订单批量查询测试类"""
+
+    async def test_batch_get_orders(self, client: AsyncClient, db_session: AsyncSession):
+        """测试按ID和订单号批量查询，保持顺序并标记不存在/无权访问"""
+        token, order_id = await TestSparseFields()._login_with_order(
+            client, db_session, "batch_owner@example.com"
+        )
+        _, other_order_id = await TestSparseFields()._login_with_order(
+            client, db_session, "batch_other@example.com"
+        )
+        order = await OrderService(db_session).get_by_id(order_id)
+
+        response = await client.post(
+            "/api/v1/orders/batch-get",
+            json={"ids": [999999, order_id, other_order_id], "order_numbers": [order.order_number]},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert [(i["key"], i["status"]) for i in items] == [
+            (999999, "not_found"),
+            (order_id, "found"),
+            (other_order_id, "forbidden"),
+            (order.order_number, "found"),
+        ]
+        assert items[1]["data"]["id"] == order_id
+        assert items[1]["data"]["payments"] == []
+        assert items[2]["data"] is None
+
+    async def test_batch_get_limit(self, client: AsyncClient, db_session: AsyncSession):
+        """测试超过单次上限返回422"""
+        token, _ = await TestSparseFields()._login_with_order(
+            client, db_session, "batch_limit@example.com"
+        )
+
+        response = await client.post(
+            "/api/v1/orders/batch-get",
+            json={"ids": list(range(1, 102))},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 422
+
+
+class TestCancelOrder:
+    """订单取消测试类"""
+
+    async def test_cancel_order(self, client: AsyncClient, db_session: AsyncSession):
+        """测试取消待支付订单，重复取消返回400"""
+        token, order_id = await TestSparseFields()._login_with_order(
+            client, db_session, "cancel_owner@example.com"
+        )
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.post(f"/api/v1/orders/{order_id}/cancel", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["status"] == "cancelled"
+
+        response = await client.post(f"/api/v1/orders/{order_id}/cancel", headers=headers)
+        assert response.status_code == 400
+
+    async def test_cancel_other_users_order(self, client: AsyncClient, db_session: AsyncSession):
+        """测试取消他人订单返回403，不存在的订单返回404"""
+        token, _ = await TestSparseFields()._login_with_order(
+            client, db_session, "cancel_me@example.com"
+        )
+        _, other_order_id = await TestSparseFields()._login_with_order(
+            client, db_session, "cancel_other@example.com"
+        )
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.post(f"/api/v1/orders/{other_order_id}/cancel", headers=headers)
+        assert response.status_code == 403
+
+        response = await client.post("/api/v1/orders/999999/cancel", headers=headers)
+        assert response.status_code == 404
+
+    async def test_cancel_order_conflict(self, client: AsyncClient, db_session: AsyncSession, monkeypatch):
+        """测试取消订单时版本冲突重试耗尽返回409"""
+        token, order_id = await TestSparseFields()._login_with_order(
+            client, db_session, "cancel_conflict@example.com"
+        )
+
+        async def always_conflict(db, obj, values):
+            return False
+
+        monkeypatch.setattr(concurrency, "compare_and_swap", always_conflict)
+        response = await client.post(
+            f"/api/v1/orders/{order_id}/cancel",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 409
+        assert "并发更新冲突" in response.json()["detail"]
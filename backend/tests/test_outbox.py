@@ -0,0 +1,186 @@
+"""
+事务性发件箱测试
+"""
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import metrics
+from app.models.order import OrderStatus
+from app.models.outbox_event import OutboxEvent
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService
+from app.services.outbox_service import OutboxService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _events(db: AsyncSession, aggregate_type: str, aggregate_id: int) -> list[OutboxEvent]:
+    result = await db.execute(
+        select(OutboxEvent)
+        .where(OutboxEvent.aggregate_type == aggregate_type, OutboxEvent.aggregate_id == aggregate_id)
+        .order_by(OutboxEvent.id)
+        .execution_options(populate_existing=True)
+    )
+    return list(result.scalars().all())
+
+
+class TestOutbox:
+    """发件箱测试类"""
+
+    async def test_event_written_with_state_change(self, db_session: AsyncSession):
+        """测试事件与状态变更同一事务：提交则写入，回滚则一起消失"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "outbox@example.com",
+                "password": "password123",
+                "name": "发件箱测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order_service = OrderService(db_session)
+        order = await order_service.create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        await db_session.commit()
+        order_id = order.id
+
+        await order_service.mark_as_paid(order, transaction_id="T001")
+        await db_session.rollback()
+        assert await _events(db_session, "order", order_id) == []
+
+        order = await order_service.get_by_id(order_id)
+        await order_service.mark_as_paid(order, transaction_id="T001")
+        await order_service.mark_as_shipped(order, "SF123")
+        await db_session.commit()
+
+        events = await _events(db_session, "order", order_id)
+        assert [e.event_type for e in events] == ["order.paid", "order.shipped"]
+        assert events[0].payload["transaction_id"] == "T001"
+        assert events[1].payload["status"] == OrderStatus.SHIPPED.value
+        assert all(e.dispatched_at is None for e in events)
+
+    async def test_dispatch_ordered_per_aggregate(self, db_session: AsyncSession):
+        """测试失败事件阻塞同一聚合的后续事件，其他聚合照常投递，重试后按顺序补投"""
+        outbox = OutboxService(db_session)
+        first = outbox.add("test", 9001, "test.first")
+        second = outbox.add("test", 9001, "test.second")
+        other = outbox.add("test", 9002, "test.other")
+        await db_session.commit()
+        ids = {first.id, second.id, other.id}
+
+        delivered: list[int] = []
+        failing = {first.id}
+
+        async def handler(event: OutboxEvent) -> None:
+            if event.id in failing:
+                raise ConnectionError("下游不可用")
+            if event.id in ids:
+                delivered.append(event.id)
+
+        handlers = {"*": [handler]}
+        result = await OutboxService(db_session, handlers=handlers, batch_size=2).dispatch()
+
+        assert delivered == [other.id]
+        assert result.failed >= 1
+        assert result.blocked >= 1
+        assert result.backlog >= 2
+        assert metrics.get("outbox_backlog", partition="0/1") == result.backlog
+        events = await _events(db_session, "test", 9001)
+        assert events[0].attempts == 1
+        assert "ConnectionError" in events[0].last_error
+        assert events[1].attempts == 0
+
+        failing.clear()
+        result = await OutboxService(db_session, handlers=handlers).dispatch()
+
+        assert delivered == [other.id, first.id, second.id]
+        assert result.backlog == 0
+        assert result.lag_seconds == 0.0
+        events = await _events(db_session, "test", 9001)
+        assert all(e.dispatched_at is not None for e in events)
+        assert events[0].attempts == 2
+
+    async def test_dead_after_max_attempts(self, db_session: AsyncSession):
+        """测试超过最大投递次数的事件放弃，不再重试，也不再阻塞同一聚合的后续事件"""
+        outbox = OutboxService(db_session)
+        poison = outbox.add("test", 9201, "test.poison")
+        after = outbox.add("test", 9201, "test.after")
+        await db_session.commit()
+        poison_id, after_id = poison.id, after.id
+
+        delivered: list[int] = []
+
+        async def handler(event: OutboxEvent) -> None:
+            if event.id == poison_id:
+                raise ValueError("无法处理的事件")
+            if event.id == after_id:
+                delivered.append(event.id)
+
+        handlers = {"*": [handler]}
+        dead_before = metrics.get("outbox_dead_total", event_type="test.poison")
+
+        result = await OutboxService(db_session, handlers=handlers, max_attempts=2).dispatch()
+        assert result.dead == 0
+        assert delivered == []
+
+        result = await OutboxService(db_session, handlers=handlers, max_attempts=2).dispatch()
+        assert result.dead == 1
+        assert delivered == [after_id]
+        assert metrics.get("outbox_dead_total", event_type="test.poison") == dead_before + 1
+
+        events = await _events(db_session, "test", 9201)
+        assert events[0].attempts == 2
+        assert events[0].failed_at is not None
+        assert events[0].dispatched_at is None
+        assert "无法处理" in events[0].last_error
+        assert events[1].dispatched_at is not None
+
+        # 已放弃的事件不再投递，也不计入积压
+        result = await OutboxService(db_session, handlers=handlers, max_attempts=2).dispatch()
+        assert result.dead == 0
+        events = await _events(db_session, "test", 9201)
+        assert events[0].attempts == 2
+
+    async def test_batch_handlers(self, db_session: AsyncSession):
+        """测试批量处理函数每批调用一次；失败时该类型事件及同一聚合的后续事件保留重试"""
+        outbox = OutboxService(db_session)
+        notices = [outbox.add("test", 9101 + index, "test.notice") for index in range(3)]
+        follow_up = outbox.add("test", 9101, "test.after")
+        await db_session.commit()
+        ids = {event.id for event in notices}
+
+        calls: list[list[int]] = []
+        failing = [True]
+
+        async def notify(events) -> None:
+            calls.append([event.id for event in events if event.id in ids])
+            if failing[0]:
+                raise ConnectionError("broker 不可用")
+
+        batch_handlers = {"test.notice": [notify]}
+        result = await OutboxService(db_session, batch_handlers=batch_handlers).dispatch()
+
+        assert calls == [sorted(ids)]
+        assert result.failed >= 3
+        assert result.blocked >= 1
+        events = await _events(db_session, "test", 9101)
+        assert [e.event_type for e in events] == ["test.notice", "test.after"]
+        assert all(e.dispatched_at is None for e in events)
+        assert "broker" in events[0].last_error
+
+        failing[0] = False
+        await OutboxService(db_session, batch_handlers=batch_handlers).dispatch()
+
+        assert calls[-1] == sorted(ids)
+        await db_session.refresh(follow_up)
+        assert follow_up.dispatched_at is not None
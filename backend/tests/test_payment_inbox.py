@@ -0,0 +1,91 @@
+"""
+支付通知收件箱测试
+"""
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import OrderStatus
+from app.models.payment import PaymentProvider, PaymentStatus
+from app.models.payment_notification import NotificationStatus, PaymentNotification
+from app.schemas.order import OrderCreate
+from app.services.inbox_service import PaymentInboxService
+from app.services.order_service import OrderService
+from app.services.payment_service import PaymentService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestPaymentInbox:
+    """支付通知收件箱测试类"""
+
+    async def test_callback_dedup_and_drain(
+        self, client: AsyncClient, db_session: AsyncSession, payment_mock
+    ):
+        """测试回调立即返回 success、重复通知去重、后台处理更新支付和订单"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "inbox@example.com",
+                "password": "password123",
+                "name": "通知测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order = await OrderService(db_session).create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        payment = await PaymentService(db_session).create(
+            user.id, order.id, Decimal("29.90"), PaymentProvider.ALIPAY
+        )
+        await db_session.commit()
+
+        notify = {
+            "notify_id": "NOTIFY0001",
+            "out_trade_no": payment.payment_no,
+            "trade_no": "T2024INBOX",
+            "trade_status": "TRADE_SUCCESS",
+        }
+        for _ in range(3):
+            response = await client.post("/api/v1/payments/callback", data=notify)
+            assert response.status_code == 200
+            assert response.text == "success"
+
+        # 未知支付号的通知同样先落库
+        response = await client.post(
+            "/api/v1/payments/callback",
+            data={**notify, "notify_id": "NOTIFY0002", "out_trade_no": "PAY_NOT_EXISTS"},
+        )
+        assert response.text == "success"
+
+        rows = (await db_session.execute(
+            select(PaymentNotification).where(PaymentNotification.out_trade_no == payment.payment_no)
+        )).scalars().all()
+        assert len(rows) == 1
+        await db_session.refresh(payment)
+        assert payment.status == PaymentStatus.PENDING
+
+        result = await PaymentInboxService(db_session).drain(batch_size=1)
+
+        assert result.processed == 1
+        assert result.failed == 1
+        await db_session.refresh(payment)
+        await db_session.refresh(order)
+        await db_session.refresh(rows[0])
+        assert payment.status == PaymentStatus.SUCCESS
+        assert payment.transaction_id == "T2024INBOX"
+        assert order.status == OrderStatus.PAID
+        assert rows[0].status == NotificationStatus.PROCESSED
+
+        # 处理完成后再次处理为空
+        again = await PaymentInboxService(db_session).drain()
+        assert again.processed == again.failed == 0
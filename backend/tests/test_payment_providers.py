@@ -0,0 +1,263 @@
+"""
+支付提供商测试
+"""
+import base64
+import json
+import time
+from decimal import Decimal
+
+import httpx
+import pytest
+from Cryptodome.Cipher import AES
+from Cryptodome.Hash import SHA256
+from Cryptodome.PublicKey import RSA
+from Cryptodome.Signature import pkcs1_15
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.http import set_http_client
+from app.models.order import OrderStatus
+from app.models.payment import PaymentProvider, PaymentStatus
+from app.schemas.order import OrderCreate
+from app.services.inbox_service import PaymentInboxService
+from app.services.order_service import OrderService
+from app.services.payment_service import PaymentService
+from app.services.providers import PROVIDERS, TradeState, get_provider, reset_providers
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+API_V3_KEY = "0123456789abcdef0123456789abcdef"
+
+
+@pytest.fixture(scope="module")
+def rsa_key():
+    """测试用密钥（商户私钥与平台公钥为同一对，便于双向签名）"""
+    return RSA.generate(2048)
+
+
+@pytest.fixture
+def wechat(rsa_key, monkeypatch):
+    monkeypatch.setattr(settings, "wechat_pay_appid", "wx0000000000000000")
+    monkeypatch.setattr(settings, "wechat_pay_mchid", "1900000001")
+    monkeypatch.setattr(settings, "wechat_pay_cert_serial", "SERIAL0001")
+    monkeypatch.setattr(settings, "wechat_pay_api_key", API_V3_KEY)
+    monkeypatch.setattr(settings, "wechat_pay_private_key", rsa_key.export_key().decode())
+    monkeypatch.setattr(settings, "wechat_pay_platform_public_key", rsa_key.publickey().export_key().decode())
+    reset_providers()
+    yield get_provider(PaymentProvider.WECHAT)
+    reset_providers()
+
+
+def _signed_headers(rsa_key, body: bytes) -> dict[str, str]:
+    timestamp, nonce = str(int(time.time())), "NONCE0001"
+    message = f"{timestamp}\n{nonce}\n".encode() + body + b"\n"
+    signature = pkcs1_15.new(rsa_key).sign(SHA256.new(message))
+    return {
+        "Wechatpay-Timestamp": timestamp,
+        "Wechatpay-Nonce": nonce,
+        "Wechatpay-Signature": base64.b64encode(signature).decode(),
+        "Wechatpay-Serial": "PLATFORM0001",
+    }
+
+
+def _encrypt(transaction: dict) -> dict:
+    cipher = AES.new(API_V3_KEY.encode(), AES.MODE_GCM, nonce=b"nonce0000001")
+    cipher.update(b"transaction")
+    ciphertext, tag = cipher.encrypt_and_digest(json.dumps(transaction).encode())
+    return {
+        "algorithm": "AEAD_AES_256_GCM",
+        "ciphertext": base64.b64encode(ciphertext + tag).decode(),
+        "associated_data": "transaction",
+        "nonce": "nonce0000001",
+    }
+
+
+class TestPaymentProviders:
+    """支付提供商测试类"""
+
+    async def test_registry(self):
+        """测试每个提供商都已登记，实例进程内复用"""
+        assert set(PROVIDERS) == set(PaymentProvider)
+        for provider in PaymentProvider:
+            assert get_provider(provider) is get_provider(provider)
+            assert get_provider(provider).provider == provider
+
+    async def test_wechat_requests_on_shared_client(self, wechat, rsa_key):
+        """测试微信下单/查询经由共享 HTTP 客户端，请求签名、响应验签"""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.method == "POST":
+                body = json.dumps({"code_url": "weixin://wxpay/bizpayurl?pr=TEST"}).encode()
+            else:
+                body = json.dumps({
+                    "out_trade_no": "PAY2024WX0001",
+                    "transaction_id": "4200000001",
+                    "trade_state": "SUCCESS",
+                }).encode()
+            return httpx.Response(200, content=body, headers=_signed_headers(rsa_key, body))
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        set_http_client(client)
+        try:
+            payment = type("obj", (object,), {"payment_no": "PAY2024WX0001", "amount": Decimal("49.90")})()
+            code_url = await wechat.create_payment(payment, subject="SocksFlow 订单")
+            trade = await wechat.query("PAY2024WX0001")
+        finally:
+            set_http_client(None)
+            await client.aclose()
+
+        assert code_url.startswith("weixin://")
+        assert (trade.state, trade.trade_no) == (TradeState.PAID, "4200000001")
+
+        created = requests[0]
+        assert json.loads(created.content)["amount"] == {"total": 4990, "currency": "CNY"}
+        authorization = created.headers["Authorization"]
+        assert authorization.startswith("WECHATPAY2-SHA256-RSA2048 ")
+        fields = dict(part.split("=", 1) for part in authorization.split(" ", 1)[1].split(","))
+        fields = {k: v.strip('"') for k, v in fields.items()}
+        message = (
+            f"POST\n/v3/pay/transactions/native\n{fields['timestamp']}\n{fields['nonce_str']}\n"
+        ).encode() + created.content + b"\n"
+        pkcs1_15.new(rsa_key.publickey()).verify(SHA256.new(message), base64.b64decode(fields["signature"]))
+        assert requests[1].url.path == "/v3/pay/transactions/out-trade-no/PAY2024WX0001"
+
+    async def test_wechat_callback(
+        self, client: AsyncClient, db_session: AsyncSession, wechat, rsa_key
+    ):
+        """测试微信回调验签解密后写入收件箱，后台处理更新支付和订单"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "wechat@example.com",
+                "password": "password123",
+                "name": "微信支付测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order = await OrderService(db_session).create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        payment = await PaymentService(db_session).create(
+            user.id, order.id, Decimal("29.90"), PaymentProvider.WECHAT
+        )
+        await db_session.commit()
+
+        body = json.dumps({
+            "id": "EV-2024-0001",
+            "event_type": "TRANSACTION.SUCCESS",
+            "resource": _encrypt({
+                "out_trade_no": payment.payment_no,
+                "transaction_id": "4200000002",
+                "trade_state": "SUCCESS",
+            }),
+        }).encode()
+        headers = {"Content-Type": "application/json", **_signed_headers(rsa_key, body)}
+
+        for _ in range(2):
+            response = await client.post("/api/v1/payments/callback/wechat", content=body, headers=headers)
+            assert response.status_code == 204
+
+        forged = {**headers, "Wechatpay-Nonce": "OTHER"}
+        response = await client.post("/api/v1/payments/callback/wechat", content=body, headers=forged)
+        assert response.status_code == 401
+        assert response.json()["code"] == "FAIL"
+
+        result = await PaymentInboxService(db_session).drain()
+
+        assert result.processed >= 1
+        await db_session.refresh(payment)
+        await db_session.refresh(order)
+        assert payment.status == PaymentStatus.SUCCESS
+        assert payment.transaction_id == "4200000002"
+        assert order.status == OrderStatus.PAID
+
+    async def test_unconfigured_provider_rejected(self, client: AsyncClient, db_session: AsyncSession):
+        """测试未开启模拟支付时，未配置的提供商拒绝下单（400）且回调验签失败"""
+        reset_providers()
+        assert not get_provider(PaymentProvider.WECHAT).configured
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "wechat-unconfigured@example.com",
+                "password": "password123",
+                "name": "未配置测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order = await OrderService(db_session).create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        await db_session.commit()
+        order_id = order.id
+        login = await client.post(
+            "/api/v1/auth/login",
+            json={"email": "wechat-unconfigured@example.com", "password": "password123"},
+        )
+
+        response = await client.post(
+            f"/api/v1/payments/{order_id}/pay/wechat",
+            headers={"Authorization": f"Bearer {login.json()['access_token']}"},
+        )
+        assert response.status_code == 400
+        assert await PaymentService(db_session).get_by_order_id(order_id) == []
+
+        body = json.dumps({"resource": {"out_trade_no": "PAY_FORGED", "trade_state": "SUCCESS"}})
+        response = await client.post(
+            "/api/v1/payments/callback/wechat",
+            content=body,
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 401
+        await db_session.refresh(order)
+        assert order.status == OrderStatus.PENDING
+
+    async def test_trade_from_other_provider_rejected(self, db_session: AsyncSession):
+        """测试交易结果的提供商与支付记录不一致时拒绝更新"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "provider-mismatch@example.com",
+                "password": "password123",
+                "name": "提供商校验测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order = await OrderService(db_session).create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        payment_service = PaymentService(db_session)
+        payment = await payment_service.create(
+            user.id, order.id, Decimal("29.90"), PaymentProvider.ALIPAY
+        )
+        await db_session.commit()
+
+        trade = get_provider(PaymentProvider.WECHAT).trade_from_payload({
+            "out_trade_no": payment.payment_no,
+            "transaction_id": "4200000003",
+            "trade_state": "SUCCESS",
+        })
+        assert trade.provider == PaymentProvider.WECHAT
+        with pytest.raises(ValueError, match="不一致"):
+            await payment_service.apply_trade_result(trade)
+
+        await db_session.refresh(payment)
+        assert payment.status == PaymentStatus.PENDING
@@ -0,0 +1,262 @@
+"""
+支付对账测试（本地桩提供商）
+"""
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import concurrency
+from app.models.order import Order, OrderStatus
+from app.models.payment import Payment, PaymentProvider, PaymentStatus
+from app.services.providers import TradeResult, get_provider
+from app.services.reconciliation_service import RateLimiter, ReconciliationService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+# 远早于其他测试数据的创建时间，对账时间点取其后不久，避免扫到其他测试的记录
+CREATED_AT = datetime(2018, 1, 1)
+NOW = datetime(2018, 1, 1, 0, 10)
+
+
+class StubProvider:
+    """本地桩提供商：按支付号返回预设交易数据（按真实提供商的格式解析），记录最大并发"""
+
+    configured = True
+
+    def __init__(self, trades: dict[str, dict], provider: PaymentProvider = PaymentProvider.ALIPAY):
+        self.trades = trades
+        self.provider = provider
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def query(self, payment_no: str) -> TradeResult:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            trade = self.trades.get(payment_no)
+            if trade is None:
+                raise ConnectionError("gateway timeout")
+            return get_provider(self.provider).trade_from_payload({"out_trade_no": payment_no, **trade})
+        finally:
+            self.in_flight -= 1
+
+
+class TestReconciliation:
+    """支付对账测试类"""
+
+    async def test_reconcile_with_stub_provider(self, db_session: AsyncSession):
+        """测试并发受限查询，已支付/已关闭/未支付/查询失败分别处理"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "reconcile@example.com",
+                "password": "password123",
+                "name": "对账测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        orders, payments = [], []
+        for index in range(12):
+            order = Order(
+                order_number=f"SORECON{index:04d}",
+                user_id=user.id,
+                status=OrderStatus.PENDING,
+                total_amount=Decimal("29.90"),
+                items=[],
+                shipping_address={"name": "测试"},
+                created_at=CREATED_AT,
+            )
+            db_session.add(order)
+            await db_session.flush()
+            payments.append(Payment(
+                payment_no=f"PAYRECON{index:04d}",
+                user_id=user.id,
+                order_id=order.id,
+                amount=Decimal("29.90"),
+                provider=PaymentProvider.ALIPAY,
+                status=PaymentStatus.PENDING,
+                created_at=CREATED_AT,
+            ))
+            orders.append(order)
+        db_session.add_all(payments)
+        await db_session.commit()
+
+        trades = {}
+        for index in range(10):
+            if index < 6:
+                trades[f"PAYRECON{index:04d}"] = {"trade_status": "TRADE_SUCCESS", "trade_no": f"T{index}"}
+            elif index < 8:
+                trades[f"PAYRECON{index:04d}"] = {"trade_status": "TRADE_CLOSED"}
+            else:
+                trades[f"PAYRECON{index:04d}"] = {"trade_status": "WAIT_BUYER_PAY"}
+        gateway = StubProvider(trades)
+
+        summary = await ReconciliationService(
+            db_session,
+            providers={PaymentProvider.ALIPAY: gateway},
+            concurrency=3,
+            rate_per_second=0,
+            batch_size=5,
+        ).run(NOW)
+
+        assert summary.scanned == 12
+        assert summary.batches == 3
+        assert (summary.paid, summary.closed, summary.waiting, summary.errors) == (6, 2, 2, 2)
+        assert gateway.max_in_flight <= 3
+        assert summary.max_in_flight == gateway.max_in_flight
+
+        for obj in orders + payments:
+            await db_session.refresh(obj)
+        assert payments[0].status == PaymentStatus.SUCCESS
+        assert payments[0].transaction_id == "T0"
+        assert orders[0].status == OrderStatus.PAID
+        assert payments[6].status == PaymentStatus.FAILED
+        assert payments[8].status == PaymentStatus.PENDING
+        assert payments[11].status == PaymentStatus.PENDING
+
+    async def test_conflict_does_not_abort_batch(self, db_session: AsyncSession, monkeypatch):
+        """测试单条回写并发冲突只计入错误，同批其他记录照常回写"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "reconcile-conflict@example.com",
+                "password": "password123",
+                "name": "对账冲突测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        created_at = datetime(2017, 6, 1)
+        orders, payments = [], []
+        for index in range(3):
+            order = Order(
+                order_number=f"SORECONC{index:04d}",
+                user_id=user.id,
+                status=OrderStatus.PENDING,
+                total_amount=Decimal("29.90"),
+                items=[],
+                shipping_address={"name": "测试"},
+                created_at=created_at,
+            )
+            db_session.add(order)
+            await db_session.flush()
+            payments.append(Payment(
+                payment_no=f"PAYRECONC{index:04d}",
+                user_id=user.id,
+                order_id=order.id,
+                amount=Decimal("29.90"),
+                provider=PaymentProvider.ALIPAY,
+                status=PaymentStatus.PENDING,
+                created_at=created_at,
+            ))
+            orders.append(order)
+        db_session.add_all(payments)
+        await db_session.commit()
+
+        # 第二条支付记录的版本号写入始终冲突（模拟并发修改）
+        conflicting = payments[1].id
+        original = concurrency.compare_and_swap
+
+        async def compare_and_swap(db, obj, values):
+            if isinstance(obj, Payment) and obj.id == conflicting:
+                return False
+            return await original(db, obj, values)
+
+        monkeypatch.setattr(concurrency, "compare_and_swap", compare_and_swap)
+
+        gateway = StubProvider({
+            f"PAYRECONC{index:04d}": {"trade_status": "TRADE_SUCCESS", "trade_no": f"TC{index}"}
+            for index in range(3)
+        })
+        summary = await ReconciliationService(
+            db_session,
+            providers={PaymentProvider.ALIPAY: gateway},
+            rate_per_second=0,
+        ).run(datetime(2017, 6, 1, 0, 10))
+
+        assert summary.scanned == 3
+        assert (summary.paid, summary.errors) == (2, 1)
+        assert summary.open_ids == [conflicting]
+
+        for obj in orders + payments:
+            await db_session.refresh(obj)
+        assert [p.status for p in payments] == [
+            PaymentStatus.SUCCESS, PaymentStatus.PENDING, PaymentStatus.SUCCESS,
+        ]
+        assert payments[0].provider_response["trade_no"] == "TC0"
+        assert [o.status for o in orders] == [OrderStatus.PAID, OrderStatus.PENDING, OrderStatus.PAID]
+
+    async def test_reconcile_each_provider(self, db_session: AsyncSession):
+        """测试按支付记录的提供商分派查询，未提供查询的提供商不参与对账"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "reconcile-providers@example.com",
+                "password": "password123",
+                "name": "多提供商对账测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        created_at = datetime(2016, 3, 1)
+        payments = []
+        for index, provider in enumerate((PaymentProvider.ALIPAY, PaymentProvider.WECHAT)):
+            order = Order(
+                order_number=f"SORECONP{index:04d}",
+                user_id=user.id,
+                status=OrderStatus.PENDING,
+                total_amount=Decimal("29.90"),
+                items=[],
+                shipping_address={"name": "测试"},
+                created_at=created_at,
+            )
+            db_session.add(order)
+            await db_session.flush()
+            payments.append(Payment(
+                payment_no=f"PAYRECONP{index:04d}",
+                user_id=user.id,
+                order_id=order.id,
+                amount=Decimal("29.90"),
+                provider=provider,
+                status=PaymentStatus.PENDING,
+                created_at=created_at,
+            ))
+        db_session.add_all(payments)
+        await db_session.commit()
+        now = datetime(2016, 3, 1, 0, 10)
+
+        wechat = StubProvider(
+            {"PAYRECONP0001": {"trade_state": "SUCCESS", "transaction_id": "WX0001"}},
+            provider=PaymentProvider.WECHAT,
+        )
+        # 只配置了微信支付：支付宝记录不查询
+        summary = await ReconciliationService(
+            db_session,
+            providers={PaymentProvider.WECHAT: wechat},
+            rate_per_second=0,
+        ).run(now)
+        assert (summary.scanned, summary.paid) == (1, 1)
+
+        alipay = StubProvider({"PAYRECONP0000": {"trade_status": "TRADE_CLOSED"}})
+        summary = await ReconciliationService(
+            db_session,
+            providers={PaymentProvider.ALIPAY: alipay, PaymentProvider.WECHAT: wechat},
+            rate_per_second=0,
+        ).run(now)
+        assert (summary.scanned, summary.closed) == (1, 1)
+
+        for payment in payments:
+            await db_session.refresh(payment)
+        assert payments[0].status == PaymentStatus.FAILED
+        assert payments[1].status == PaymentStatus.SUCCESS
+        assert payments[1].transaction_id == "WX0001"
+
+    async def test_rate_limit(self):
+        """测试速率上限：N 次查询至少耗时 (N-1) / rate 秒"""
+        limiter = RateLimiter(50)
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(*(limiter.acquire() for _ in range(6)))
+        assert asyncio.get_running_loop().time() - started >= 5 / 50 - 0.01
@@ -0,0 +1,37 @@
+"""
+JSON 响应编码测试
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.responses import FastJSONResponse, json_dumps
+from app.models.order import OrderStatus
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestFastJSONResponse:
+    """FastJSONResponse 测试类"""
+
+    async def test_decimal_kept_exact(self):
+        """测试 Decimal 按字符串精确输出"""
+        assert json_dumps({"amount": Decimal("29.90")}) == b'{"amount":"29.90"}'
+        assert json_dumps([Decimal("0.1") + Decimal("0.2")]) == b'["0.3"]'
+
+    async def test_datetime_and_enum(self):
+        """测试 datetime 和枚举原生编码"""
+        body = FastJSONResponse({
+            "status": OrderStatus.PAID,
+            "paid_at": datetime(2026, 1, 1, 8, 30, tzinfo=timezone.utc),
+        }).body
+        assert body == b'{"status":"paid","paid_at":"2026-01-01T08:30:00Z"}'
+
+    async def test_app_default_response_class(self, client: AsyncClient):
+        """测试应用默认使用 FastJSONResponse"""
+        response = await client.get("/api/v1/subscriptions/plans")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["plans"][0]["price_monthly"] == "29.90"
@@ -0,0 +1,68 @@
+"""
+ORM 直出序列化测试
+"""
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.serializers import get_serializer
+from app.models.payment import PaymentProvider
+from app.schemas.order import OrderDetailResponse
+from app.schemas.subscription import SubscriptionCreate, SubscriptionDetailResponse
+from app.services.order_service import OrderService
+from app.services.payment_service import PaymentService
+from app.services.subscription_service import SubscriptionService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestORMSerializer:
+    """ORM 序列化器测试类"""
+
+    async def test_matches_pydantic_output(self, db_session: AsyncSession):
+        """测试直出结果与 Pydantic 校验后的输出一致"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "serializer@example.com",
+                "password": "password123",
+                "name": "序列化用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        subscription = await SubscriptionService(db_session).create(
+            user.id,
+            SubscriptionCreate(
+                plan_code="premium",
+                shipping_address={
+                    "name": "测试", "phone": "13800138000", "province": "北京市",
+                    "city": "北京市", "district": "朝阳区", "address": "测试路1号",
+                },
+            ),
+        )
+        order = await OrderService(db_session).create_from_subscription(
+            user.id, subscription, {"name": "测试", "phone": "13800138000"}
+        )
+        await PaymentService(db_session).create(
+            user.id, order.id, order.total_amount, PaymentProvider.ALIPAY
+        )
+        await db_session.commit()
+        db_session.expunge_all()
+
+        order = await OrderService(db_session).get_by_id(order.id)
+        subscription = await SubscriptionService(db_session).get_by_id(subscription.id)
+
+        for schema, obj in [
+            (OrderDetailResponse, order),
+            (SubscriptionDetailResponse, subscription),
+        ]:
+            expected = schema.model_validate(obj).model_dump(mode="json")
+            assert json.loads(get_serializer(schema).dumps(obj)) == expected
+
+    async def test_serializer_cached(self):
+        """测试每个 Schema 只编译一次"""
+        assert get_serializer(OrderDetailResponse) is get_serializer(OrderDetailResponse)
+        partial = get_serializer(OrderDetailResponse, frozenset({"id", "status"}))
+        assert partial is not get_serializer(OrderDetailResponse)
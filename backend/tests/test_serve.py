@@ -0,0 +1,72 @@
+"""
+服务启动配置测试
+"""
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.serve import cpu_limit, gunicorn_options, memory_limit, reexec_args, worker_count
+
+pytestmark = pytest.mark.asyncio
+
+GB = 1024 ** 3
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+class TestServe:
+    """服务启动配置测试类"""
+
+    async def test_worker_count(self, monkeypatch):
+        """测试 worker 数按 CPU 向上取整，并受内存上限约束"""
+        monkeypatch.setattr(settings, "web_concurrency", None)
+        assert worker_count(cpus=4, memory=None) == 4
+        assert worker_count(cpus=1.5, memory=None) == 2
+        assert worker_count(cpus=8, memory=GB, memory_per_worker_mb=256) == 4
+        assert worker_count(cpus=2, memory=100 * 1024 * 1024) == 1
+
+        monkeypatch.setattr(settings, "web_concurrency", 6)
+        assert worker_count(cpus=2, memory=GB) == 6
+
+    async def test_cgroup_limits(self, tmp_path: Path):
+        """测试读取 cgroup v2 / v1 的 CPU 配额与内存上限"""
+        (tmp_path / "cpu.max").write_text("150000 100000\n")
+        (tmp_path / "memory.max").write_text(f"{2 * GB}\n")
+        assert cpu_limit(tmp_path) == min(cpu_limit(tmp_path / "none"), 1.5)
+        assert memory_limit(tmp_path) == 2 * GB
+
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+        (tmp_path / "memory.max").write_text("max\n")
+        assert cpu_limit(tmp_path) == cpu_limit(tmp_path / "none")
+        assert memory_limit(tmp_path) is None
+
+        v1 = tmp_path / "v1"
+        (v1 / "cpu").mkdir(parents=True)
+        (v1 / "memory").mkdir()
+        (v1 / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+        (v1 / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+        (v1 / "memory" / "memory.limit_in_bytes").write_text("9223372036854771712\n")
+        assert cpu_limit(v1) == cpu_limit(tmp_path / "none")
+        assert memory_limit(v1) is None
+
+    async def test_gunicorn_options(self, monkeypatch):
+        """测试 gunicorn 配置：预加载、请求数回收、优雅关闭"""
+        monkeypatch.setattr(settings, "web_concurrency", 3)
+        options = gunicorn_options(bind="127.0.0.1:9000")
+        assert options["bind"] == "127.0.0.1:9000"
+        assert options["workers"] == 3
+        assert options["worker_class"] == "uvicorn.workers.UvicornWorker"
+        assert options["preload_app"] is True
+        assert options["max_requests"] == settings.worker_max_requests
+        assert options["graceful_timeout"] == settings.graceful_timeout_seconds
+        assert gunicorn_options(preload=False)["preload_app"] is False
+
+    async def test_reexec_args(self):
+        """测试 USR2 重新执行的命令行以模块方式启动，可在 backend 目录下导入 app 包"""
+        args = reexec_args(["--bind", "127.0.0.1:9000", "--print-config"])
+        assert args[1:4] == ["-m", "app.serve", "--bind"]
+
+        process = subprocess.run(args, cwd=BACKEND_DIR, capture_output=True, text=True)
+        assert process.returncode == 0, process.stderr
+        assert "127.0.0.1:9000" in process.stdout
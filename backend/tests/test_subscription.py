@@ -6,11 +6,15 @@ import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from sqlalchemy import func, select
+
+from app.models.subscription import Subscription, SubscriptionStatus
 from app.services.user_service import UserService
-from app.services.subscription_service import SubscriptionService
+from app.services.subscription_service import ActiveSubscriptionExistsError, SubscriptionService
 from app.schemas.subscription import SubscriptionCreate
+from tests.conftest import TestingSessionLocal
 
-pytestmark = pytest.mark.asyncio
+pytestmark = [pytest.mark.asyncio, pytest.mark.usefixtures("payment_mock")]
 
 
 class TestSubscriptionFlow:
@@ -318,6 +322,100 @@ class TestSubscriptionFlow:
         assert cancel_response.json()["status"] == "cancelled"
 
 
+class TestActiveSubscriptionUniqueness:
+    """活跃订阅唯一性测试类"""
+    
+    async def test_concurrent_create_returns_existing(self, db_session: AsyncSession):
+        """测试另一会话已创建活跃订阅时，创建返回已有订阅而不是违反唯一约束"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "active-unique@example.com",
+                "password": "password123",
+                "name": "唯一订阅用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        await db_session.commit()
+        data = SubscriptionCreate(
+            plan_code="basic",
+            shipping_address=TestSubscriptionFlow.valid_subscription_data["shipping_address"],
+        )
+        
+        # 另一个请求（独立会话）先创建并提交
+        async with TestingSessionLocal() as other:
+            first, created = await SubscriptionService(other).create_or_get_active(user.id, data)
+            await other.commit()
+        assert created
+        
+        second, created = await SubscriptionService(db_session).create_or_get_active(user.id, data)
+        assert (second.id, created) == (first.id, False)
+        with pytest.raises(ActiveSubscriptionExistsError) as exc:
+            await SubscriptionService(db_session).create(user.id, data)
+        assert exc.value.subscription.id == first.id
+        
+        # 取消后可以重新订阅
+        await SubscriptionService(db_session).cancel(second)
+        third, created = await SubscriptionService(db_session).create_or_get_active(user.id, data)
+        assert created and third.id != first.id
+        await db_session.commit()
+        
+        active = await db_session.scalar(
+            select(func.count()).select_from(Subscription).where(
+                Subscription.user_id == user.id,
+                Subscription.status == SubscriptionStatus.ACTIVE,
+            )
+        )
+        assert active == 1
+
+    
+    async def test_reactivate_with_other_active(self, client: AsyncClient, db_session: AsyncSession):
+        """测试已有其他活跃订阅时恢复/续订到期订阅抛出 ActiveSubscriptionExistsError，接口返回409"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "active-reactivate@example.com",
+                "password": "password123",
+                "name": "恢复订阅用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        await db_session.commit()
+        data = SubscriptionCreate(
+            plan_code="basic",
+            shipping_address=TestSubscriptionFlow.valid_subscription_data["shipping_address"],
+        )
+        service = SubscriptionService(db_session)
+        
+        paused = await service.create(user.id, data)
+        await service.pause(paused)
+        expired = await service.create(user.id, data)
+        expired.status = SubscriptionStatus.EXPIRED
+        active = await service.create(user.id, data)
+        await db_session.commit()
+        paused_id, active_id = paused.id, active.id
+        
+        with pytest.raises(ActiveSubscriptionExistsError) as exc:
+            await service.resume(paused)
+        assert exc.value.subscription.id == active_id
+        with pytest.raises(ActiveSubscriptionExistsError):
+            await service.renew(expired)
+        # 保存点回滚后外层事务仍可提交
+        await db_session.commit()
+        await db_session.refresh(paused)
+        await db_session.refresh(expired)
+        assert (paused.status, expired.status) == (SubscriptionStatus.PAUSED, SubscriptionStatus.EXPIRED)
+        
+        login_response = await client.post(
+            "/api/v1/auth/login",
+            json={"email": "active-reactivate@example.com", "password": "password123"}
+        )
+        response = await client.post(
+            f"/api/v1/subscriptions/{paused_id}/resume",
+            headers={"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        )
+        assert response.status_code == 409
+
 class TestAllPlanCodes:
     """测试所有计划代码"""
     
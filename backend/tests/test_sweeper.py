@@ -0,0 +1,221 @@
+"""
+清理服务测试
+"""
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.order import Order, OrderStatus
+from app.models.outbox_event import OutboxEvent
+from app.models.payment import Payment, PaymentProvider, PaymentStatus
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.services.providers import TradeResult, get_provider
+from app.services.sweeper_service import ExpirySweepService, PendingSweepService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+class StubAlipay:
+    """本地桩支付宝：按支付号返回预设交易状态（其他记录视为已关闭），记录最大并发"""
+
+    configured = True
+
+    def __init__(self, trades: dict[str, dict]):
+        self.trades = trades
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def query(self, payment_no: str) -> TradeResult:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            trade = self.trades.get(payment_no, {"trade_status": "TRADE_CLOSED"})
+            return get_provider(PaymentProvider.ALIPAY).trade_from_payload({"out_trade_no": payment_no, **trade})
+        finally:
+            self.in_flight -= 1
+
+STALE = datetime.utcnow() - timedelta(hours=3)
+
+
+async def _create_user(db: AsyncSession, email: str) -> int:
+    user = await UserService(db).create(
+        type("obj", (object,), {
+            "email": email,
+            "password": "password123",
+            "name": "清理测试用户",
+            "phone": None,
+            "avatar_url": None,
+        })()
+    )
+    return user.id
+
+
+def _order(user_id: int, number: str, created_at: datetime) -> Order:
+    return Order(
+        order_number=number,
+        user_id=user_id,
+        status=OrderStatus.PENDING,
+        total_amount=Decimal("29.90"),
+        items=[],
+        shipping_address={"name": "测试"},
+        created_at=created_at,
+    )
+
+
+def _payment(
+    user_id: int,
+    order: Order,
+    number: str,
+    status: PaymentStatus,
+    provider: PaymentProvider = PaymentProvider.ALIPAY,
+) -> Payment:
+    return Payment(
+        payment_no=number,
+        user_id=user_id,
+        order_id=order.id,
+        amount=Decimal("29.90"),
+        provider=provider,
+        status=status,
+        created_at=order.created_at,
+    )
+
+
+class TestPendingSweep:
+    """待支付清理测试类"""
+
+    async def test_sweep_stale_pending(self, db_session: AsyncSession, payment_mock):
+        """测试超时订单取消、超时支付失败，未超时/已支付的不受影响（模拟支付：未配置的提供商没有第三方交易）"""
+        user_id = await _create_user(db_session, "sweep@example.com")
+        abandoned = _order(user_id, "SOSWEEP0001", STALE)
+        no_payment = _order(user_id, "SOSWEEP0002", STALE)
+        fresh = _order(user_id, "SOSWEEP0003", datetime.utcnow())
+        paid = _order(user_id, "SOSWEEP0004", STALE)
+        db_session.add_all([abandoned, no_payment, fresh, paid])
+        await db_session.flush()
+        abandoned_payment = _payment(user_id, abandoned, "PAYSWEEP0001", PaymentStatus.PENDING)
+        paid_payment = _payment(user_id, paid, "PAYSWEEP0004", PaymentStatus.SUCCESS)
+        db_session.add_all([abandoned_payment, paid_payment])
+        await db_session.commit()
+
+        result = await PendingSweepService(db_session, chunk_size=1).sweep()
+
+        assert result.payments_failed >= 1
+        assert result.orders_cancelled >= 2
+        for obj in (abandoned, no_payment, fresh, paid, abandoned_payment, paid_payment):
+            await db_session.refresh(obj)
+        assert abandoned_payment.status == PaymentStatus.FAILED
+        assert abandoned.status == OrderStatus.CANCELLED
+        assert no_payment.status == OrderStatus.CANCELLED
+        assert fresh.status == OrderStatus.PENDING
+        assert paid.status == OrderStatus.PENDING
+        assert paid_payment.status == PaymentStatus.SUCCESS
+
+    async def test_final_check(self, db_session: AsyncSession):
+        """测试取消前查询支付宝：已支付的补记成功，支付中的保留"""
+        user_id = await _create_user(db_session, "sweep_alipay@example.com")
+        paid_late = _order(user_id, "SOSWEEP0011", STALE)
+        waiting = _order(user_id, "SOSWEEP0012", STALE)
+        db_session.add_all([paid_late, waiting])
+        await db_session.flush()
+        paid_late_payment = _payment(user_id, paid_late, "PAYSWEEP0011", PaymentStatus.PENDING)
+        waiting_payment = _payment(user_id, waiting, "PAYSWEEP0012", PaymentStatus.PENDING)
+        db_session.add_all([paid_late_payment, waiting_payment])
+        await db_session.commit()
+
+        gateway = StubAlipay({
+            "PAYSWEEP0011": {"trade_status": "TRADE_SUCCESS", "trade_no": "T0011"},
+            "PAYSWEEP0012": {"trade_status": "WAIT_BUYER_PAY"},
+        })
+
+        result = await PendingSweepService(
+            db_session, providers={PaymentProvider.ALIPAY: gateway}
+        ).sweep()
+
+        assert result.payments_rescued == 1
+        assert waiting_payment.id in result.payments_kept
+        # 复用对账服务的受控并发查询
+        assert result.payments_checked >= 2
+        assert gateway.max_in_flight <= settings.reconcile_concurrency
+        for obj in (paid_late, waiting, paid_late_payment, waiting_payment):
+            await db_session.refresh(obj)
+        assert paid_late_payment.status == PaymentStatus.SUCCESS
+        assert paid_late_payment.transaction_id == "T0011"
+        assert paid_late.status == OrderStatus.PAID
+        assert waiting_payment.status == PaymentStatus.PENDING
+        assert waiting.status == OrderStatus.PENDING
+
+    async def test_unchecked_provider_kept(self, db_session: AsyncSession):
+        """测试未做最终查询的提供商：超时待支付记录不标记失败，订单不取消"""
+        user_id = await _create_user(db_session, "sweep_unchecked@example.com")
+        order = _order(user_id, "SOSWEEP0021", STALE)
+        db_session.add(order)
+        await db_session.flush()
+        payment = _payment(user_id, order, "PAYSWEEP0021", PaymentStatus.PENDING, PaymentProvider.WECHAT)
+        db_session.add(payment)
+        await db_session.commit()
+
+        # 只有支付宝做最终查询，微信支付记录无法确认交易状态
+        await PendingSweepService(
+            db_session, providers={PaymentProvider.ALIPAY: StubAlipay({})}
+        ).sweep()
+
+        for obj in (order, payment):
+            await db_session.refresh(obj)
+        assert payment.status == PaymentStatus.PENDING
+        assert order.status == OrderStatus.PENDING
+
+
+class TestExpirySweep:
+    """订阅到期清理测试类"""
+
+    async def test_sweep_expired(self, db_session: AsyncSession):
+        """测试到期订阅标记为过期，自动续费订阅享有宽限期"""
+        # 每个用户最多一个活跃订阅
+        user_ids = [await _create_user(db_session, f"expiry-{n}@example.com") for n in range(4)]
+        now = datetime.utcnow()
+        lapsed = Subscription(
+            user_id=user_ids[0], plan_code="basic", price_monthly=Decimal("29.90"),
+            status=SubscriptionStatus.ACTIVE, auto_renew=False, expires_at=now - timedelta(hours=1),
+        )
+        in_grace = Subscription(
+            user_id=user_ids[1], plan_code="basic", price_monthly=Decimal("29.90"),
+            status=SubscriptionStatus.ACTIVE, auto_renew=True, expires_at=now - timedelta(hours=1),
+        )
+        unrenewed = Subscription(
+            user_id=user_ids[2], plan_code="basic", price_monthly=Decimal("29.90"),
+            status=SubscriptionStatus.ACTIVE, auto_renew=True, expires_at=now - timedelta(days=3),
+        )
+        current = Subscription(
+            user_id=user_ids[3], plan_code="basic", price_monthly=Decimal("29.90"),
+            status=SubscriptionStatus.ACTIVE, auto_renew=False, expires_at=now + timedelta(days=3),
+        )
+        db_session.add_all([lapsed, in_grace, unrenewed, current])
+        await db_session.commit()
+
+        result = await ExpirySweepService(db_session, chunk_size=1).sweep(now)
+
+        assert result.expired >= 2
+        assert result.expired_auto_renew >= 1
+        assert {"update", "events", "commit"} <= set(result.phases)
+        for sub in (lapsed, in_grace, unrenewed, current):
+            await db_session.refresh(sub)
+        assert lapsed.status == SubscriptionStatus.EXPIRED
+        assert unrenewed.status == SubscriptionStatus.EXPIRED
+        assert in_grace.status == SubscriptionStatus.ACTIVE
+        assert current.status == SubscriptionStatus.ACTIVE
+
+        events = (await db_session.execute(
+            select(OutboxEvent).where(
+                OutboxEvent.aggregate_type == "subscription",
+                OutboxEvent.aggregate_id.in_([lapsed.id, in_grace.id, unrenewed.id, current.id]),
+            )
+        )).scalars().all()
+        assert sorted(e.aggregate_id for e in events) == sorted([lapsed.id, unrenewed.id])
+        assert all(e.event_type == "subscription.expired" for e in events)
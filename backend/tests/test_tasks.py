@@ -0,0 +1,181 @@
+"""
+后台任务测试（eager 模式）
+"""
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.models.order import OrderStatus
+from app.models.payment import PaymentProvider, PaymentStatus
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService
+from app.services.notification_service import (
+    NotificationResult,
+    NotificationService,
+    _notify_orders_shipped,
+)
+from app.services.outbox_service import OutboxService
+from app.services.payment_service import PaymentService
+from app.services.providers import TradeResult, TradeState
+from app.services.user_service import UserService
+from app.tasks import celery_app, confirm_payment, dispatch, run_async
+from app.tasks.base import set_session_factory
+from tests.conftest import TEST_DATABASE_URL
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def eager_tasks(setup_database):
+    """任务在当前进程内执行，使用测试数据库"""
+    celery_app.conf.task_always_eager = True
+    set_session_factory(async_sessionmaker(
+        create_async_engine(TEST_DATABASE_URL, poolclass=NullPool),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    ))
+    yield
+    set_session_factory(None)
+    celery_app.conf.task_always_eager = False
+
+
+class TestTasks:
+    """后台任务测试类"""
+
+    async def test_confirm_payment(self, db_session: AsyncSession, eager_tasks):
+        """测试确认支付任务更新支付和订单状态（重复执行幂等）"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "task_user@example.com",
+                "password": "password123",
+                "name": "任务测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order = await OrderService(db_session).create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        payment = await PaymentService(db_session).create(
+            user.id, order.id, Decimal("29.90"), PaymentProvider.ALIPAY
+        )
+        await db_session.commit()
+
+        result = await dispatch(confirm_payment, payment.payment_no, "T2024001")
+        assert result.get() == PaymentStatus.SUCCESS.value
+
+        result = await dispatch(confirm_payment, payment.payment_no, "T2024001")
+        assert result.get() == PaymentStatus.SUCCESS.value
+
+        await db_session.refresh(payment)
+        await db_session.refresh(order)
+        assert payment.status == PaymentStatus.SUCCESS
+        assert payment.transaction_id == "T2024001"
+        assert order.status == OrderStatus.PAID
+
+    async def test_confirm_failed_payment_requires_provider(
+        self, db_session: AsyncSession, eager_tasks, monkeypatch
+    ):
+        """测试已失败的支付只有提供商确认已支付时才改为成功"""
+        user = await UserService(db_session).create(
+            type("obj", (object,), {
+                "email": "task_failed@example.com",
+                "password": "password123",
+                "name": "任务测试用户",
+                "phone": None,
+                "avatar_url": None,
+            })()
+        )
+        order = await OrderService(db_session).create(
+            user.id,
+            OrderCreate(
+                items=[{"name": "袜子", "quantity": 1, "unit_price": 29.9, "subtotal": 29.9}],
+                shipping_address={"name": "测试", "phone": "13800138000"},
+                total_amount=Decimal("29.90"),
+            ),
+        )
+        payment_service = PaymentService(db_session)
+        payment = await payment_service.create(
+            user.id, order.id, Decimal("29.90"), PaymentProvider.ALIPAY
+        )
+        await payment_service.mark_as_failed(payment)
+        await db_session.commit()
+
+        trade_state = [TradeState.CLOSED]
+
+        async def query_status(self, payment):
+            return TradeResult(
+                out_trade_no=payment.payment_no,
+                state=trade_state[0],
+                provider=payment.provider,
+                trade_no="T2024002",
+                raw={"trade_status": "TRADE_SUCCESS", "trade_no": "T2024002"},
+            )
+
+        monkeypatch.setattr(PaymentService, "query_status", query_status)
+
+        result = await dispatch(confirm_payment, payment.payment_no, "T2024002")
+        assert result.get() == PaymentStatus.FAILED.value
+        await db_session.refresh(payment)
+        await db_session.refresh(order)
+        assert payment.status == PaymentStatus.FAILED
+        assert order.status == OrderStatus.PENDING
+
+        trade_state[0] = TradeState.PAID
+        result = await dispatch(confirm_payment, payment.payment_no, "T2024002")
+        assert result.get() == PaymentStatus.SUCCESS.value
+        await db_session.refresh(payment)
+        await db_session.refresh(order)
+        assert payment.status == PaymentStatus.SUCCESS
+        assert payment.transaction_id == "T2024002"
+        assert payment.provider_response["trade_no"] == "T2024002"
+        assert order.status == OrderStatus.PAID
+
+    async def test_confirm_unknown_payment(self, eager_tasks):
+        """测试支付记录不存在时返回 None"""
+        result = await dispatch(confirm_payment, "PAY_NOT_EXISTS")
+        assert result.get() is None
+
+    async def test_run_async_inside_running_loop(self):
+        """测试在运行中的事件循环内调用 run_async 不会报错"""
+        async def answer():
+            return 42
+
+        assert run_async(answer()) == 42
+
+    async def test_shipped_notices_enqueued_per_batch(self, db_session: AsyncSession, eager_tasks, monkeypatch):
+        """测试发件箱一批中的发货事件合并为一个通知任务批量发送"""
+        sent: list[tuple[str, list]] = []
+
+        async def notify_users(self, template, notices):
+            sent.append((template, list(notices)))
+            return NotificationResult(sent=len(notices))
+
+        monkeypatch.setattr(NotificationService, "notify_users", notify_users)
+
+        outbox = OutboxService(db_session)
+        for index in range(3):
+            outbox.add("order", 9201 + index, "order.shipped", {
+                "order_number": f"SOTASK{index:04d}",
+                "user_id": 9201 + index,
+                "tracking_number": f"SF{index}",
+            })
+        await db_session.commit()
+
+        result = await OutboxService(
+            db_session, batch_handlers={"order.shipped": [_notify_orders_shipped]}
+        ).dispatch()
+
+        assert result.failed == 0
+        shipped = [(template, notices) for template, notices in sent if template == "order_shipped"]
+        assert len(shipped) == 1
+        assert [user_id for user_id, _ in shipped[0][1]][-3:] == [9201, 9202, 9203]
+        assert shipped[0][1][-1][1]["tracking_number"] == "SF2"
@@ -0,0 +1,57 @@
+"""
+启动预热测试
+"""
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.api.v1.subscriptions import get_plan_catalog
+from app.core.serializers import get_serializer
+from app.main import app
+from app.schemas.order import OrderDetailResponse
+from app.warmup import HOT_QUERIES, ORM_SCHEMAS, warm_up
+from tests.conftest import TEST_DATABASE_URL, TestingSessionLocal, engine
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestWarmup:
+    """启动预热测试类"""
+
+    async def test_warm_up(self, setup_database):
+        """测试预热建立连接、执行热点查询、编译序列化器并构建静态目录"""
+        get_plan_catalog.cache_clear()
+        get_serializer.cache_clear()
+
+        pooled = create_async_engine(TEST_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=3)
+        try:
+            result = await warm_up(app, engine=pooled, session_factory=TestingSessionLocal, connections=5)
+            assert pooled.pool.checkedin() == 3
+        finally:
+            await pooled.dispose()
+
+        assert result.errors == []
+        assert result.connections == 3
+        assert result.statements == len(HOT_QUERIES)
+        assert result.serializers == len(ORM_SCHEMAS)
+        assert {"pool", "statements", "serializers", "catalogs", "http"} <= set(result.phases)
+        assert get_plan_catalog.cache_info().currsize == 1
+        assert get_serializer.cache_info().currsize >= len(ORM_SCHEMAS)
+
+        # 请求路径直接命中已编译的序列化器
+        hits = get_serializer.cache_info().hits
+        get_serializer(OrderDetailResponse)
+        assert get_serializer.cache_info().hits == hits + 1
+        assert app.openapi_schema is not None
+
+    async def test_failure_does_not_block_startup(self, setup_database):
+        """测试某个阶段失败时记录错误，其余阶段照常执行"""
+        def broken():
+            raise RuntimeError("数据库不可用")
+
+        result = await warm_up(engine=engine, session_factory=broken, connections=1)
+
+        assert result.connections == 0  # NullPool 不保留连接
+        assert result.statements == 0
+        assert result.errors == ["statements: 数据库不可用"]
+        assert result.serializers == len(ORM_SCHEMAS)